@@ -42,6 +42,7 @@ REST_API_VERSION_HISTORY = """REST API Version History:
             Fixes success status code for create/delete a keypair method
     * 2.3 - Exposes additional os-extended-server-attributes
             Exposes delete_on_termination for os-extended-volumes
+    * 2.4 - Adds page_token to the next links of the servers lists
 """
 
 # The minimum and maximum versions of the API supported
@@ -50,7 +51,7 @@ REST_API_VERSION_HISTORY = """REST API Version History:
 # Note(cyeoh): This only applies for the v2.1 API once microversions
 # support is fully merged. It does not affect the V2 API.
 _MIN_API_VERSION = "2.1"
-_MAX_API_VERSION = "2.3"
+_MAX_API_VERSION = "2.4"
 DEFAULT_API_VERSION = _MIN_API_VERSION
 
 
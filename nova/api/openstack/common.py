@@ -448,10 +448,13 @@ class ViewBuilder(object):
                                             collection_name),
         }]
 
-    def _get_next_link(self, request, identifier, collection_name):
+    def _get_next_link(self, request, identifier, collection_name,
+                       page_token=None):
         """Return href string with proper limit and marker params."""
         params = request.params.copy()
         params["marker"] = identifier
+        if page_token:
+            params["page_token"] = page_token
         prefix = self._update_compute_link_prefix(request.application_url)
         url = os.path.join(prefix,
                            self._get_project_id(request),
@@ -28,6 +28,7 @@ import stevedore
 import webob
 from webob import exc
 
+from nova.api.openstack import api_version_request
 from nova.api.openstack import common
 from nova.api.openstack.compute.schemas.v3 import servers as schema_servers
 from nova.api.openstack.compute.views import servers as views_servers
@@ -142,6 +143,7 @@ class ServersController(wsgi.Controller):
         self.extension_info = kwargs.pop('extension_info')
         super(ServersController, self).__init__(**kwargs)
         self.compute_api = compute.API(skip_policy_check=True)
+        self.api_version_2_4 = api_version_request.APIVersionRequest('2.4')
 
         # Look for implementation of extension point of server creation
         self.create_extension_manager = \
@@ -361,6 +363,13 @@ class ServersController(wsgi.Controller):
                 search_opts['user_id'] = context.user_id
 
         limit, marker = common.get_limit_and_marker(req)
+        # The page token of a next link is a marker which also carries the
+        # sort values of the last server of the previous page
+        page_token = req.GET.get('page_token')
+        if page_token and req.api_version_request >= self.api_version_2_4:
+            # Reject a malformed token before going to the database
+            utils.decode_page_token(page_token)
+            marker = page_token
         sort_keys, sort_dirs = common.get_sort_params(req.params)
         try:
             instance_list = self.compute_api.get_all(context,
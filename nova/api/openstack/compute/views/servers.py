@@ -19,6 +19,7 @@ import hashlib
 from oslo_log import log as logging
 from oslo_utils import timeutils
 
+from nova.api.openstack import api_version_request
 from nova.api.openstack import common
 from nova.api.openstack.compute.views import addresses as views_addresses
 from nova.api.openstack.compute.views import flavors as views_flavors
@@ -246,6 +247,37 @@ class ViewBuilderV3(ViewBuilder):
         # TODO(alex_xu): In V3 API, we correct the image bookmark link to
         # use glance endpoint. We revert back it to use nova endpoint for v2.1.
         self._image_builder = views_images.ViewBuilder()
+        self._api_version_2_4 = api_version_request.APIVersionRequest('2.4')
+
+    def _get_page_token(self, request, instance):
+        """Return a page token for the servers following instance."""
+        sort_keys, sort_dirs = common.get_sort_params(request.params)
+        values = {}
+        # The database orders the instances on created_at and id after the
+        # requested sort keys
+        for key in set(sort_keys) | set(['created_at', 'id']):
+            if isinstance(instance, obj_base.NovaObject):
+                if (key not in instance.fields or
+                        not instance.obj_attr_is_set(key)):
+                    continue
+                values[key] = instance[key]
+            elif key in instance:
+                values[key] = instance[key]
+        return utils.encode_page_token(instance['uuid'], sort_keys,
+                                       sort_dirs, values)
+
+    def _get_collection_links(self, request, items, collection_name,
+                              id_key="uuid"):
+        """Retrieve 'next' link, with a page token for the next servers."""
+        links = super(ViewBuilderV3, self)._get_collection_links(
+            request, items, collection_name, id_key)
+        # Older requests keep the plain marker links
+        if links and request.api_version_request >= self._api_version_2_4:
+            last_item = items[-1]
+            links[0]['href'] = self._get_next_link(
+                request, last_item[id_key], collection_name,
+                page_token=self._get_page_token(request, last_item))
+        return links
 
     def show(self, request, instance, extend_address=True):
         """Detailed view of a single instance."""
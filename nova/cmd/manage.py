@@ -57,6 +57,7 @@ from __future__ import print_function
 import argparse
 import os
 import sys
+import time
 import urllib
 
 import decorator
@@ -64,6 +65,7 @@ import netaddr
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 from oslo_utils import importutils
 import six
 
@@ -73,6 +75,7 @@ from nova import config
 from nova import context
 from nova import db
 from nova.db import migration
+from nova.db.sqlalchemy import metrics as db_metrics
 from nova import exception
 from nova.i18n import _
 from nova import objects
@@ -917,7 +920,15 @@ class DbCommands(object):
 
     @args('--max_rows', metavar='<number>',
             help='Maximum number of deleted rows to archive')
-    def archive_deleted_rows(self, max_rows):
+    @args('--workers', metavar='<number>',
+            help='Number of tables archived at once')
+    @args('--max_rows_per_second', metavar='<number>',
+            help='Maximum number of deleted rows to archive per second')
+    @args('--checkpoint_file', metavar='<path>',
+            help='File keeping track of the progress of the archiving, '
+                 'which lets an interrupted run be resumed')
+    def archive_deleted_rows(self, max_rows=None, workers=None,
+                             max_rows_per_second=None, checkpoint_file=None):
         """Move up to max_rows deleted rows from production tables to shadow
         tables.
         """
@@ -926,8 +937,37 @@ class DbCommands(object):
             if max_rows < 0:
                 print(_("Must supply a positive value for max_rows"))
                 return(1)
+        workers = int(workers) if workers is not None else 1
+        if workers < 1:
+            print(_("Must supply a positive value for workers"))
+            return(1)
+        if max_rows_per_second is not None:
+            max_rows_per_second = int(max_rows_per_second)
+            if max_rows_per_second < 1:
+                print(_("Must supply a positive value for "
+                        "max_rows_per_second"))
+                return(1)
+        checkpoint = {}
+        if checkpoint_file and os.path.exists(checkpoint_file):
+            with open(checkpoint_file) as f:
+                checkpoint = jsonutils.load(f)
         admin_context = context.get_admin_context()
-        db.archive_deleted_rows(admin_context, max_rows)
+        try:
+            table_stats = db.archive_deleted_rows(
+                admin_context, max_rows, workers=workers,
+                max_rows_per_second=max_rows_per_second,
+                checkpoint=checkpoint)
+        finally:
+            if checkpoint_file:
+                with open(checkpoint_file, 'w') as f:
+                    jsonutils.dump(checkpoint, f)
+        for table_name in sorted(table_stats):
+            stats = table_stats[table_name]
+            print(_("%(table)s: %(rows)d rows archived in %(seconds).1f "
+                    "seconds (%(rate).1f rows/s)") %
+                  {'table': table_name, 'rows': stats['rows'],
+                   'seconds': stats['seconds'],
+                   'rate': stats['rows'] / max(stats['seconds'], 0.001)})
 
     @args('--delete', action='store_true', dest='delete',
           help='If specified, automatically delete any records found where '
@@ -973,6 +1013,26 @@ class DbCommands(object):
         print(_('%(total)i instances matched query, %(done)i completed'),
               {'total': match, 'done': done})
 
+    def stats(self):
+        """Print the database metrics last written by the nova services.
+
+        The services only record them when db_metrics is set, and write
+        them to db_metrics_dir when they log them.
+        """
+        reports = db_metrics.read_reports()
+        if not reports:
+            print(_("No database metrics found in %s") %
+                  CONF.db_metrics_dir)
+            return(1)
+        for report in reports:
+            print(_("%(process)s (pid %(pid)d): reported at %(at)s") %
+                  {'process': report['process'], 'pid': report['pid'],
+                   'at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(
+                       report['reported_at']))})
+        for line in db_metrics.format_report(
+                db_metrics.merge_reports(reports)):
+            print(line)
+
 
 class ApiDbCommands(object):
     """Class for managing the api database."""
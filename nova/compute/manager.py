@@ -5960,26 +5960,14 @@ class ComputeManager(manager.Manager):
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
-        To sync power state data we make a DB call to get the number of
-        virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database.
+        Only the uuid and task state of the instances of the host are read
+        from the database, and for each one of them we check in a lazy loop
+        if the hypervisor has the same power state as is in the database. The
+        number of instances read is then compared to the number of virtual
+        machines known by the hypervisor.
         """
-        db_instances = objects.InstanceList.get_by_host(context, self.host,
-                                                        expected_attrs=[],
-                                                        use_slave=True)
-
-        num_vm_instances = self.driver.get_num_instances()
-        num_db_instances = len(db_instances)
-
-        if num_vm_instances != num_db_instances:
-            LOG.warning(_LW("While synchronizing instance power states, found "
-                            "%(num_db_instances)s instances in the database "
-                            "and %(num_vm_instances)s instances on the "
-                            "hypervisor."),
-                        {'num_db_instances': num_db_instances,
-                         'num_vm_instances': num_vm_instances})
+        db_instances = objects.InstanceList.get_columns_by_host(
+            context, self.host, ['uuid', 'task_state'], use_slave=True)
 
         def _sync(db_instance):
             # NOTE(melwitt): This must be synchronized as we query state from
@@ -5994,11 +5982,13 @@ class ComputeManager(manager.Manager):
             except Exception:
                 LOG.exception(_LE("Periodic sync_power_state task had an "
                                   "error while processing an instance."),
-                              instance=db_instance)
+                              instance_uuid=db_instance.uuid)
 
             self._syncs_in_progress.pop(db_instance.uuid)
 
+        num_db_instances = 0
         for db_instance in db_instances:
+            num_db_instances += 1
             # process syncs asynchronously - don't want instance locking to
             # block entire periodic task thread
             uuid = db_instance.uuid
@@ -6009,11 +5999,28 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
-    def _query_driver_power_state_and_sync(self, context, db_instance):
-        if db_instance.task_state is not None:
+        num_vm_instances = self.driver.get_num_instances()
+        if num_vm_instances != num_db_instances:
+            LOG.warning(_LW("While synchronizing instance power states, found "
+                            "%(num_db_instances)s instances in the database "
+                            "and %(num_vm_instances)s instances on the "
+                            "hypervisor."),
+                        {'num_db_instances': num_db_instances,
+                         'num_vm_instances': num_vm_instances})
+
+    def _query_driver_power_state_and_sync(self, context, db_record):
+        if db_record.task_state is not None:
             LOG.info(_LI("During sync_power_state the instance has a "
                          "pending task (%(task)s). Skip."),
-                     {'task': db_instance.task_state}, instance=db_instance)
+                     {'task': db_record.task_state},
+                     instance_uuid=db_record.uuid)
+            return
+        # The periodic task only read the task state, the driver needs the
+        # whole instance.
+        try:
+            db_instance = objects.Instance.get_by_uuid(
+                context, db_record.uuid, expected_attrs=[], use_slave=True)
+        except exception.InstanceNotFound:
             return
         # No pending tasks. Now try to figure out the real vm_power_state.
         try:
@@ -6215,7 +6222,9 @@ class ComputeManager(manager.Manager):
         filters = {'vm_state': vm_states.SOFT_DELETED,
                    'task_state': None,
                    'host': self.host}
-        instances = objects.InstanceList.get_by_filters(
+        # Instances soft deleted for a long time can pile up on a host, so
+        # they are loaded one chunk at a time
+        instances = objects.InstanceList.iter_by_filters(
             context, filters,
             expected_attrs=objects.instance.INSTANCE_DEFAULT_FIELDS,
             use_slave=True)
@@ -6558,12 +6567,16 @@ class ComputeManager(manager.Manager):
             context, self.image_api, image_ref, instance)
         self.driver.unquiesce(context, instance, image_meta)
 
+    def get_object_versions(self, context):
+        """Return the versions of the objects this host supports."""
+        return obj_base.obj_version_manifest()
+
 
 # TODO(danms): This goes away immediately in Lemming and is just
 # present in Kilo so that we can receive v3.x and v4.0 messages
 class _ComputeV4Proxy(object):
 
-    target = messaging.Target(version='4.0')
+    target = messaging.Target(version='4.1')
 
     def __init__(self, manager):
         self.manager = manager
@@ -6857,3 +6870,6 @@ class _ComputeV4Proxy(object):
 
     def unquiesce_instance(self, ctxt, instance, mapping=None):
         return self.manager.unquiesce_instance(ctxt, instance, mapping=mapping)
+
+    def get_object_versions(self, ctxt):
+        return self.manager.get_object_versions(ctxt)
@@ -16,6 +16,8 @@
 Client side of the compute RPC API.
 """
 
+import time
+
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
@@ -32,6 +34,15 @@ rpcapi_opts = [
     cfg.StrOpt('compute_topic',
                default='compute',
                help='The topic compute nodes listen on'),
+    cfg.IntOpt('object_versions_timeout',
+               default=10,
+               help='Timeout in seconds of the call asking a compute host '
+                    'the versions of the objects it supports, in the '
+                    'background, while the version of the compute RPC API '
+                    'is pinned with [upgrade_levels] compute. The objects '
+                    'sent to the host are then backported to those '
+                    'versions rather than by conductor on the host. 0 '
+                    'disables it.'),
 ]
 
 CONF = cfg.CONF
@@ -46,6 +57,17 @@ CONF.register_opt(rpcapi_cap_opt, 'upgrade_levels')
 
 LOG = logging.getLogger(__name__)
 
+# Seconds after which the versions of the objects a compute host supports
+# are asked again, so that the upgrade of the host is noticed
+_OBJECT_VERSIONS_TTL = 600
+
+# The versions of the objects every compute host supports, or None when
+# they are unknown, along with when to ask them again
+_OBJECT_VERSIONS = {}
+
+# The hosts whose versions are being asked
+_OBJECT_VERSIONS_PENDING = set()
+
 
 def _compute_host(host, instance):
     '''Get the destination host for a message.
@@ -292,6 +314,7 @@ class ComputeAPI(object):
         can handle the version_cap being set to 3.40
 
         * 4.0  - Remove 3.x compatibility
+        * 4.1  - Add get_object_versions()
     '''
 
     VERSION_ALIASES = {
@@ -316,9 +339,14 @@ class ComputeAPI(object):
 
     # Cells overrides this
     def get_client(self, target, version_cap, serializer):
-        return rpc.get_client(target,
-                              version_cap=version_cap,
-                              serializer=serializer)
+        client = rpc.get_client(target,
+                                version_cap=version_cap,
+                                serializer=serializer)
+        # The hosts can only run an older release while the version is
+        # pinned during an upgrade
+        if version_cap:
+            client = _ObjectVersionsClient(client)
+        return client
 
     def add_aggregate_host(self, ctxt, aggregate, host_param, host,
                            slave_info=None):
@@ -1053,6 +1081,97 @@ class ComputeAPI(object):
                    mapping=mapping)
 
 
+def _fetch_object_versions(client, ctxt, host):
+    """Ask a compute host the versions of the objects it supports, and
+    cache them.
+    """
+    versions = None
+    try:
+        cctxt = client.prepare(server=host, version='4.1',
+                               timeout=CONF.object_versions_timeout)
+        versions = cctxt.call(ctxt, 'get_object_versions')
+    except messaging.MessagingException as e:
+        LOG.warning(_LW('Unable to get the versions of the objects '
+                        'host %(host)s supports: %(error)s'),
+                    {'host': host, 'error': e})
+    finally:
+        _OBJECT_VERSIONS[host] = (versions,
+                                  time.time() + _OBJECT_VERSIONS_TTL)
+        _OBJECT_VERSIONS_PENDING.discard(host)
+
+
+def _get_object_versions(client, ctxt, host):
+    """Return the cached versions of the objects a compute host supports,
+    or None if they are unknown.
+
+    The versions are asked to the host in the background when they are
+    unknown or expired, so that the messages sent meanwhile do not wait
+    for them.
+    """
+    versions, expires_at = _OBJECT_VERSIONS.get(host, (None, 0))
+    if (time.time() >= expires_at and
+            host not in _OBJECT_VERSIONS_PENDING and
+            CONF.object_versions_timeout > 0 and
+            client.can_send_version('4.1')):
+        _OBJECT_VERSIONS_PENDING.add(host)
+        utils.spawn_n(_fetch_object_versions, client, ctxt, host)
+    return versions
+
+
+class _ObjectVersionsCallContext(object):
+    """Call context backporting the objects sent to a compute host to the
+    versions the host supports.
+    """
+
+    def __init__(self, client, cctxt, host):
+        self._client = client
+        self._cctxt = cctxt
+        self._host = host
+
+    def __getattr__(self, name):
+        return getattr(self._cctxt, name)
+
+    def _backport(self, ctxt, kwargs):
+        if not kwargs:
+            return kwargs
+        versions = _get_object_versions(self._client, ctxt, self._host)
+        if not versions:
+            return kwargs
+        serializer = objects_base.NovaObjectSerializer(
+            version_manifest=versions)
+        return {name: serializer.serialize_entity(ctxt, value)
+                for name, value in kwargs.items()}
+
+    def cast(self, ctxt, method, **kwargs):
+        self._cctxt.cast(ctxt, method, **self._backport(ctxt, kwargs))
+
+    def call(self, ctxt, method, **kwargs):
+        return self._cctxt.call(ctxt, method, **self._backport(ctxt, kwargs))
+
+
+class _ObjectVersionsClient(object):
+    """RPC client of the compute hosts backporting the objects sent to a
+    host to the versions the host supports.
+
+    The versions are asked to every host when something is sent to it, and
+    cached for a while, so that the hosts running an older release do not
+    have to ask conductor to backport every object they receive.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def prepare(self, **kwargs):
+        cctxt = self._client.prepare(**kwargs)
+        server = kwargs.get('server')
+        if server is None:
+            return cctxt
+        return _ObjectVersionsCallContext(self._client, cctxt, server)
+
+
 class SecurityGroupAPI(object):
     '''Client side of the security group rpc API.
 
@@ -78,7 +78,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    target = messaging.Target(version='2.1')
+    target = messaging.Target(version='2.2')
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -428,9 +428,17 @@ class ConductorManager(manager.Manager):
         except Exception:
             raise messaging.ExpectedException()
 
+    @staticmethod
+    def _read_from_master(context):
+        # NOTE: The writes of an object call are not reported back to its
+        # caller, whose next calls could not read them from the slave
+        # database, so the object calls never read from it
+        context.db_wrote = True
+
     def object_class_action(self, context, objname, objmethod,
                             objver, args, kwargs):
         """Perform a classmethod action on an object."""
+        self._read_from_master(context)
         objclass = nova_object.NovaObject.obj_class_from_name(objname,
                                                               objver)
         args = tuple([context] + list(args))
@@ -441,24 +449,47 @@ class ConductorManager(manager.Manager):
         return (result.obj_to_primitive(target_version=objver)
                 if isinstance(result, nova_object.NovaObject) else result)
 
-    def object_action(self, context, objinst, objmethod, args, kwargs):
-        """Perform an action on an object."""
-        oldobj = objinst.obj_clone()
-        result = self._object_dispatch(objinst, objmethod, args, kwargs)
+    @staticmethod
+    def _object_updates(oldobj, objinst, names):
+        """Return the changes of the fields in names to forward back."""
         updates = dict()
         # NOTE(danms): Diff the object with the one passed to us and
         # generate a list of changes to forward back
-        for name, field in objinst.fields.items():
+        for name in names:
             if not objinst.obj_attr_is_set(name):
                 # Avoid demand-loading anything
                 continue
             if (not oldobj.obj_attr_is_set(name) or
                     getattr(oldobj, name) != getattr(objinst, name)):
+                field = objinst.fields[name]
                 updates[name] = field.to_primitive(objinst, name,
                                                    getattr(objinst, name))
         # This is safe since a field named this would conflict with the
         # method anyway
         updates['obj_what_changed'] = objinst.obj_what_changed()
+        return updates
+
+    def object_action(self, context, objinst, objmethod, args, kwargs):
+        """Perform an action on an object."""
+        self._read_from_master(context)
+        oldobj = objinst.obj_clone()
+        result = self._object_dispatch(objinst, objmethod, args, kwargs)
+        updates = self._object_updates(oldobj, objinst, objinst.fields)
+        return updates, result
+
+    def object_delta_action(self, context, objinst, objmethod, args,
+                            kwargs):
+        """Perform an action on an object holding only some of its fields.
+
+        Only the fields the object was sent with are diffed, so that the
+        ones the action loaded are not forwarded back.
+        """
+        self._read_from_master(context)
+        oldobj = objinst.obj_clone()
+        result = self._object_dispatch(objinst, objmethod, args, kwargs)
+        names = [name for name in objinst.fields
+                 if oldobj.obj_attr_is_set(name)]
+        updates = self._object_updates(oldobj, objinst, names)
         return updates, result
 
     def object_backport(self, context, objinst, target_version):
@@ -165,6 +165,8 @@ class ConductorAPI(object):
     * Remove service_destroy()
     * Remove service_update()
 
+    * 2.2  - Added object_delta_action()
+
     """
 
     VERSION_ALIASES = {
@@ -301,6 +303,16 @@ class ConductorAPI(object):
         return cctxt.call(context, 'object_action', objinst=objinst,
                           objmethod=objmethod, args=args, kwargs=kwargs)
 
+    def object_delta_action(self, context, objinst, objmethod, args,
+                            kwargs):
+        if not self.client.can_send_version('2.2'):
+            # The older conductors diff all the fields the action loaded
+            return self.object_action(context, objinst, objmethod, args,
+                                      kwargs)
+        cctxt = self.client.prepare(version='2.2')
+        return cctxt.call(context, 'object_delta_action', objinst=objinst,
+                          objmethod=objmethod, args=args, kwargs=kwargs)
+
     def object_backport(self, context, objinst, target_version):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'object_backport', objinst=objinst,
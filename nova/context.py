@@ -73,7 +73,7 @@ class RequestContext(context.RequestContext):
                  request_id=None, auth_token=None, overwrite=True,
                  quota_class=None, user_name=None, project_name=None,
                  service_catalog=None, instance_lock_checked=False,
-                 user_auth_plugin=None, **kwargs):
+                 user_auth_plugin=None, db_wrote=False, **kwargs):
         """:param read_deleted: 'no' indicates deleted records are hidden,
                 'yes' indicates deleted records are visible,
                 'only' indicates that *only* deleted records are visible.
@@ -84,6 +84,9 @@ class RequestContext(context.RequestContext):
            :param user_auth_plugin: The auth plugin for the current request's
                 authentication data.
 
+           :param db_wrote: True once the request wrote to the database, so
+                that its reads are not routed to the slave database anymore.
+
            :param kwargs: Extra arguments that might be present, but we ignore
                 because they possibly came in from older rpc messages.
         """
@@ -132,6 +135,7 @@ class RequestContext(context.RequestContext):
             self.service_catalog = []
 
         self.instance_lock_checked = instance_lock_checked
+        self.db_wrote = db_wrote
 
         # NOTE(markmc): this attribute is currently only used by the
         # rs_limits turnstile pre-processor.
@@ -185,7 +189,8 @@ class RequestContext(context.RequestContext):
             'service_catalog': getattr(self, 'service_catalog', None),
             'project_name': getattr(self, 'project_name', None),
             'instance_lock_checked': getattr(self, 'instance_lock_checked',
-                                             False)
+                                             False),
+            'db_wrote': getattr(self, 'db_wrote', False)
         })
         return values
 
@@ -209,6 +209,19 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, changes_since):
+    """Get compute nodes created, updated or deleted since a point in time.
+
+    :param context: The security context (admin)
+    :param changes_since: datetime; only compute nodes whose created_at,
+                          updated_at or deleted_at is at or after it are
+                          returned, including deleted ones
+
+    :returns: List of dictionaries each containing compute node properties
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changes_since)
+
+
 def compute_node_get_all_by_host(context, host, use_slave=False):
     """Get compute nodes by host name
 
@@ -691,6 +704,18 @@ def instance_get_all_by_filters_sort(context, filters, limit=None,
         sort_keys=sort_keys, sort_dirs=sort_dirs)
 
 
+def instance_get_all_by_filters_chunked(context, filters, chunk_size=1000,
+                                        after_uuid=None, columns_to_join=None,
+                                        use_slave=False):
+    """Get all instances that match all filters in chunks ordered by uuid.
+
+    Returns a generator of lists of at most chunk_size instances.
+    """
+    return IMPL.instance_get_all_by_filters_chunked(
+        context, filters, chunk_size=chunk_size, after_uuid=after_uuid,
+        columns_to_join=columns_to_join, use_slave=use_slave)
+
+
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None,
                                          use_slave=False,
@@ -714,6 +739,12 @@ def instance_get_all_by_host(context, host,
                                          use_slave=use_slave)
 
 
+def instance_get_all_columns_by_host(context, host, columns, use_slave=False):
+    """Get the values of some columns of all instances belonging to a host."""
+    return IMPL.instance_get_all_columns_by_host(context, host, columns,
+                                                 use_slave=use_slave)
+
+
 def instance_get_all_by_host_and_node(context, host, node,
                                       columns_to_join=None):
     """Get all instances belonging to a node."""
@@ -780,6 +811,17 @@ def instance_update_and_get_original(context, instance_uuid, values,
     return rv
 
 
+def instance_update_many(context, instance_uuids, values):
+    """Set the same properties on several instances in one update.
+
+    Cells are not notified of the updates.
+
+    :returns: a dict of the errors of the instances which were not updated,
+              by uuid.
+    """
+    return IMPL.instance_update_many(context, instance_uuids, values)
+
+
 def instance_add_security_group(context, instance_id, security_group_id):
     """Associate the given security group with the given instance."""
     return IMPL.instance_add_security_group(context, instance_id,
@@ -1144,6 +1186,26 @@ def quota_reserve(context, resources, quotas, user_quotas, deltas, expire,
                               project_id=project_id, user_id=user_id)
 
 
+def quota_reserve_conditional(context, resources, quotas, user_quotas, deltas,
+                              expire, until_refresh, max_age, project_id=None,
+                              user_id=None, refresh_due=True):
+    """Check quotas and create appropriate reservations without locking the
+    quota usages.
+    """
+    return IMPL.quota_reserve_conditional(context, resources, quotas,
+                                          user_quotas, deltas, expire,
+                                          until_refresh, max_age,
+                                          project_id=project_id,
+                                          user_id=user_id,
+                                          refresh_due=refresh_due)
+
+
+def quota_usage_refresh(context, resources, until_refresh, max_age):
+    """Refresh the quota usages which are out of sync or due for a refresh."""
+    return IMPL.quota_usage_refresh(context, resources, until_refresh,
+                                    max_age)
+
+
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1933,13 +1995,18 @@ def task_log_get(context, task_name, period_beginning,
 ####################
 
 
-def archive_deleted_rows(context, max_rows=None):
+def archive_deleted_rows(context, max_rows=None, workers=1,
+                         max_rows_per_second=None, checkpoint=None):
     """Move up to max_rows rows from production tables to corresponding shadow
     tables.
 
-    :returns: number of rows archived.
+    :returns: dictionary of the number of rows archived and the time spent,
+              by table.
     """
-    return IMPL.archive_deleted_rows(context, max_rows=max_rows)
+    return IMPL.archive_deleted_rows(context, max_rows=max_rows,
+                                     workers=workers,
+                                     max_rows_per_second=max_rows_per_second,
+                                     checkpoint=checkpoint)
 
 
 def archive_deleted_rows_for_table(context, tablename, max_rows=None):
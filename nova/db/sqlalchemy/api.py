@@ -21,11 +21,13 @@ import collections
 import copy
 import datetime
 import functools
+import random
 import sys
 import threading
 import time
 import uuid
 
+import eventlet
 from oslo_config import cfg
 from oslo_db import exception as db_exc
 from oslo_db import options as oslo_db_options
@@ -39,6 +41,8 @@ import retrying
 import six
 from sqlalchemy import and_
 from sqlalchemy import Boolean
+from sqlalchemy import DateTime
+from sqlalchemy import event
 from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy import Integer
 from sqlalchemy import MetaData
@@ -63,10 +67,12 @@ from nova import block_device
 from nova.compute import task_states
 from nova.compute import vm_states
 import nova.context
+from nova.db.sqlalchemy import metrics
 from nova.db.sqlalchemy import models
 from nova import exception
 from nova.i18n import _, _LI, _LE, _LW
 from nova import quota
+from nova import utils
 
 db_opts = [
     cfg.StrOpt('osapi_compute_unique_server_name_scope',
@@ -74,6 +80,28 @@ db_opts = [
                help='When set, compute API will consider duplicate hostnames '
                     'invalid within the specified scope, regardless of case. '
                     'Should be empty, "project" or "global".'),
+    cfg.BoolOpt('slave_read_routing',
+                default=False,
+                help='Run the read-only database API functions on '
+                     '[database]slave_connection, unless the request '
+                     'already wrote to the database.'),
+    cfg.ListOpt('slave_read_allow',
+                default=[],
+                help='If set, only these read-only database API functions '
+                     'are run on the slave database.'),
+    cfg.ListOpt('slave_read_deny',
+                default=[],
+                help='Read-only database API functions which are never run '
+                     'on the slave database.'),
+    cfg.IntOpt('slave_read_max_lag',
+               default=0,
+               help='Maximum replication lag in seconds of the slave '
+                    'database for reads to be run on it, 0 to not check '
+                    'it. The lag is only measured on MySQL and PostgreSQL.'),
+    cfg.IntOpt('slave_lag_check_interval',
+               default=10,
+               help='Interval in seconds between two measures of the '
+                    'replication lag of the slave database.'),
 ]
 
 api_db_opts = [
@@ -141,7 +169,7 @@ _LOCK = threading.Lock()
 def _create_facade(conf_group):
 
     # NOTE(dheeraj): This fragment is copied from oslo.db
-    return db_session.EngineFacade(
+    facade = db_session.EngineFacade(
         sql_connection=conf_group.connection,
         slave_connection=conf_group.slave_connection,
         sqlite_fk=False,
@@ -157,6 +185,15 @@ def _create_facade(conf_group):
         connection_trace=conf_group.connection_trace,
         max_retries=conf_group.max_retries,
         retry_interval=conf_group.retry_interval)
+    if CONF.db_metrics:
+        db_metrics = metrics.get_metrics()
+        db_metrics.instrument_engine(facade.get_engine())
+        if conf_group.slave_connection:
+            db_metrics.instrument_engine(facade.get_engine(use_slave=True))
+    if CONF.slave_read_routing and conf_group.slave_connection:
+        event.listen(facade.get_engine(), 'before_cursor_execute',
+                     _note_write)
+    return facade
 
 
 def _create_facade_lazily(facade, conf_group):
@@ -171,7 +208,7 @@ def _create_facade_lazily(facade, conf_group):
 def get_engine(use_slave=False):
     conf_group = CONF.database
     facade = _create_facade_lazily(_MAIN_FACADE, conf_group)
-    return facade.get_engine(use_slave=use_slave)
+    return facade.get_engine(use_slave=use_slave or _routed_to_slave())
 
 
 def get_api_engine():
@@ -183,7 +220,8 @@ def get_api_engine():
 def get_session(use_slave=False, **kwargs):
     conf_group = CONF.database
     facade = _create_facade_lazily(_MAIN_FACADE, conf_group)
-    return facade.get_session(use_slave=use_slave, **kwargs)
+    return facade.get_session(use_slave=use_slave or _routed_to_slave(),
+                              **kwargs)
 
 
 def get_api_session(**kwargs):
@@ -192,6 +230,127 @@ def get_api_session(**kwargs):
     return facade.get_session(**kwargs)
 
 
+# The routing of the database API call running in the current thread
+_routing = threading.local()
+
+_SLAVE_LAG_CHECK = {'checked_at': None, 'lag_ok': False}
+
+_WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def read_only(f):
+    """Decorator declaring a database API function as read-only.
+
+    When slave_read_routing is set, the read-only functions called through
+    the database API run on the slave database, as far as the allow and
+    deny lists, the replication lag and the writes of the request permit.
+    It must be the outermost decorator.
+    """
+    f.read_only = True
+    return f
+
+
+def _routed_to_slave():
+    return getattr(_routing, 'use_slave', False)
+
+
+def _slave_lag():
+    """Return the replication lag of the slave database in seconds, or None
+    if it cannot be measured.
+    """
+    engine = get_engine(use_slave=True)
+    try:
+        if engine.dialect.name == 'mysql':
+            status = engine.execute('SHOW SLAVE STATUS').first()
+            return status['Seconds_Behind_Master'] if status else None
+        if engine.dialect.name == 'postgresql':
+            return engine.execute(
+                'SELECT EXTRACT(EPOCH FROM now() - '
+                'pg_last_xact_replay_timestamp())').scalar()
+    except Exception:
+        LOG.exception(_LE("Failed to measure the replication lag of the "
+                          "slave database"))
+        return None
+    # The lag of the other backends is not guarded
+    return 0
+
+
+def _slave_lag_ok():
+    if CONF.slave_read_max_lag <= 0:
+        return True
+    now = time.time()
+    checked_at = _SLAVE_LAG_CHECK['checked_at']
+    if checked_at is None or now - checked_at >= CONF.slave_lag_check_interval:
+        _SLAVE_LAG_CHECK['checked_at'] = now
+        lag = _slave_lag()
+        lag_ok = lag is not None and lag <= CONF.slave_read_max_lag
+        if not lag_ok and _SLAVE_LAG_CHECK['lag_ok']:
+            LOG.warning(_LW("The replication lag of the slave database is "
+                            "%(lag)s seconds, reading from the master "
+                            "database"), {'lag': lag})
+        _SLAVE_LAG_CHECK['lag_ok'] = lag_ok
+    return _SLAVE_LAG_CHECK['lag_ok']
+
+
+def _route_to_slave(context, name):
+    """Return whether the read-only API function name should run on the
+    slave database for the request context.
+    """
+    if not CONF.database.slave_connection:
+        return False
+    if name in CONF.slave_read_deny:
+        return False
+    if CONF.slave_read_allow and name not in CONF.slave_read_allow:
+        return False
+    # The request must read its own writes
+    if getattr(context, 'db_wrote', False):
+        return False
+    return _slave_lag_ok()
+
+
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    """Flag the request running a statement on the master database if the
+    statement writes.
+    """
+    request_context = getattr(_routing, 'context', None)
+    if (request_context is not None and
+            statement.lstrip()[:7].upper().startswith(_WRITE_STATEMENTS)):
+        request_context.db_wrote = True
+
+
+class _ReplicaRoutingBackend(object):
+    """Proxy of this module running its read-only functions on the slave
+    database, and flagging the requests which write to the master one.
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            if getattr(_routing, 'active', False):
+                return attr(*args, **kwargs)
+            context = args[0] if args else kwargs.get('context')
+            if not isinstance(context, nova.context.RequestContext):
+                context = None
+            _routing.active = True
+            _routing.context = context
+            _routing.use_slave = (getattr(attr, 'read_only', False) and
+                                  _route_to_slave(context, name))
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                _routing.active = False
+                _routing.context = None
+                _routing.use_slave = False
+        return wrapper
+
+
 _SHADOW_TABLE_PREFIX = 'shadow_'
 _DEFAULT_QUOTA_NAME = 'default'
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
@@ -199,7 +358,12 @@ PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
 
 def get_backend():
     """The backend is this module itself."""
-    return sys.modules[__name__]
+    backend = sys.modules[__name__]
+    if CONF.slave_read_routing:
+        backend = _ReplicaRoutingBackend(backend)
+    if CONF.db_metrics:
+        backend = metrics.MeteredBackend(backend, metrics.get_metrics())
+    return backend
 
 
 def require_admin_context(f):
@@ -617,6 +781,16 @@ def compute_node_get_all(context):
     return model_query(context, models.ComputeNode, read_deleted='no').all()
 
 
+@require_admin_context
+def compute_node_get_all_changed_since(context, changes_since):
+    changes_since = timeutils.normalize_time(changes_since)
+    return model_query(context, models.ComputeNode, read_deleted='yes').\
+        filter(or_(models.ComputeNode.created_at >= changes_since,
+                   models.ComputeNode.updated_at >= changes_since,
+                   models.ComputeNode.deleted_at >= changes_since)).\
+        all()
+
+
 @require_admin_context
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -1511,6 +1685,7 @@ def virtual_interface_get_by_uuid(context, vif_uuid):
     return vif_ref
 
 
+@read_only
 @require_context
 @require_instance_exists_using_uuid
 def virtual_interface_get_by_instance(context, instance_uuid, use_slave=False):
@@ -1738,6 +1913,7 @@ def instance_destroy(context, instance_uuid, constraint=None):
     return instance_ref
 
 
+@read_only
 @require_context
 def instance_get_by_uuid(context, uuid, columns_to_join=None, use_slave=False):
     return _instance_get_by_uuid(context, uuid,
@@ -1758,6 +1934,7 @@ def _instance_get_by_uuid(context, uuid, session=None,
     return result
 
 
+@read_only
 @require_context
 def instance_get(context, instance_id, columns_to_join=None):
     try:
@@ -1888,6 +2065,7 @@ def instance_get_all(context, columns_to_join=None):
     return _instances_fill_metadata(context, instances, manual_joins)
 
 
+@read_only
 @require_context
 def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                 limit=None, marker=None, columns_to_join=None,
@@ -1906,6 +2084,7 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                             sort_dirs=[sort_dir])
 
 
+@read_only
 @require_context
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, use_slave=False,
@@ -1960,6 +2139,9 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     |        'tag-any: [some-any-tag, some-another-any-tag]
     |    }
 
+    The marker is either the uuid of the last instance of the previous page
+    or a page token built by nova.utils.encode_page_token for that instance.
+
     """
     # NOTE(mriedem): If the limit is 0 there is no point in even going
     # to the database since nothing is going to be returned anyway.
@@ -1974,7 +2156,120 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         use_slave = False
 
     session = get_session(use_slave=use_slave)
+    query_prefix, manual_joins, deleted = _instance_get_all_by_filters_query(
+        context, session, filters, columns_to_join)
+
+    # A page token carries the sort values of the last row of the previous
+    # page, which saves looking that row up and allows a plain range scan
+    seek_values = None
+    if utils.is_page_token(marker):
+        token = utils.decode_page_token(marker)
+        seek_values = _page_token_seek_values(token, sort_keys, sort_dirs)
+        marker = token['marker']
+    if seek_values is not None:
+        query_prefix = _keyset_paginate_query(query_prefix, models.Instance,
+                                              limit, sort_keys, sort_dirs,
+                                              seek_values)
+        return _instances_fill_metadata(context, query_prefix.all(),
+                                        manual_joins)
+
+    # paginate query
+    if marker is not None:
+        try:
+            if deleted:
+                marker = _instance_get_by_uuid(
+                    context.elevated(read_deleted='yes'), marker,
+                    session=session)
+            else:
+                marker = _instance_get_by_uuid(context,
+                                               marker, session=session)
+        except exception.InstanceNotFound:
+            raise exception.MarkerNotFound(marker)
+    try:
+        query_prefix = sqlalchemyutils.paginate_query(query_prefix,
+                               models.Instance, limit,
+                               sort_keys,
+                               marker=marker,
+                               sort_dirs=sort_dirs)
+    except db_exc.InvalidSortKey:
+        raise exception.InvalidSortKey()
+
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+
+
+def _page_token_seek_values(token, sort_keys, sort_dirs):
+    """Returns the values of a page token for the given sort keys.
+
+    None is returned when the token was built for other sort keys or
+    directions, or does not have a non null value for all of them, in which
+    case the marker of the token has to be looked up instead.
+    """
+    token_keys, token_dirs = process_sort_params(token['sort_keys'],
+                                                 token['sort_dirs'],
+                                                 default_dir='desc')
+    if token_keys != sort_keys or token_dirs != sort_dirs:
+        return None
+    seek_values = []
+    for key in sort_keys:
+        value = token['values'].get(key)
+        if value is None:
+            return None
+        column = getattr(models.Instance, key, None)
+        if column is None:
+            raise exception.InvalidSortKey()
+        if isinstance(getattr(column, 'type', None), DateTime):
+            try:
+                value = timeutils.normalize_time(
+                    timeutils.parse_isotime(value))
+            except ValueError:
+                raise exception.InvalidPageToken(token=token['marker'])
+        seek_values.append(value)
+    return seek_values
+
+
+def _keyset_paginate_query(query, model, limit, sort_keys, sort_dirs,
+                           seek_values):
+    """Returns a query of the rows sorted after the given sort values.
+
+    Unlike paginate_query, the previous row is given by its sort values.
+    The comparison on the first sort key is also applied on its own, so
+    that an index on that key can be used for a range scan.
+    """
+    criteria = []
+    for index, (key, sort_dir, value) in enumerate(
+            zip(sort_keys, sort_dirs, seek_values)):
+        column = getattr(model, key, None)
+        if column is None:
+            raise exception.InvalidSortKey()
+        if sort_dir == 'asc':
+            query = query.order_by(asc(column))
+            after = column > value
+        else:
+            query = query.order_by(desc(column))
+            after = column < value
+        if index == 0:
+            query = query.filter(column >= value if sort_dir == 'asc'
+                                 else column <= value)
+        ties = [getattr(model, prev_key) == prev_value
+                for prev_key, prev_value in zip(sort_keys[:index],
+                                                seek_values[:index])]
+        criteria.append(and_(*(ties + [after])))
+    query = query.filter(or_(*criteria))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _instance_get_all_by_filters_query(context, session, filters,
+                                       columns_to_join):
+    """Build the query of the instances matching filters.
+
+    See instance_get_all_by_filters_sort for the filters supported.
 
+    :returns: tuple of (query, manual_joins, deleted) where manual_joins are
+              the columns to fill with _instances_fill_metadata and deleted
+              tells whether deleted instances were asked for
+    """
     if columns_to_join is None:
         columns_to_join_new = ['info_cache', 'security_groups']
         manual_joins = ['metadata', 'system_metadata']
@@ -2076,28 +2371,46 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     query_prefix = _regex_instance_filter(query_prefix, filters)
     query_prefix = _tag_instance_filter(context, query_prefix, filters)
 
-    # paginate query
-    if marker is not None:
-        try:
-            if deleted:
-                marker = _instance_get_by_uuid(
-                    context.elevated(read_deleted='yes'), marker,
-                    session=session)
-            else:
-                marker = _instance_get_by_uuid(context,
-                                               marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
-    try:
-        query_prefix = sqlalchemyutils.paginate_query(query_prefix,
-                               models.Instance, limit,
-                               sort_keys,
-                               marker=marker,
-                               sort_dirs=sort_dirs)
-    except db_exc.InvalidSortKey:
-        raise exception.InvalidSortKey()
+    return query_prefix, manual_joins, deleted
 
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+
+@require_context
+def instance_get_all_by_filters_chunked(context, filters, chunk_size=1000,
+                                        after_uuid=None, columns_to_join=None,
+                                        use_slave=False):
+    """Yield the instances matching all filters in chunks ordered by uuid.
+
+    Unlike instance_get_all_by_filters_sort, at most chunk_size instances
+    are read at once and their metadata and system metadata are filled one
+    chunk at a time, so the memory used does not grow with the number of
+    instances matching.
+
+    Each chunk is a list of instance dicts. The chunks are in ascending uuid
+    order, starting after the instance with the uuid after_uuid if given.
+    The filters supported are those of instance_get_all_by_filters_sort.
+    """
+    if CONF.database.slave_connection == '':
+        use_slave = False
+
+    session = get_session(use_slave=use_slave)
+    query_prefix, manual_joins, deleted = _instance_get_all_by_filters_query(
+        context, session, filters, columns_to_join)
+    query_prefix = query_prefix.order_by(asc(models.Instance.uuid))
+
+    while True:
+        query = query_prefix
+        if after_uuid is not None:
+            # The uuid of the last instance read is the bound of the next
+            # chunk, instead of an offset the database would have to skip
+            query = query.filter(models.Instance.uuid > after_uuid)
+        instances = query.limit(chunk_size).all()
+        if not instances:
+            return
+        yield _instances_fill_metadata(context, instances, manual_joins,
+                                       use_slave=use_slave)
+        if len(instances) < chunk_size:
+            return
+        after_uuid = instances[-1]['uuid']
 
 
 def _tag_instance_filter(context, query, filters):
@@ -2171,17 +2484,90 @@ def _get_regexp_op_for_connection(db_connection):
     return regexp_op_map.get(db_string, 'LIKE')
 
 
+_REGEX_SPECIAL_CHARS = frozenset('.^$*+?{}[]|()')
+_REGEX_QUANTIFIERS = frozenset('*+?{')
+
+
+def _regex_literal_prefix(pattern):
+    """Returns the literal text a regular expression starts with.
+
+    Escaped punctuation is taken literally, and the prefix stops at the first
+    character with a special meaning. A character followed by a quantifier
+    is left out of the prefix as it may not be matched.
+
+    :returns: tuple of (prefix, rest) where rest is the part of the pattern
+              following the prefix
+    """
+    prefix = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        length = 1
+        if char == '\\':
+            if index + 1 == len(pattern) or pattern[index + 1].isalnum():
+                # Character classes such as \d or \w are not literal
+                break
+            char = pattern[index + 1]
+            length = 2
+        elif char in _REGEX_SPECIAL_CHARS:
+            break
+        if (index + length < len(pattern) and
+                pattern[index + length] in _REGEX_QUANTIFIERS):
+            break
+        prefix.append(char)
+        index += length
+    return ''.join(prefix), pattern[index:]
+
+
+def _escape_like(value, escape='!'):
+    for char in (escape, '%', '_'):
+        value = value.replace(char, escape + char)
+    return value
+
+
+def _plan_regex_filter(column_attr, pattern):
+    """Finds a predicate an index on the column can serve for a regex filter.
+
+    A pattern anchored at both ends around a literal, like '^web1$', is
+    the same as an equality. A pattern anchored at the start of the value
+    with a literal prefix, like '^web-[0-9]+', can only match values with
+    that prefix. Other patterns have to be matched against every row.
+
+    :returns: tuple of (plan, predicate, needs_regex) where plan names the
+              predicate, which is None when no index can be used, and
+              needs_regex tells whether the regular expression itself must
+              still be applied
+    """
+    # An alternation could match without the anchor
+    if not pattern.startswith('^') or '|' in pattern:
+        return 'regex', None, True
+    prefix, rest = _regex_literal_prefix(pattern[1:])
+    if not prefix:
+        return 'regex', None, True
+    if rest == '$':
+        return 'equal', column_attr == prefix, False
+    return ('prefix',
+            column_attr.like(_escape_like(prefix) + '%', escape='!'),
+            True)
+
+
 def _regex_instance_filter(query, filters):
     """Applies regular expression filtering to an Instance query.
 
     Returns the updated query.
 
+    Anchored patterns are turned into equality or prefix predicates first,
+    see _plan_regex_filter, so that the database does not have to evaluate
+    the regular expression against the whole table. The plan chosen for
+    each filter is logged at debug level.
+
     :param query: query to apply filters to
     :param filters: dictionary of filters with regex values
     """
 
     model = models.Instance
     db_regexp_op = _get_regexp_op_for_connection(CONF.database.connection)
+    plans = []
     for filter_name in filters.iterkeys():
         try:
             column_attr = getattr(model, filter_name)
@@ -2189,12 +2575,22 @@ def _regex_instance_filter(query, filters):
             continue
         if 'property' == type(column_attr).__name__:
             continue
+        pattern = str(filters[filter_name])
         if db_regexp_op == 'LIKE':
+            plans.append((filter_name, 'like'))
             query = query.filter(column_attr.op(db_regexp_op)(
-                                 '%' + str(filters[filter_name]) + '%'))
-        else:
-            query = query.filter(column_attr.op(db_regexp_op)(
-                                 str(filters[filter_name])))
+                                 '%' + pattern + '%'))
+            continue
+        plan, predicate, needs_regex = _plan_regex_filter(column_attr,
+                                                          pattern)
+        plans.append((filter_name, plan))
+        if predicate is not None:
+            query = query.filter(predicate)
+        if needs_regex:
+            query = query.filter(column_attr.op(db_regexp_op)(pattern))
+    if plans:
+        LOG.debug("Instance regex filters planned as: %s",
+                  ', '.join('%s=%s' % plan for plan in sorted(plans)))
     return query
 
 
@@ -2320,6 +2716,7 @@ def process_sort_params(sort_keys, sort_dirs,
     return result_keys, result_dirs
 
 
+@read_only
 @require_context
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None,
@@ -2382,6 +2779,21 @@ def instance_get_all_by_host(context, host,
                               use_slave=use_slave)
 
 
+@require_admin_context
+def instance_get_all_columns_by_host(context, host, columns, use_slave=False):
+    """Return the values of some columns of the instances on a given host.
+
+    Returns a list of tuples, one per non-deleted instance, with the values
+    of the columns in the requested order. This is a Core query, no Instance
+    model objects are built.
+    """
+    table = models.Instance.__table__
+    query = sql.select([table.c[column] for column in columns]).\
+        where(and_(table.c.host == host, table.c.deleted == 0))
+    engine = get_engine(use_slave=use_slave)
+    return [tuple(row) for row in engine.execute(query)]
+
+
 def _instance_get_all_uuids_by_host(context, host, session=None):
     """Return a list of the instance uuids on a given host.
 
@@ -2506,6 +2918,102 @@ def _instance_metadata_update_in_place(context, instance, metadata_type, model,
         instance[metadata_type].append(newitem)
 
 
+def _pop_expected_states(values):
+    """Pops the expected task and vm states out of instance update values.
+
+    :returns: a tuple of the form (expected_task_states, expected_vm_states),
+              each None if the state is not to be checked.
+    """
+    expected_states = []
+    for key in ('expected_task_state', 'expected_vm_state'):
+        expected = None
+        if key in values:
+            # it is not a db column so always pop out
+            expected = values.pop(key)
+            if not isinstance(expected, (tuple, list, set)):
+                expected = (expected,)
+        expected_states.append(expected)
+    return tuple(expected_states)
+
+
+def _instance_state_conflict(task_state, vm_state, expected_task_state,
+                             expected_vm_state):
+    """Returns the error for an instance not in the expected states, or None
+    if it is.
+    """
+    if expected_task_state is not None and (
+            task_state not in expected_task_state):
+        if task_state == task_states.DELETING:
+            return exception.UnexpectedDeletingTaskStateError(
+                    actual=task_state, expected=expected_task_state)
+        else:
+            return exception.UnexpectedTaskStateError(
+                    actual=task_state, expected=expected_task_state)
+    if expected_vm_state is not None and vm_state not in expected_vm_state:
+        return exception.UnexpectedVMStateError(actual=vm_state,
+                                                expected=expected_vm_state)
+    return None
+
+
+@require_context
+@_retry_on_deadlock
+def instance_update_many(context, instance_uuids, values):
+    """Set the same column values on several instances in one update.
+
+    :param values: = dict containing column values, which may not include
+                     hostname, metadata or system_metadata. The
+                     expected_task_state and expected_vm_state keys are
+                     checked for each instance as in instance_update.
+
+    :returns: a dict of the errors of the instances which were not updated,
+              by uuid: InstanceNotFound, or the error instance_update would
+              have raised because of the task or vm state of the instance.
+    """
+    values = dict(values)
+    for key in ('hostname', 'metadata', 'system_metadata'):
+        if key in values:
+            raise exception.InvalidInput(
+                reason=_('%s cannot be updated on several instances at '
+                         'once') % key)
+    expected_task_state, expected_vm_state = _pop_expected_states(values)
+    _handle_objects_related_type_conversions(values)
+
+    conflicts = {}
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.Instance,
+                           (models.Instance.uuid,
+                            models.Instance.task_state,
+                            models.Instance.vm_state),
+                           session=session, project_only=True).\
+                filter(models.Instance.uuid.in_(instance_uuids)).\
+                with_lockmode('update').\
+                all()
+        states = {uuid: (task_state, vm_state)
+                  for uuid, task_state, vm_state in rows}
+
+        to_update = []
+        for instance_uuid in instance_uuids:
+            if instance_uuid not in states:
+                conflicts[instance_uuid] = exception.InstanceNotFound(
+                        instance_id=instance_uuid)
+                continue
+            conflict = _instance_state_conflict(
+                    states[instance_uuid][0], states[instance_uuid][1],
+                    expected_task_state, expected_vm_state)
+            if conflict:
+                conflicts[instance_uuid] = conflict
+            else:
+                to_update.append(instance_uuid)
+
+        if to_update and values:
+            model_query(context, models.Instance, session=session).\
+                    filter(models.Instance.uuid.in_(to_update)).\
+                    update(values, synchronize_session=False)
+
+    return conflicts
+
+
 @_retry_on_deadlock
 def _instance_update(context, instance_uuid, values, copy_old_instance=False,
                      columns_to_join=None):
@@ -2518,27 +3026,13 @@ def _instance_update(context, instance_uuid, values, copy_old_instance=False,
         instance_ref = _instance_get_by_uuid(context, instance_uuid,
                                              session=session,
                                              columns_to_join=columns_to_join)
-        if "expected_task_state" in values:
-            # it is not a db column so always pop out
-            expected = values.pop("expected_task_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["task_state"]
-            if actual_state not in expected:
-                if actual_state == task_states.DELETING:
-                    raise exception.UnexpectedDeletingTaskStateError(
-                            actual=actual_state, expected=expected)
-                else:
-                    raise exception.UnexpectedTaskStateError(
-                            actual=actual_state, expected=expected)
-        if "expected_vm_state" in values:
-            expected = values.pop("expected_vm_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["vm_state"]
-            if actual_state not in expected:
-                raise exception.UnexpectedVMStateError(actual=actual_state,
-                                                       expected=expected)
+        expected_task_state, expected_vm_state = _pop_expected_states(values)
+        conflict = _instance_state_conflict(instance_ref["task_state"],
+                                            instance_ref["vm_state"],
+                                            expected_task_state,
+                                            expected_vm_state)
+        if conflict:
+            raise conflict
 
         instance_hostname = instance_ref['hostname'] or ''
         if ("hostname" in values and
@@ -2595,6 +3089,7 @@ def instance_remove_security_group(context, instance_uuid, security_group_id):
 ###################
 
 
+@read_only
 @require_context
 def instance_info_cache_get(context, instance_uuid):
     """Gets an instance info cache from the table.
@@ -2666,6 +3161,7 @@ def instance_extra_update_by_uuid(context, instance_uuid, values):
         update(values)
 
 
+@read_only
 def instance_extra_get_by_instance_uuid(context, instance_uuid,
                                         columns=None):
     query = model_query(context, models.InstanceExtra).\
@@ -2703,6 +3199,7 @@ def key_pair_destroy(context, user_id, name):
         raise exception.KeypairNotFound(user_id=user_id, name=name)
 
 
+@read_only
 @require_context
 def key_pair_get(context, user_id, name):
     nova.context.authorize_user_context(context, user_id)
@@ -2717,6 +3214,7 @@ def key_pair_get(context, user_id, name):
     return result
 
 
+@read_only
 @require_context
 def key_pair_get_all_by_user(context, user_id):
     nova.context.authorize_user_context(context, user_id)
@@ -3336,13 +3834,14 @@ def _reservation_create(uuid, usage, project_id, user_id, resource,
 # on reservations.
 
 def _get_project_user_quota_usages(context, session, project_id,
-                                   user_id):
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-                   filter_by(project_id=project_id).\
-                   with_lockmode('update').\
-                   all()
+                                   user_id, lock=True):
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+                   filter_by(project_id=project_id)
+    if lock:
+        query = query.with_lockmode('update')
+    rows = query.all()
     proj_result = dict()
     user_result = dict()
     # Get the total count of in_use,reserved
@@ -3629,6 +4128,290 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
     return reservations
 
 
+# The conditional reservation path below takes no lock on the
+# quota_usages rows while checking the quotas. The usage of a user is
+# checked and reserved by a single UPDATE of its row, which sees the latest
+# committed counts of that row. The project limit of the resources counted
+# per user spans the rows of several users, so it is checked once the
+# reservations are committed, and they are undone if the project went over
+# its limit.
+
+_QUOTA_RESERVE_CONDITIONAL_RETRIES = 3
+
+
+class _QuotaUsageOverLimit(Exception):
+    """Raised when a conditional reservation finds usages over their limit."""
+
+    def __init__(self, overs):
+        super(_QuotaUsageOverLimit, self).__init__()
+        self.overs = overs
+
+
+@_retry_on_deadlock
+def _quota_usages_refresh(context, resources, keys, until_refresh,
+                          project_id, user_id):
+    """Refreshes usages of a user from the sync functions of the resources.
+
+    :param keys: names of the resources whose usage is refreshed, along with
+                 any other resource refreshed by the same sync functions.
+    :returns: number of usages refreshed.
+    """
+    elevated = context.elevated()
+    refreshed = 0
+    session = get_session()
+    with session.begin():
+        _project_usages, user_usages = _get_project_user_quota_usages(
+                context, session, project_id, user_id)
+        work = set(keys)
+        while work:
+            resource = work.pop()
+            sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
+            updates = sync(elevated, project_id, user_id, session)
+            for res, in_use in updates.items():
+                _create_quota_usage_if_missing(user_usages, res,
+                                               until_refresh, project_id,
+                                               user_id, session)
+                _refresh_quota_usages(user_usages[res], until_refresh,
+                                      in_use)
+                # updated_at tells when the usage is due for the next
+                # refresh, even if the refresh did not change it
+                user_usages[res].updated_at = timeutils.utcnow()
+                work.discard(res)
+                refreshed += 1
+    return refreshed
+
+
+def _quota_usage_reserve_conditional(context, session, usage_id, delta,
+                                     limit):
+    """Adds delta to the reserved count of a usage if it stays within limit.
+
+    :returns: True if the usage was updated, False if it would have gone over
+              limit.
+    """
+    query = model_query(context, models.QuotaUsage, read_deleted="no",
+                        session=session).\
+                    filter_by(id=usage_id)
+    if limit >= 0:
+        query = query.filter(models.QuotaUsage.in_use +
+                             models.QuotaUsage.reserved + delta <= limit)
+    # A NULL until_refresh stays NULL
+    result = query.update(
+        {'reserved': models.QuotaUsage.reserved + delta,
+         'until_refresh': models.QuotaUsage.until_refresh - 1},
+        synchronize_session=False)
+    return result == 1
+
+
+@_retry_on_deadlock
+def _quota_reserve_conditional(context, deltas, limits, expire, project_id,
+                               user_id, user_usages):
+    """Reserves deltas in the usages of a user and creates the reservations.
+
+    :param limits: dict of resource keys to the limit the usage record of the
+                   resource is checked against, negative for no limit.
+    :returns: list of reservation UUIDs.
+    :raises: _QuotaUsageOverLimit if any usage would go over its limit, in
+             which case nothing is reserved.
+    """
+    session = get_session()
+    with session.begin():
+        # The usages are updated in a fixed order, so that concurrent
+        # reservations do not deadlock on them.
+        overs = [res for res in sorted(deltas)
+                 if deltas[res] > 0 and
+                 not _quota_usage_reserve_conditional(
+                     context, session, user_usages[res]['id'], deltas[res],
+                     limits[res])]
+        if overs:
+            raise _QuotaUsageOverLimit(overs)
+        return [_reservation_create(str(uuid.uuid4()), user_usages[res],
+                                    project_id, user_id, res, delta, expire,
+                                    session=session).uuid
+                for res, delta in deltas.items()]
+
+
+@_retry_on_deadlock
+def _quota_reserve_conditional_undo(context, reservations, deltas,
+                                    user_usages):
+    session = get_session()
+    with session.begin():
+        for res in sorted(deltas):
+            if deltas[res] > 0:
+                model_query(context, models.QuotaUsage, read_deleted="no",
+                            session=session).\
+                        filter_by(id=user_usages[res]['id']).\
+                        update({'reserved':
+                                    models.QuotaUsage.reserved - deltas[res]},
+                               synchronize_session=False)
+        model_query(context, models.Reservation, read_deleted="no",
+                    session=session).\
+                filter(models.Reservation.uuid.in_(reservations)).\
+                soft_delete(synchronize_session=False)
+
+
+def _quota_usage_project_totals(context, project_id, resources):
+    """Returns the total usage of a project by resource."""
+    rows = model_query(context, models.QuotaUsage,
+                       (models.QuotaUsage.resource,
+                        func.sum(models.QuotaUsage.in_use +
+                                 models.QuotaUsage.reserved)),
+                       read_deleted="no").\
+                filter(models.QuotaUsage.project_id == project_id).\
+                filter(models.QuotaUsage.resource.in_(resources)).\
+                group_by(models.QuotaUsage.resource).\
+                all()
+    return dict(rows)
+
+
+def _is_quota_refresh_due(quota_usage, max_age):
+    """Determines if a reservation takes a usage due for a refresh.
+
+    This is _is_quota_refresh_needed() without counting the reservation
+    down in until_refresh, as the conditional update of the usage does it.
+    """
+    if quota_usage.until_refresh is not None:
+        return quota_usage.until_refresh <= 1
+    return bool(max_age) and (timeutils.utcnow() -
+                              quota_usage.updated_at).seconds >= max_age
+
+
+def _quota_reserve_retry_sleep(attempt):
+    """Waits before retrying a conditional reservation."""
+    time.sleep(random.uniform(0, 0.1 * attempt))
+
+
+@require_context
+def quota_reserve_conditional(context, resources, project_quotas, user_quotas,
+                              deltas, expire, until_refresh, max_age,
+                              project_id=None, user_id=None,
+                              refresh_due=True):
+    """Reserves quotas without locking the quota usages of the user.
+
+    :param refresh_due: whether the usages due for a refresh according to
+                        until_refresh and max_age are refreshed before being
+                        checked. Otherwise they are left to
+                        quota_usage_refresh; the usages which were never
+                        counted or which were reset are refreshed anyway.
+    """
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    # NOTE(Vek): We're only concerned about positive increments.
+    limits = {}
+    project_checked = []
+    for res, delta in deltas.items():
+        limits[res] = -1
+        if user_quotas[res] < 0 or delta < 0:
+            continue
+        limits[res] = user_quotas[res]
+        if project_quotas[res] >= 0:
+            if res in PER_PROJECT_QUOTAS:
+                # The usage record of the resource is the project usage
+                limits[res] = min(limits[res], project_quotas[res])
+            else:
+                project_checked.append(res)
+
+    project_usages, user_usages = _get_project_user_quota_usages(
+            context, get_session(), project_id, user_id, lock=False)
+    # The usages which were never counted or which were reset must be
+    # refreshed before they can be checked. This is rare, so it is done
+    # under the locks of the usages.
+    unsynced = [res for res in deltas
+                if res not in user_usages or user_usages[res].in_use < 0 or
+                (refresh_due and
+                 _is_quota_refresh_due(user_usages[res], max_age))]
+    if unsynced:
+        _quota_usages_refresh(context, resources, unsynced, until_refresh,
+                              project_id, user_id)
+        project_usages, user_usages = _get_project_user_quota_usages(
+                context, get_session(), project_id, user_id, lock=False)
+
+    unders = [res for res, delta in deltas.items()
+              if delta < 0 and
+              delta + user_usages[res].in_use < 0]
+    if unders:
+        LOG.warning(_LW("Change will make usage less than 0 for the following "
+                        "resources: %s"), unders)
+
+    for attempt in range(1, _QUOTA_RESERVE_CONDITIONAL_RETRIES + 1):
+        try:
+            reservations = _quota_reserve_conditional(
+                    context, deltas, limits, expire, project_id, user_id,
+                    user_usages)
+        except _QuotaUsageOverLimit as e:
+            overs = e.overs
+            break
+        if not project_checked:
+            return reservations
+        totals = _quota_usage_project_totals(context, project_id,
+                                             project_checked)
+        overs = [res for res in project_checked
+                 if totals.get(res, 0) > project_quotas[res]]
+        if not overs:
+            return reservations
+        _quota_reserve_conditional_undo(context, reservations, deltas,
+                                        user_usages)
+        # The project may only have been over its limit because of the
+        # reservations of other users being undone as well, so try again
+        # after a random delay.
+        if attempt < _QUOTA_RESERVE_CONDITIONAL_RETRIES:
+            _quota_reserve_retry_sleep(attempt)
+
+    for key, value in user_usages.items():
+        if key not in project_usages:
+            project_usages[key] = value
+    if project_quotas == user_quotas:
+        usages = project_usages
+    else:
+        usages = user_usages
+    usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
+              for k, v in usages.items()}
+    LOG.debug('Raise OverQuota exception because: '
+              'project_quotas: %(project_quotas)s, '
+              'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
+              'overs: %(overs)s, usages: %(usages)s',
+              {'project_quotas': project_quotas,
+               'user_quotas': user_quotas,
+               'overs': overs, 'deltas': deltas,
+               'usages': usages})
+    raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                              usages=usages)
+
+
+@require_admin_context
+def quota_usage_refresh(context, resources, until_refresh, max_age):
+    """Refreshes the usages which are out of sync or due for a refresh.
+
+    :returns: number of usages refreshed.
+    """
+    due = [models.QuotaUsage.in_use < 0,
+           models.QuotaUsage.until_refresh <= 0]
+    if max_age:
+        due.append(models.QuotaUsage.updated_at <= timeutils.utcnow() -
+                   datetime.timedelta(seconds=max_age))
+    rows = model_query(context, models.QuotaUsage,
+                       (models.QuotaUsage.project_id,
+                        models.QuotaUsage.user_id,
+                        models.QuotaUsage.resource),
+                       read_deleted="no").\
+                filter(or_(*due)).\
+                all()
+
+    stale = collections.defaultdict(set)
+    for project_id, user_id, resource in rows:
+        if getattr(resources.get(resource), 'sync', None):
+            stale[project_id, user_id].add(resource)
+
+    refreshed = 0
+    for (project_id, user_id), keys in stale.items():
+        refreshed += _quota_usages_refresh(context, resources, keys,
+                                           until_refresh, project_id,
+                                           user_id)
+    return refreshed
+
+
 def _quota_reservations_query(session, context, reservations):
     """Return the relevant reservations."""
 
@@ -3915,6 +4698,7 @@ def block_device_mapping_update_or_create(context, values, legacy=True):
         return result
 
 
+@read_only
 @require_context
 def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                              use_slave=False):
@@ -4056,6 +4840,7 @@ def security_group_get_by_project(context, project_id):
                         all()
 
 
+@read_only
 @require_context
 def security_group_get_by_instance(context, instance_uuid):
     return _security_group_get_query(context, read_deleted="no").\
@@ -4644,6 +5429,7 @@ def _flavor_get_query(context, session=None, read_deleted=None):
     return query
 
 
+@read_only
 @require_context
 def flavor_get_all(context, inactive=False, filters=None,
                    sort_key='flavorid', sort_dir='asc', limit=None,
@@ -4718,6 +5504,7 @@ def _flavor_get_id_from_flavor(context, flavor_id, session=None):
     return result[0]
 
 
+@read_only
 @require_context
 def flavor_get(context, id):
     """Returns a dict describing specific flavor."""
@@ -4729,6 +5516,7 @@ def flavor_get(context, id):
     return _dict_with_extra_specs(result)
 
 
+@read_only
 @require_context
 def flavor_get_by_name(context, name):
     """Returns a dict describing specific flavor."""
@@ -4740,6 +5528,7 @@ def flavor_get_by_name(context, name):
     return _dict_with_extra_specs(result)
 
 
+@read_only
 @require_context
 def flavor_get_by_flavor_id(context, flavor_id, read_deleted):
     """Returns a dict describing specific flavor_id."""
@@ -4779,6 +5568,7 @@ def _flavor_access_query(context, session=None):
                        read_deleted="no")
 
 
+@read_only
 def flavor_access_get_by_flavor_id(context, flavor_id):
     """Get flavor access list by flavor id."""
     instance_type_id_subq = \
@@ -4826,6 +5616,7 @@ def _flavor_extra_specs_get_query(context, flavor_id, session=None):
                 filter_by(instance_type_id=instance_type_id_subq)
 
 
+@read_only
 @require_context
 def flavor_extra_specs_get(context, flavor_id):
     rows = _flavor_extra_specs_get_query(context, flavor_id).all()
@@ -4950,6 +5741,7 @@ def _instance_metadata_get_query(context, instance_uuid, session=None):
                     filter_by(instance_uuid=instance_uuid)
 
 
+@read_only
 @require_context
 def instance_metadata_get(context, instance_uuid):
     rows = _instance_metadata_get_query(context, instance_uuid).all()
@@ -5016,6 +5808,7 @@ def _instance_system_metadata_get_query(context, instance_uuid, session=None):
                     filter_by(instance_uuid=instance_uuid)
 
 
+@read_only
 @require_context
 def instance_system_metadata_get(context, instance_uuid):
     rows = _instance_system_metadata_get_query(context, instance_uuid).all()
@@ -5639,6 +6432,7 @@ def instance_fault_create(context, values):
     return dict(fault_ref.iteritems())
 
 
+@read_only
 def instance_fault_get_by_instance_uuids(context, instance_uuids):
     """Get all instance faults for the provided instance_uuids."""
     if not instance_uuids:
@@ -5686,6 +6480,7 @@ def action_finish(context, values):
         return query.one()
 
 
+@read_only
 def actions_get(context, instance_uuid):
     """Get all instance actions for the provided uuid."""
     actions = model_query(context, models.InstanceAction).\
@@ -5761,6 +6556,7 @@ def action_event_finish(context, values):
     return event_ref
 
 
+@read_only
 def action_events_get(context, action_id):
     events = model_query(context, models.InstanceActionEvent).\
                          filter_by(action_id=action_id).\
@@ -5917,6 +6713,59 @@ def _get_default_deleted_value(table):
         return None
 
 
+def _archive_deleted_rows_batch(conn, table, shadow_table, max_rows,
+                                after=None):
+    """Move up to max_rows deleted rows of table to its shadow table.
+
+    The rows are taken in the order of their key, starting after the key
+    given by after if any.
+
+    :returns: tuple of (number of rows archived, key of the last row
+              archived or None)
+    :raises: DBError if the rows cannot be deleted, for instance because
+             rows of another table still refer to them
+    """
+    if table.name == "dns_domains":
+        # We have one table (dns_domains) where the key is called
+        # "domain" rather than "id"
+        column = table.c.domain
+    else:
+        column = table.c.id
+    deleted_column = table.c.deleted
+    where = deleted_column != deleted_column.default.arg
+    if after is not None:
+        where = and_(where, column > after)
+    keys = sql.select([column], where).order_by(column).limit(max_rows).\
+        alias('keys')
+    last_key = conn.execute(sql.select([func.max(keys.c[column.name])])).\
+        scalar()
+    if last_key is None:
+        return 0, None
+
+    # The batch is the range of keys up to the last one, which lets both
+    # statements below use the index of the key rather than a LIMIT
+    where = and_(where, column <= last_key)
+    columns = [c.name for c in table.c]
+    insert = shadow_table.insert(inline=True).\
+        from_select(columns, sql.select([table], where))
+    delete = table.delete().where(where)
+    # Group the insert and delete in a transaction.
+    with conn.begin():
+        conn.execute(insert)
+        result_delete = conn.execute(delete)
+    return result_delete.rowcount, last_key
+
+
+def _get_shadow_table(engine, tablename):
+    metadata = MetaData()
+    metadata.bind = engine
+    try:
+        return Table(_SHADOW_TABLE_PREFIX + tablename, metadata,
+                     autoload=True)
+    except NoSuchTableError:
+        return None
+
+
 @require_admin_context
 def archive_deleted_rows_for_table(context, tablename, max_rows):
     """Move up to max_rows rows from one tables to the corresponding
@@ -5924,53 +6773,22 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
 
     :returns: number of rows archived
     """
-    # NOTE(guochbo): There is a circular import, nova.db.sqlalchemy.utils
-    # imports nova.db.sqlalchemy.api.
-    from nova.db.sqlalchemy import utils as db_utils
-
     engine = get_engine()
     conn = engine.connect()
-    metadata = MetaData()
-    metadata.bind = engine
     # NOTE(tdurakov): table metadata should be received
     # from models, not db tables. Default value specified by SoftDeleteMixin
     # is known only by models, not DB layer.
     # IMPORTANT: please do not change source of metadata information for table.
     table = models.BASE.metadata.tables[tablename]
 
-    shadow_tablename = _SHADOW_TABLE_PREFIX + tablename
-    rows_archived = 0
-    try:
-        shadow_table = Table(shadow_tablename, metadata, autoload=True)
-    except NoSuchTableError:
+    shadow_table = _get_shadow_table(engine, tablename)
+    if shadow_table is None:
         # No corresponding shadow table; skip it.
-        return rows_archived
+        return 0
 
-    if tablename == "dns_domains":
-        # We have one table (dns_domains) where the key is called
-        # "domain" rather than "id"
-        column = table.c.domain
-    else:
-        column = table.c.id
-    # NOTE(guochbo): Use DeleteFromSelect to avoid
-    # database's limit of maximum parameter in one SQL statement.
-    deleted_column = table.c.deleted
-    columns = [c.name for c in table.c]
-    insert = shadow_table.insert(inline=True).\
-        from_select(columns,
-                    sql.select([table],
-                               deleted_column != deleted_column.default.arg).
-                    order_by(column).limit(max_rows))
-    query_delete = sql.select([column],
-                          deleted_column != deleted_column.default.arg).\
-                          order_by(column).limit(max_rows)
-
-    delete_statement = db_utils.DeleteFromSelect(table, query_delete, column)
     try:
-        # Group the insert and delete in a transaction.
-        with conn.begin():
-            conn.execute(insert)
-            result_delete = conn.execute(delete_statement)
+        rows_archived, _last_key = _archive_deleted_rows_batch(
+            conn, table, shadow_table, max_rows)
     except db_exc.DBError:
         # TODO(ekudryashova): replace by DBReferenceError when db layer
         # raise it.
@@ -5979,32 +6797,165 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
         # skip this table for now; we'll come back to it later.
         msg = _("IntegrityError detected when archiving table %s") % tablename
         LOG.warn(msg)
-        return rows_archived
-
-    rows_archived = result_delete.rowcount
+        return 0
 
     return rows_archived
 
 
+def _archive_table_levels():
+    """Returns the names of the tables grouped in the order to archive them.
+
+    A table referring to another by a foreign key is in an earlier group
+    than the other one, so that its rows are archived before the rows they
+    refer to. The tables of a group do not refer to each other.
+    """
+    tables = models.BASE.metadata.tables
+    children = collections.defaultdict(set)
+    for table in tables.values():
+        for foreign_key in table.foreign_keys:
+            parent = foreign_key.column.table.name
+            if parent != table.name:
+                children[parent].add(table.name)
+
+    levels = {}
+    visiting = set()
+
+    def _level(tablename):
+        if tablename in visiting:
+            # The foreign keys of the tables being visited loop back to this
+            # one, ignore the one leading here to break the cycle
+            LOG.warning(_LW("Foreign keys of table %s form a cycle, its rows "
+                            "may not be archived in order"), tablename)
+            return -1
+        if tablename not in levels:
+            visiting.add(tablename)
+            levels[tablename] = 1 + max(
+                [_level(child) for child in children[tablename]] or [-1])
+            visiting.discard(tablename)
+        return levels[tablename]
+
+    groups = collections.defaultdict(list)
+    for tablename in tables:
+        groups[_level(tablename)].append(tablename)
+    return [sorted(groups[level]) for level in sorted(groups)]
+
+
+class _ArchiveRun(object):
+    """The state shared by the tables archived in one archive_deleted_rows.
+
+    The tables archived concurrently are handled by green threads, which
+    only switch on database or sleep calls, so the counters need no lock.
+    """
+
+    def __init__(self, max_rows, max_rows_per_second):
+        self.rows_left = max_rows
+        self.max_rows_per_second = max_rows_per_second
+        self.rows_archived = 0
+        self.start = time.time()
+
+    def take(self, rows):
+        """Reserve up to rows rows of the budget, returns how many."""
+        if self.rows_left is None:
+            return rows
+        rows = max(0, min(rows, self.rows_left))
+        self.rows_left -= rows
+        return rows
+
+    def archived(self, rows_reserved, rows):
+        """Record a batch, and wait to stay under the rate limit."""
+        if self.rows_left is not None:
+            # A batch may move more rows than it reserved
+            self.rows_left = max(0, self.rows_left + rows_reserved - rows)
+        self.rows_archived += rows
+        if rows and self.max_rows_per_second:
+            delay = (self.rows_archived / float(self.max_rows_per_second) -
+                     (time.time() - self.start))
+            if delay > 0:
+                time.sleep(delay)
+
+
+def _archive_deleted_rows_for_table_run(engine, tablename, run, batch_size,
+                                        checkpoint):
+    table = models.BASE.metadata.tables[tablename]
+    stats = {'rows': 0, 'seconds': 0.0}
+    if 'deleted' not in table.c:
+        return stats
+    shadow_table = _get_shadow_table(engine, tablename)
+    if shadow_table is None:
+        return stats
+
+    start = time.time()
+    conn = engine.connect()
+    after = checkpoint.get(tablename)
+    try:
+        while True:
+            rows_reserved = run.take(batch_size)
+            if not rows_reserved:
+                break
+            try:
+                rows, last_key = _archive_deleted_rows_batch(
+                    conn, table, shadow_table, rows_reserved, after=after)
+            except db_exc.DBError:
+                run.archived(rows_reserved, 0)
+                LOG.warn(_LW("IntegrityError detected when archiving table "
+                             "%s"), tablename)
+                break
+            run.archived(rows_reserved, rows)
+            stats['rows'] += rows
+            if last_key is not None:
+                after = checkpoint[tablename] = last_key
+            elif after is not None:
+                # Rows may have been deleted behind the checkpoint since it
+                # was taken, start over from the beginning of the table
+                after = None
+                checkpoint.pop(tablename, None)
+            else:
+                break
+    finally:
+        conn.close()
+    stats['seconds'] = time.time() - start
+    return stats
+
+
 @require_admin_context
-def archive_deleted_rows(context, max_rows=None):
+def archive_deleted_rows(context, max_rows=None, workers=1,
+                         max_rows_per_second=None, checkpoint=None,
+                         batch_size=1000):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
-    :returns: Number of rows archived.
+    The tables are archived in the order of their foreign keys, the tables
+    referring to others first, and the tables which do not refer to each
+    other are archived by up to workers green threads at once. The rows of
+    each table are moved in batches of batch_size rows in the order of
+    their key.
+
+    :param max_rows: maximum number of rows to archive, or None to archive
+                     all the deleted rows
+    :param max_rows_per_second: maximum rate of the archiving, if any
+    :param checkpoint: dictionary of the key of the last row archived by
+                       table, updated as the rows are archived. A run given
+                       the checkpoint of a previous run resumes from there.
+    :returns: dictionary of the number of rows archived and the time spent,
+              by table
     """
     # The context argument is only used for the decorator.
-    tablenames = []
-    for model_class in models.__dict__.itervalues():
-        if hasattr(model_class, "__tablename__"):
-            tablenames.append(model_class.__tablename__)
-    rows_archived = 0
-    for tablename in tablenames:
-        rows_archived += archive_deleted_rows_for_table(context, tablename,
-                                         max_rows=max_rows - rows_archived)
-        if rows_archived >= max_rows:
+    if checkpoint is None:
+        checkpoint = {}
+    engine = get_engine()
+    run = _ArchiveRun(max_rows, max_rows_per_second)
+    pool = eventlet.GreenPool(max(workers, 1))
+    table_stats = {}
+    for tablenames in _archive_table_levels():
+        for tablename, stats in zip(tablenames, pool.imap(
+                lambda tablename: _archive_deleted_rows_for_table_run(
+                    engine, tablename, run, batch_size, checkpoint),
+                tablenames)):
+            if stats['rows']:
+                table_stats[tablename] = stats
+        if run.rows_left == 0:
             break
-    return rows_archived
+    return table_stats
 
 
 def _augment_flavor_to_migrate(flavor_to_migrate, db_flavor):
@@ -6491,6 +7442,7 @@ def instance_tag_set(context, instance_uuid, tags):
             resource_id=instance_uuid).all()
 
 
+@read_only
 def instance_tag_get_by_instance_uuid(context, instance_uuid):
     session = get_session()
 
@@ -0,0 +1,302 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Opt-in metrics of the database API and engines.
+
+When db_metrics is set, the calls of the functions of the database API,
+the statements they run and the time spent waiting for a pooled connection
+are accounted for in a per process registry. The registry is logged on
+SIGUSR2 and every db_metrics_log_interval seconds, and each time it is also
+written to db_metrics_dir, where nova-manage db stats reads it.
+"""
+
+import bisect
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+from sqlalchemy import event
+
+from nova.i18n import _LE
+from nova.i18n import _LI
+from nova.openstack.common import fileutils
+from nova.openstack.common import loopingcall
+from nova import paths
+from nova import utils
+
+
+metrics_opts = [
+    cfg.BoolOpt('db_metrics',
+                default=False,
+                help='Record the calls, statements, rows and latency of the '
+                     'database API functions, and the time spent waiting '
+                     'for a pooled database connection.'),
+    cfg.IntOpt('db_metrics_log_interval',
+               default=0,
+               help='Interval in seconds between logs of the database '
+                    'metrics. 0 disables the periodic log, the metrics are '
+                    'still logged on SIGUSR2.'),
+    cfg.StrOpt('db_metrics_dir',
+               default=paths.state_path_def('db_metrics'),
+               help='Directory where every process writes its database '
+                    'metrics when they are logged.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(metrics_opts)
+
+LOG = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds of the buckets of the latency histograms, the
+# last bucket holds everything slower
+LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# Name under which the statements run outside of an API function, like the
+# connection pings, are accounted for
+OTHER = '<other>'
+
+_local = threading.local()
+
+
+def _new_function_stats():
+    return {'calls': 0, 'statements': 0, 'rows': 0, 'seconds': 0.0,
+            'latency': [0] * (len(LATENCY_BUCKETS) + 1)}
+
+
+def _new_pool_stats():
+    return {'checkouts': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+            'latency': [0] * (len(LATENCY_BUCKETS) + 1)}
+
+
+def _bucket(seconds):
+    return bisect.bisect_left(LATENCY_BUCKETS, seconds * 1000)
+
+
+class DbMetrics(object):
+    """The database metrics of a process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.functions = {}
+        self.pool = _new_pool_stats()
+
+    def call(self, name, function, *args, **kwargs):
+        """Call an API function, accounting for it and its statements.
+
+        API functions called by another one are accounted for as part of
+        the outermost one.
+        """
+        if getattr(_local, 'function', None) is not None:
+            return function(*args, **kwargs)
+        _local.function = name
+        start = time.time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.function = None
+            seconds = time.time() - start
+            with self._lock:
+                stats = self.functions.setdefault(name,
+                                                  _new_function_stats())
+                stats['calls'] += 1
+                stats['seconds'] += seconds
+                stats['latency'][_bucket(seconds)] += 1
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        name = getattr(_local, 'function', None) or OTHER
+        # Drivers report -1 when they do not know the number of rows
+        rows = max(cursor.rowcount, 0)
+        with self._lock:
+            stats = self.functions.setdefault(name, _new_function_stats())
+            stats['statements'] += 1
+            stats['rows'] += rows
+
+    def _record_pool_wait(self, seconds):
+        with self._lock:
+            self.pool['checkouts'] += 1
+            self.pool['seconds'] += seconds
+            self.pool['max_seconds'] = max(self.pool['max_seconds'],
+                                           seconds)
+            self.pool['latency'][_bucket(seconds)] += 1
+
+    def instrument_engine(self, engine):
+        """Account for the statements and pool checkouts of an engine."""
+        event.listen(engine, 'after_cursor_execute',
+                     self._after_cursor_execute)
+        # The pool has no event fired before a checkout, so the method
+        # waiting for a free connection is timed instead
+        do_get = engine.pool._do_get
+
+        @functools.wraps(do_get)
+        def _do_get():
+            start = time.time()
+            try:
+                return do_get()
+            finally:
+                self._record_pool_wait(time.time() - start)
+
+        engine.pool._do_get = _do_get
+
+    def report(self):
+        """Return a snapshot of the metrics, which can be serialized."""
+        with self._lock:
+            functions = {name: dict(stats, latency=stats['latency'][:])
+                         for name, stats in self.functions.items()}
+            pool = dict(self.pool, latency=self.pool['latency'][:])
+        return {'pid': os.getpid(),
+                'process': os.path.basename(sys.argv[0]),
+                'started_at': self.started_at,
+                'reported_at': time.time(),
+                'functions': functions,
+                'pool': pool}
+
+
+class MeteredBackend(object):
+    """Proxy of the database API backend accounting for its calls."""
+
+    def __init__(self, backend, metrics):
+        self._backend = backend
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            return self._metrics.call(name, attr, *args, **kwargs)
+        return wrapper
+
+
+_METRICS = None
+_LOCK = threading.Lock()
+
+
+def get_metrics():
+    """Return the metrics of the process, starting their reports the first
+    time.
+    """
+    global _METRICS
+    if _METRICS is None:
+        with _LOCK:
+            if _METRICS is None:
+                _METRICS = DbMetrics()
+                _start_reports()
+    return _METRICS
+
+
+def _dump_safely():
+    try:
+        dump()
+    except Exception:
+        LOG.exception(_LE("Failed to dump the database metrics"))
+
+
+def _dump_on_signal(signum, frame):
+    # The signal may interrupt the thread holding the lock of the metrics,
+    # so the report is taken in a green thread of its own
+    utils.spawn_n(_dump_safely)
+
+
+def _start_reports():
+    if hasattr(signal, 'SIGUSR2'):
+        signal.signal(signal.SIGUSR2, _dump_on_signal)
+    if CONF.db_metrics_log_interval > 0:
+        timer = loopingcall.FixedIntervalLoopingCall(dump)
+        timer.start(interval=CONF.db_metrics_log_interval,
+                    initial_delay=CONF.db_metrics_log_interval)
+
+
+def format_report(report):
+    """Return the lines of a human readable version of a report."""
+    lines = ['%-48s %8s %10s %10s %10s %s' % (
+        'function', 'calls', 'statements', 'rows', 'avg ms',
+        'latency ms <=%s,>%s' % (','.join(str(b) for b in LATENCY_BUCKETS),
+                                 LATENCY_BUCKETS[-1]))]
+    for name, stats in sorted(report['functions'].items()):
+        average = stats['seconds'] * 1000 / max(stats['calls'], 1)
+        lines.append('%-48s %8d %10d %10d %10.1f %s' % (
+            name, stats['calls'], stats['statements'], stats['rows'],
+            average, ','.join(str(count) for count in stats['latency'])))
+    pool = report['pool']
+    lines.append('pool: %d checkouts, %.1f ms average wait, %.1f ms max '
+                 'wait, latency ms %s' % (
+                     pool['checkouts'],
+                     pool['seconds'] * 1000 / max(pool['checkouts'], 1),
+                     pool['max_seconds'] * 1000,
+                     ','.join(str(count) for count in pool['latency'])))
+    return lines
+
+
+def merge_reports(reports):
+    """Sum the reports of several processes into one."""
+    merged = {'functions': {}, 'pool': _new_pool_stats()}
+    for report in reports:
+        for name, stats in report['functions'].items():
+            total = merged['functions'].setdefault(name,
+                                                   _new_function_stats())
+            for key in ('calls', 'statements', 'rows', 'seconds'):
+                total[key] += stats[key]
+            total['latency'] = [a + b for a, b in zip(total['latency'],
+                                                      stats['latency'])]
+        pool = merged['pool']
+        for key in ('checkouts', 'seconds'):
+            pool[key] += report['pool'][key]
+        pool['max_seconds'] = max(pool['max_seconds'],
+                                  report['pool']['max_seconds'])
+        pool['latency'] = [a + b for a, b in zip(pool['latency'],
+                                                 report['pool']['latency'])]
+    return merged
+
+
+def report_path(report):
+    return os.path.join(CONF.db_metrics_dir, '%s.%d.json' % (
+        report['process'], report['pid']))
+
+
+def dump():
+    """Log the metrics of the process and write them to db_metrics_dir."""
+    report = get_metrics().report()
+    LOG.info(_LI("Database metrics since %s:"),
+             time.strftime('%Y-%m-%d %H:%M:%S',
+                           time.localtime(report['started_at'])))
+    for line in format_report(report):
+        LOG.info(line)
+    path = report_path(report)
+    fileutils.ensure_tree(CONF.db_metrics_dir)
+    with open(path + '.tmp', 'w') as f:
+        jsonutils.dump(report, f)
+    os.rename(path + '.tmp', path)
+
+
+def read_reports():
+    """Return the last reports written by every process."""
+    reports = []
+    if not os.path.isdir(CONF.db_metrics_dir):
+        return reports
+    for name in sorted(os.listdir(CONF.db_metrics_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(CONF.db_metrics_dir, name)) as f:
+                reports.append(jsonutils.load(f))
+    return reports
@@ -379,6 +379,10 @@ class InvalidSortKey(Invalid):
     msg_fmt = _("Sort key supplied was not valid.")
 
 
+class InvalidPageToken(Invalid):
+    msg_fmt = _("Page token %(token)s is not valid.")
+
+
 class InvalidStrTime(Invalid):
     msg_fmt = _("Invalid datetime string: %(reason)s")
 
@@ -17,6 +17,8 @@
 Filter support
 """
 
+import time
+
 from oslo_log import log as logging
 
 from nova.i18n import _LI
@@ -48,6 +50,14 @@ class BaseFilter(object):
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to true in a subclass if, within a request, the result of the
+    # filter for an object can only change when that object itself changes
+    # (e.g. when resources are consumed from it, which is the only thing
+    # changing the result of the resource filters). For the following
+    # instances of the request, the filter is then only run again on the
+    # objects which changed.
+    stateless = False
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
@@ -65,17 +75,41 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
-    def get_filtered_objects(self, filters, objs, filter_properties, index=0):
+    # Object with a record() method called with the time spent in each filter
+    # and the number of objects it eliminated, see
+    # nova.scheduler.stats.SchedulerStats
+    stats = None
+
+    def get_filtered_objects(self, filters, objs, filter_properties, index=0,
+                             changed_objs=None):
+        """Return the objects passing all the filters.
+
+        For the instances after the first one of a request, objs has to be
+        the list of objects returned for the previous instance. If
+        changed_objs is also given, the stateless filters are only run on
+        the objects of changed_objs, the others having already passed them.
+        """
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
         for filter in filters:
             if filter.run_filter_for_index(index):
                 cls_name = filter.__class__.__name__
-                objs = filter.filter_all(list_objs, filter_properties)
+                start = time.time()
+                if index > 0 and changed_objs is not None and filter.stateless:
+                    objs = self._filter_changed_objects(filter, list_objs,
+                                                        changed_objs,
+                                                        filter_properties)
+                else:
+                    objs = filter.filter_all(list_objs, filter_properties)
                 if objs is None:
                     LOG.debug("Filter %s says to stop filtering", cls_name)
                     return
+                num_objs = len(list_objs)
                 list_objs = list(objs)
+                if self.stats is not None:
+                    self.stats.record('filters', cls_name,
+                                      time.time() - start, num_objs,
+                                      len(list_objs))
                 if not list_objs:
                     LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
                     break
@@ -83,3 +117,22 @@ class BaseFilterHandler(loadables.BaseLoader):
                           "%(obj_len)d host(s)",
                           {'cls_name': cls_name, 'obj_len': len(list_objs)})
         return list_objs
+
+    @staticmethod
+    def _filter_changed_objects(filter, list_objs, changed_objs,
+                                filter_properties):
+        """Run a stateless filter on the changed objects only.
+
+        The unchanged objects of list_objs passed the filter for the previous
+        instance of the request, so they still pass it.
+        """
+        changed_objs = set(changed_objs)
+        objs_to_filter = [obj for obj in list_objs if obj in changed_objs]
+        if not objs_to_filter:
+            return list_objs
+        passing_objs = filter.filter_all(objs_to_filter, filter_properties)
+        if passing_objs is None:
+            return None
+        passing_objs = set(passing_objs)
+        return [obj for obj in list_objs
+                if obj not in changed_objs or obj in passing_objs]
@@ -22,6 +22,7 @@ import functools
 import traceback
 
 import netaddr
+from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_utils import timeutils
@@ -36,8 +37,36 @@ from nova.openstack.common import versionutils
 from nova import utils
 
 
+objects_opts = [
+    cfg.BoolOpt('verify_db_hydration',
+                default=False,
+                help='Set the values read from the database into objects '
+                     'through their fields, which coerces and validates '
+                     'them, rather than trusting the values having the '
+                     'type of their field. This is slower, for debugging.'),
+    cfg.BoolOpt('send_object_deltas',
+                default=False,
+                help='When the save() of an object is remoted to conductor, '
+                     'send only its changed fields and the fields '
+                     'identifying it, and receive back only the fields '
+                     'conductor modified. Requires every conductor to '
+                     'support version 2.2 of the conductor API.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(objects_opts)
+
 LOG = logging.getLogger('object')
 
+# The python types of the values read from the database which already
+# have the type of their field, by field type
+_DB_TRUSTED_TYPES = {
+    obj_fields.Integer: six.integer_types,
+    obj_fields.Float: (float,),
+    obj_fields.Boolean: (bool,),
+    obj_fields.String: (six.text_type,),
+}
+
 
 class NotSpecifiedSentinel(object):
     pass
@@ -100,6 +129,65 @@ def make_class_properties(cls):
         setattr(cls, name, property(getter, setter, deleter))
 
 
+def _is_simple_field(field):
+    """Return whether the values of field are their own primitives."""
+    field_type = type(field._type)
+    return (type(field).to_primitive == obj_fields.Field.to_primitive and
+            type(field).from_primitive == obj_fields.Field.from_primitive and
+            field_type.to_primitive == obj_fields.FieldType.to_primitive and
+            field_type.from_primitive == obj_fields.FieldType.from_primitive)
+
+
+def _db_trusted_types(field):
+    """Return the types of the database values stored as they are in field.
+    """
+    if type(field).coerce != obj_fields.Field.coerce:
+        return None
+    for field_type in type(field._type).__mro__:
+        if field_type in _DB_TRUSTED_TYPES:
+            return _DB_TRUSTED_TYPES[field_type]
+    return None
+
+
+def make_primitive_table(cls):
+    """Build the table used to (de)serialize the fields of cls.
+
+    Each entry is (name, attrname, field, coerce). coerce is the coerce()
+    of the type of the fields which are simple, like strings, integers or
+    booleans: their values are their own primitives, so they are copied
+    as they are by obj_to_primitive() and only coerced when hydrated. It is
+    None for the other fields.
+
+    This also builds the table used by obj_set_from_db().
+    """
+    cls._obj_primitive_table = tuple(
+        (name, get_attrname(name), field,
+         field._type.coerce if _is_simple_field(field) else None)
+        for name, field in cls.fields.items())
+    cls._obj_db_table = {
+        name: (get_attrname(name), field, _db_trusted_types(field))
+        for name, field in cls.fields.items()}
+
+
+def make_compact_slots(bases, dict_):
+    """Return the __slots__ of a compact object class.
+
+    They hold the storage of the fields, the context and the changed fields
+    of the objects, along with the attributes the class lists in its own
+    __slots__, less the slots its bases already have.
+    """
+    names = set(dict_.get('fields', {}))
+    for base in bases:
+        names.update(getattr(base, 'fields', {}))
+    slots = set(dict_.get('__slots__', ()))
+    slots.update(get_attrname(name) for name in names)
+    slots.update(['_context', '_changed_fields'])
+    for base in bases:
+        for supercls in base.__mro__:
+            slots.difference_update(supercls.__dict__.get('__slots__', ()))
+    return tuple(sorted(slots))
+
+
 class NovaObjectMetaclass(type):
     """Metaclass that allows tracking of object classes."""
 
@@ -107,6 +195,15 @@ class NovaObjectMetaclass(type):
     # remoted. If this is not None, use it to remote things over RPC.
     indirection_api = None
 
+    def __new__(mcs, name, bases, dict_):
+        compact = dict_.get('obj_compact',
+                            any(getattr(base, 'obj_compact', False)
+                                for base in bases))
+        if compact:
+            dict_ = dict(dict_, __slots__=make_compact_slots(bases, dict_))
+        return super(NovaObjectMetaclass, mcs).__new__(mcs, name, bases,
+                                                       dict_)
+
     def __init__(cls, names, bases, dict_):
         if not hasattr(cls, '_obj_classes'):
             # This means this is a base class using the metaclass. I.e.,
@@ -121,6 +218,7 @@ class NovaObjectMetaclass(type):
         # same version already exists, replace it. Otherwise,
         # keep the list with newest version first.
         make_class_properties(cls)
+        make_primitive_table(cls)
         obj_name = cls.obj_name()
         for i, obj in enumerate(cls._obj_classes[obj_name]):
             if cls.VERSION == obj.VERSION:
@@ -188,8 +286,17 @@ def remotable(fn):
             raise exception.OrphanedObjectError(method=fn.__name__,
                                                 objtype=self.obj_name())
         if NovaObject.indirection_api:
-            updates, result = NovaObject.indirection_api.object_action(
-                self._context, self, fn.__name__, args, kwargs)
+            delta = None
+            if (fn.__name__ == 'save' and CONF.send_object_deltas and
+                    self.obj_delta_fields is not None):
+                delta = self.obj_delta_clone()
+            if delta is not None:
+                updates, result = (
+                    NovaObject.indirection_api.object_delta_action(
+                        self._context, delta, fn.__name__, args, kwargs))
+            else:
+                updates, result = NovaObject.indirection_api.object_action(
+                    self._context, self, fn.__name__, args, kwargs)
             for key, value in updates.iteritems():
                 if key in self.fields:
                     field = self.fields[key]
@@ -245,6 +352,25 @@ class NovaObject(object):
     fields = {}
     obj_extra_fields = []
 
+    # Built for each class by make_primitive_table()
+    _obj_primitive_table = ()
+    _obj_db_table = {}
+
+    # Whether the fields of the objects are stored in __slots__ rather than
+    # in their __dict__, which saves memory. Attributes of the objects other
+    # than their fields have to be listed in the __slots__ of their class
+    # for the objects to have no __dict__ at all.
+    obj_compact = False
+
+    # The fields identifying an object, sent to conductor along with its
+    # changed fields when its save() is remoted with send_object_deltas set.
+    # None if save() needs the whole object.
+    obj_delta_fields = None
+
+    # Groups of fields sent together when one of them changed, because
+    # save() reads all of them to save any one
+    obj_delta_groups = ()
+
     # Table of sub-object versioning information
     #
     # This contains a list of version mappings, by the field name of
@@ -327,13 +453,27 @@ class NovaObject(object):
     def _obj_from_primitive(cls, context, objver, primitive):
         self = cls()
         self._context = context
-        self.VERSION = objver
+        if objver != cls.VERSION or not cls.obj_compact:
+            # Compact objects do not grow a __dict__ for their version
+            # unless it differs from the one of their class
+            self.VERSION = objver
         objdata = primitive['nova_object.data']
         changes = primitive.get('nova_object.changes', [])
-        for name, field in self.fields.items():
-            if name in objdata:
-                setattr(self, name, field.from_primitive(self, name,
-                                                         objdata[name]))
+        # This sets the storage of the fields directly rather than
+        # through their properties, which only adds the read-only checks
+        # and changes tracking a new object has no use for.
+        for name, attrname, field, coerce in cls._obj_primitive_table:
+            if name not in objdata:
+                continue
+            value = objdata[name]
+            if value is None:
+                value = field.coerce(self, name, value)
+            elif coerce is not None:
+                value = coerce(self, name, value)
+            else:
+                value = field.coerce(self, name,
+                                     field.from_primitive(self, name, value))
+            setattr(self, attrname, value)
         self._changed_fields = set([x for x in changes if x in self.fields])
         return self
 
@@ -373,6 +513,29 @@ class NovaObject(object):
         """Create a copy."""
         return copy.deepcopy(self)
 
+    def obj_delta_clone(self):
+        """Create a copy holding only the changed fields and the
+        obj_delta_fields, or None if the whole object has to be sent.
+        """
+        changes = self.obj_what_changed()
+        names = changes.union(self.obj_delta_fields)
+        for group in self.obj_delta_groups:
+            if not changes.intersection(group):
+                continue
+            # save() would lazy-load the missing ones on the other side,
+            # overwriting the changed ones
+            if not all(self.obj_attr_is_set(name) for name in group):
+                return None
+            names.update(group)
+        nobj = self.__class__()
+        nobj._context = self._context
+        nobj.VERSION = self.VERSION
+        for name in names:
+            if self.obj_attr_is_set(name):
+                setattr(nobj, name, getattr(self, name))
+        nobj._changed_fields = changes
+        return nobj
+
     def obj_calculate_child_version(self, target_version, child):
         """Calculate the appropriate version for a child object.
 
@@ -490,13 +653,17 @@ class NovaObject(object):
     def obj_to_primitive(self, target_version=None):
         """Simple base-case dehydration.
 
-        This calls to_primitive() for each item in fields.
+        This calls to_primitive() for each item in fields which is not
+        simple, see make_primitive_table().
         """
         primitive = dict()
-        for name, field in self.fields.items():
-            if self.obj_attr_is_set(name):
-                primitive[name] = field.to_primitive(self, name,
-                                                     getattr(self, name))
+        for name, attrname, field, coerce in self._obj_primitive_table:
+            if not hasattr(self, attrname):
+                continue
+            value = getattr(self, attrname)
+            if coerce is None:
+                value = field.to_primitive(self, name, value)
+            primitive[name] = value
         if target_version:
             self.obj_make_compatible(primitive, target_version)
         obj = {'nova_object.name': self.obj_name(),
@@ -826,8 +993,17 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
     ability to serialize and deserialize NovaObject entities. Any service
     that needs to accept or return NovaObjects as arguments or result values
     should pass this to its RPCClient and RPCServer objects.
+
+    If a version_manifest mapping object names to versions is given, the
+    objects newer than those versions are backported to them before being
+    serialized, so that a service only knowing them does not have to ask
+    conductor to backport the objects it receives.
     """
 
+    def __init__(self, version_manifest=None):
+        super(NovaObjectSerializer, self).__init__()
+        self.version_manifest = version_manifest
+
     @property
     def conductor(self):
         if not hasattr(self, '_conductor'):
@@ -872,13 +1048,32 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
                 iterable = list
             return iterable([action_fn(context, value) for value in values])
 
+    def _target_version(self, obj):
+        """Return the version obj has to be backported to, or None."""
+        if not self.version_manifest or not isinstance(obj, NovaObject):
+            return None
+        target_version = self.version_manifest.get(obj.obj_name())
+        if target_version is None:
+            return None
+        target = utils.convert_version_to_tuple(target_version)
+        current = utils.convert_version_to_tuple(obj.VERSION)
+        # Only a minor version can be backported to
+        if target[0] != current[0] or target >= current:
+            return None
+        return target_version
+
     def serialize_entity(self, context, entity):
         if isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.serialize_entity,
                                             entity)
         elif (hasattr(entity, 'obj_to_primitive') and
               callable(entity.obj_to_primitive)):
-            entity = entity.obj_to_primitive()
+            target_version = self._target_version(entity)
+            if target_version is not None:
+                entity = entity.obj_to_primitive(
+                    target_version=target_version)
+            else:
+                entity = entity.obj_to_primitive()
         return entity
 
     def deserialize_entity(self, context, entity):
@@ -890,6 +1085,13 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
         return entity
 
 
+def obj_version_manifest():
+    """Return the newest version of every object class, by object name."""
+    return {obj_name: classes[0].VERSION
+            for obj_name, classes in NovaObject._obj_classes.items()
+            if classes}
+
+
 def obj_to_primitive(obj):
     """Recursively turn an object into a python primitive.
 
@@ -912,6 +1114,35 @@ def obj_to_primitive(obj):
         return obj
 
 
+def obj_set_from_db(obj, db_obj, names):
+    """Set some fields of an object to their values in a database row.
+
+    The values which already have the type of their field, like the
+    integers, booleans and unicode strings of our database, are trusted:
+    they are stored as they are without going through the field properties,
+    so without coercion nor change tracking. The other values, like
+    datetimes, are coerced. As usual when loading an object from the
+    database, callers reset its changes afterwards. With verify_db_hydration
+    set, every value goes through its field property instead.
+
+    :param:obj: The NovaObject to set
+    :param:db_obj: The database row
+    :param:names: The names of the fields to set, which are also the keys of
+                  their values in db_obj
+    """
+    if CONF.verify_db_hydration:
+        for name in names:
+            setattr(obj, name, db_obj[name])
+        return
+    table = obj._obj_db_table
+    for name in names:
+        attrname, field, trusted_types = table[name]
+        value = db_obj[name]
+        if trusted_types is None or not isinstance(value, trusted_types):
+            value = field.coerce(obj, name, value)
+        setattr(obj, attrname, value)
+
+
 def obj_make_list(context, list_obj, item_cls, db_list, **extra_args):
     """Construct an object list from a list of primitives.
 
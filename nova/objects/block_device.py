@@ -83,10 +83,10 @@ class BlockDeviceMapping(base.NovaPersistentObject, base.NovaObject,
                         db_block_device, expected_attrs=None):
         if expected_attrs is None:
             expected_attrs = []
-        for key in block_device_obj.fields:
-            if key in BLOCK_DEVICE_OPTIONAL_ATTRS:
-                continue
-            block_device_obj[key] = db_block_device[key]
+        base.obj_set_from_db(
+            block_device_obj, db_block_device,
+            [key for key in block_device_obj.fields
+             if key not in BLOCK_DEVICE_OPTIONAL_ATTRS])
         if 'instance' in expected_attrs:
             my_inst = objects.Instance(context)
             my_inst._from_db_object(context, my_inst,
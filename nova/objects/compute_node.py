@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 from nova import db
 from nova import exception
@@ -77,6 +78,10 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
         'supported_hv_specs': [('1.6', '1.0')],
     }
 
+    # A scheduler holds a compute node for every host
+    obj_compact = True
+    __slots__ = ('_cached_service',)
+
     def obj_make_compatible(self, primitive, target_version):
         super(ComputeNode, self).obj_make_compatible(primitive, target_version)
         target_version = utils.convert_version_to_tuple(target_version)
@@ -285,7 +290,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.9 ComputeNode version 1.9
     # Version 1.10 ComputeNode version 1.10
     # Version 1.11 ComputeNode version 1.11
-    VERSION = '1.11'
+    # Version 1.12 Add _get_all_changed_since()
+    VERSION = '1.12'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -303,6 +309,7 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         '1.9': '1.9',
         '1.10': '1.10',
         '1.11': '1.11',
+        '1.12': '1.11',
         }
 
     @base.remotable_classmethod
@@ -311,6 +318,32 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.remotable_classmethod
+    def _get_all_changed_since(cls, context, changes_since):
+        # We need to convert the timestamp string back to a
+        # timezone-aware datetime object for the DB API call.
+        changes_since = timeutils.parse_isotime(changes_since)
+        db_computes = db.compute_node_get_all_changed_since(context,
+                                                            changes_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
+    @classmethod
+    def get_all_changed_since(cls, context, changes_since):
+        """Get the compute nodes created, updated or deleted since a time.
+
+        Deleted compute nodes are returned as well, with their deleted
+        field set, so that callers can drop them from their own view.
+
+        :param:context: nova request context
+        :param:changes_since: datetime from which changes are returned
+        :returns: ComputeNodeList
+        """
+        # We have to convert the datetime object to a string
+        # primitive for the remote call.
+        changes_since = timeutils.isotime(changes_since)
+        return cls._get_all_changed_since(context, changes_since)
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import copy
 
 from oslo_config import cfg
@@ -269,6 +270,17 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         'ec2_ids': [('1.20', '1.0')],
     }
 
+    # save() looks the instance up by uuid, and updated_at stamps the
+    # version of the instance conductor saves
+    obj_delta_fields = ('id', 'uuid', 'cell_name', 'updated_at')
+
+    # Saving any of the flavors writes the three of them
+    obj_delta_groups = (('flavor', 'old_flavor', 'new_flavor'),)
+
+    # Hosts and services hold many instances at once
+    obj_compact = True
+    __slots__ = ('_orig_metadata', '_orig_system_metadata')
+
     def __init__(self, *args, **kwargs):
         super(Instance, self).__init__(*args, **kwargs)
         self._reset_metadata_tracking()
@@ -481,15 +493,9 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         if expected_attrs is None:
             expected_attrs = []
         # Most of the field names match right now, so be quick
-        for field in instance.fields:
-            if field in INSTANCE_OPTIONAL_ATTRS:
-                continue
-            elif field == 'deleted':
-                instance.deleted = db_inst['deleted'] == db_inst['id']
-            elif field == 'cleaned':
-                instance.cleaned = db_inst['cleaned'] == 1
-            else:
-                instance[field] = db_inst[field]
+        base.obj_set_from_db(instance, db_inst, _INSTANCE_COLUMN_FIELDS)
+        instance.deleted = db_inst['deleted'] == db_inst['id']
+        instance.cleaned = db_inst['cleaned'] == 1
 
         if 'metadata' in expected_attrs:
             instance['metadata'] = utils.instance_meta(db_inst)
@@ -865,6 +871,23 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         notifications.send_update(context, old_ref, new_ref)
         self.obj_reset_changes()
 
+    def _get_bulk_updates(self):
+        """Returns the column updates InstanceList.bulk_save() can write for
+        this instance along with other instances, or None if it has to be
+        saved on its own.
+        """
+        self._maybe_upgrade_flavor()
+        updates = {}
+        for field in self.obj_what_changed():
+            if (isinstance(self.fields[field], fields.ObjectField) or
+                    field in ('hostname', 'metadata', 'system_metadata')):
+                return None
+            updates[field] = self[field]
+        # Cleaned needs to be turned back into an int here
+        if 'cleaned' in updates:
+            updates['cleaned'] = 1 if updates['cleaned'] else 0
+        return updates
+
     @base.remotable
     def refresh(self, use_slave=False):
         extra = [field for field in INSTANCE_OPTIONAL_ATTRS
@@ -1062,6 +1085,39 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             self.obj_reset_changes(['metadata'])
 
 
+# The fields of Instance whose values are the columns of the same names
+_INSTANCE_COLUMN_FIELDS = [field for field in Instance.fields
+                           if field not in INSTANCE_OPTIONAL_ATTRS and
+                           field not in ('deleted', 'cleaned')]
+
+
+# The classes of the records returned by InstanceList.get_columns_by_host(),
+# by tuple of column names
+_INSTANCE_RECORD_CLASSES = {}
+
+
+def _get_instance_record_class(columns):
+    """Return a read-only record class holding the given Instance columns.
+
+    The classes are namedtuples, which have __slots__ and no per-record
+    dict, and are shared by all the projections on the same columns.
+    """
+    for column in columns:
+        field = Instance.fields.get(column)
+        if (field is None or column in INSTANCE_OPTIONAL_ATTRS or
+                isinstance(field, (fields.ObjectField,
+                                   fields.DateTimeField))):
+            raise exception.ObjectActionError(
+                action='get_columns_by_host',
+                reason='%s is not a column which can be projected' % column)
+    columns = tuple(columns)
+    record_class = _INSTANCE_RECORD_CLASSES.get(columns)
+    if record_class is None:
+        record_class = collections.namedtuple('InstanceRecord', columns)
+        _INSTANCE_RECORD_CLASSES[columns] = record_class
+    return record_class
+
+
 def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
     get_fault = expected_attrs and 'fault' in expected_attrs
     inst_faults = {}
@@ -1107,7 +1163,10 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 1.15: Instance <= version 1.19
     # Version 1.16: Added get_all() method
     # Version 1.17: Instance <= version 1.20
-    VERSION = '1.17'
+    # Version 1.18: Added get_by_filters_chunk() method
+    # Version 1.19: Added bulk_save() method
+    # Version 1.20: Added _get_columns_by_host() method
+    VERSION = '1.20'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1131,6 +1190,9 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         '1.15': '1.19',
         '1.16': '1.19',
         '1.17': '1.20',
+        '1.18': '1.20',
+        '1.19': '1.20',
+        '1.20': '1.20',
         }
 
     @base.remotable_classmethod
@@ -1151,6 +1213,43 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         return _make_instance_list(context, cls(), db_inst_list,
                                    expected_attrs)
 
+    @base.remotable_classmethod
+    def get_by_filters_chunk(cls, context, filters, after_uuid=None,
+                             limit=1000, expected_attrs=None,
+                             use_slave=False):
+        """Get at most limit instances matching filters, ordered by uuid.
+
+        :param after_uuid: only return the instances with a greater uuid
+        """
+        db_inst_lists = db.instance_get_all_by_filters_chunked(
+            context, filters, chunk_size=limit, after_uuid=after_uuid,
+            columns_to_join=_expected_cols(expected_attrs),
+            use_slave=use_slave)
+        # Only the first chunk is read from the database
+        db_inst_list = next(db_inst_lists, [])
+        return _make_instance_list(context, cls(), db_inst_list,
+                                   expected_attrs)
+
+    @classmethod
+    def iter_by_filters(cls, context, filters, chunk_size=1000,
+                        expected_attrs=None, use_slave=False):
+        """Iterate over the instances matching filters, ordered by uuid.
+
+        The instances are loaded chunk_size at a time, so that walking
+        through all the instances of a big deployment or of a dense host
+        does not hold all of them in memory at once.
+        """
+        after_uuid = None
+        while True:
+            chunk = cls.get_by_filters_chunk(
+                context, filters, after_uuid=after_uuid, limit=chunk_size,
+                expected_attrs=expected_attrs, use_slave=use_slave)
+            for instance in chunk:
+                yield instance
+            if len(chunk) < chunk_size:
+                return
+            after_uuid = chunk[-1].uuid
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host, expected_attrs=None, use_slave=False):
         db_inst_list = db.instance_get_all_by_host(
@@ -1159,6 +1258,26 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         return _make_instance_list(context, cls(), db_inst_list,
                                    expected_attrs)
 
+    @base.remotable_classmethod
+    def _get_columns_by_host(cls, context, host, columns, use_slave=False):
+        return db.instance_get_all_columns_by_host(context, host, columns,
+                                                   use_slave=use_slave)
+
+    @classmethod
+    def get_columns_by_host(cls, context, host, columns, use_slave=False):
+        """Get only some columns of the instances on a host.
+
+        No Instance object is built: this returns a list of read-only
+        records, one per instance, with the requested columns as
+        attributes. It is meant for periodic tasks walking all the
+        instances of a host while only looking at a few of their fields.
+        Joined, extra and datetime fields cannot be projected.
+        """
+        record_class = _get_instance_record_class(columns)
+        rows = cls._get_columns_by_host(context, host, list(columns),
+                                        use_slave=use_slave)
+        return [record_class(*row) for row in rows]
+
     @base.remotable_classmethod
     def get_by_host_and_node(cls, context, host, node, expected_attrs=None):
         db_inst_list = db.instance_get_all_by_host_and_node(
@@ -1246,6 +1365,61 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def get_by_security_group(cls, context, security_group):
         return cls.get_by_security_group_id(context, security_group.id)
 
+    @base.remotable
+    def bulk_save(self, expected_vm_state=None, expected_task_state=None):
+        """Save the updates of the instances of the list.
+
+        The instances with the same column updates are saved with a single
+        database update. The other instances, such as the ones with updates
+        to nested objects or metadata, are saved with Instance.save(), as
+        are all the instances when cells or state change notifications are
+        enabled.
+
+        :param expected_task_state: Optional tuple of valid task states
+                                    for the instances to be in
+        :param expected_vm_state: Optional tuple of valid vm states for the
+                                  instances to be in
+        :returns: a dict of the name of the error which prevented the save of
+                  an instance, by uuid. The instances which were not saved
+                  keep their changes.
+        """
+        bulk = (not cells_opts.get_cell_type() and
+                not CONF.notify_on_state_change)
+        errors = {}
+        groups = {}
+        for instance in self:
+            updates = instance._get_bulk_updates() if bulk else None
+            if updates is None:
+                try:
+                    instance.save(expected_vm_state=expected_vm_state,
+                                  expected_task_state=expected_task_state)
+                except (exception.InstanceNotFound,
+                        exception.UnexpectedTaskStateError,
+                        exception.UnexpectedVMStateError) as e:
+                    errors[instance.uuid] = e.__class__.__name__
+            elif updates:
+                key = tuple(sorted(updates.items()))
+                groups.setdefault(key, []).append(instance)
+
+        for key, instances in groups.items():
+            values = dict(key)
+            values['updated_at'] = timeutils.utcnow()
+            if expected_task_state is not None:
+                values['expected_task_state'] = expected_task_state
+            if expected_vm_state is not None:
+                values['expected_vm_state'] = expected_vm_state
+            conflicts = db.instance_update_many(
+                self._context, [instance.uuid for instance in instances],
+                values)
+            for instance in instances:
+                if instance.uuid in conflicts:
+                    errors[instance.uuid] = (
+                        conflicts[instance.uuid].__class__.__name__)
+                else:
+                    instance.updated_at = values['updated_at']
+                    instance.obj_reset_changes()
+        return errors
+
     def fill_faults(self):
         """Batch query the database for our instances' faults.
 
@@ -49,8 +49,7 @@ class InstanceFault(base.NovaPersistentObject, base.NovaObject,
     @staticmethod
     def _from_db_object(context, fault, db_fault):
         # NOTE(danms): These are identical right now
-        for key in fault.fields:
-            fault[key] = db_fault[key]
+        base.obj_set_from_db(fault, db_fault, fault.fields)
         fault._context = context
         fault.obj_reset_changes()
         return fault
@@ -49,8 +49,7 @@ class KeyPair(base.NovaPersistentObject, base.NovaObject,
 
     @staticmethod
     def _from_db_object(context, keypair, db_keypair):
-        for key in keypair.fields:
-            keypair[key] = db_keypair[key]
+        base.obj_set_from_db(keypair, db_keypair, keypair.fields)
         keypair._context = context
         keypair.obj_reset_changes()
         return keypair
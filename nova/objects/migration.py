@@ -41,8 +41,7 @@ class Migration(base.NovaPersistentObject, base.NovaObject,
 
     @staticmethod
     def _from_db_object(context, migration, db_migration):
-        for key in migration.fields:
-            migration[key] = db_migration[key]
+        base.obj_set_from_db(migration, db_migration, migration.fields)
         migration._context = context
         migration.obj_reset_changes()
         return migration
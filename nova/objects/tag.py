@@ -27,8 +27,7 @@ class Tag(base.NovaObject):
 
     @staticmethod
     def _from_db_object(context, tag, db_tag):
-        for key in tag.fields:
-            setattr(tag, key, db_tag[key])
+        base.obj_set_from_db(tag, db_tag, tag.fields)
         tag.obj_reset_changes()
         tag._context = context
         return tag
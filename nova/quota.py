@@ -24,6 +24,7 @@ from oslo_utils import importutils
 from oslo_utils import timeutils
 import six
 
+from nova import context as nova_context
 from nova import db
 from nova import exception
 from nova.i18n import _LE
@@ -93,6 +94,27 @@ quota_opts = [
                     'Note that quotas are not updated on a periodic task, '
                     'they will update on a new reservation if max_age has '
                     'passed since the last reservation'),
+    cfg.BoolOpt('lock_free_quota_reserve',
+                default=False,
+                help='Reserve quotas with conditional updates of the quota '
+                     'usages rather than by locking all the usages of the '
+                     'user. If quota_usage_refresh_interval is positive, the '
+                     'usages due for a refresh according to until_refresh '
+                     'and max_age are only refreshed by the scheduler, '
+                     'otherwise they are refreshed when reserving.'),
+    cfg.IntOpt('quota_usage_refresh_interval',
+               default=-1,
+               help='How often (in seconds) the scheduler refreshes the '
+                    'quota usages which are out of sync or due for a '
+                    'refresh. A negative value disables the refresh, the '
+                    'usages are then refreshed when reserving.'),
+    cfg.IntOpt('quota_limits_cache_ttl',
+               default=0,
+               help='Number of seconds each process caches the quota limits '
+                    'read from the database for. The cache of a process is '
+                    'cleared when the limits are updated through its API, '
+                    'other processes use the previous limits until their '
+                    'cache expires. 0 disables the cache.'),
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
                help='Default driver to use for quota checks'),
@@ -109,6 +131,55 @@ class DbQuotaDriver(object):
     """
     UNLIMITED_VALUE = -1
 
+    def __init__(self):
+        # The quota limits read from the database, with the time they
+        # expire at, by query
+        self._limits_cache = {}
+
+    def _get_cached_limits(self, key, get, context, *args):
+        """Returns get(context, *args), from the cache if it was read less
+        than quota_limits_cache_ttl seconds ago.
+
+        The limits come from the cache without the access checks of the
+        database API, so the callers have to make them.
+        """
+        ttl = CONF.quota_limits_cache_ttl
+        if ttl <= 0:
+            return get(context, *args)
+        now = timeutils.utcnow_ts()
+        expires, limits = self._limits_cache.get(key, (None, None))
+        if expires is None or expires <= now:
+            limits = get(context, *args)
+            self._limits_cache[key] = (now + ttl, limits)
+        # The callers update the limits they are given
+        return dict(limits)
+
+    def _get_project_limits(self, context, project_id):
+        if CONF.quota_limits_cache_ttl > 0:
+            nova_context.authorize_project_context(context, project_id)
+        return self._get_cached_limits(('project', project_id),
+                                       db.quota_get_all_by_project,
+                                       context, project_id)
+
+    def _get_user_limits(self, context, project_id, user_id):
+        if CONF.quota_limits_cache_ttl > 0:
+            nova_context.authorize_project_context(context, project_id)
+        return self._get_cached_limits(('user', project_id, user_id),
+                                       db.quota_get_all_by_project_and_user,
+                                       context, project_id, user_id)
+
+    def _get_class_limits(self, context, quota_class):
+        if CONF.quota_limits_cache_ttl > 0:
+            nova_context.authorize_quota_class_context(context, quota_class)
+        return self._get_cached_limits(('class', quota_class),
+                                       db.quota_class_get_all_by_name,
+                                       context, quota_class)
+
+    def invalidate_limits(self):
+        """Forget the quota limits cached by this process."""
+
+        self._limits_cache.clear()
+
     def get_by_project_and_user(self, context, project_id, user_id, resource):
         """Get a specific quota by project and user."""
 
@@ -134,7 +205,8 @@ class DbQuotaDriver(object):
         """
 
         quotas = {}
-        default_quotas = db.quota_class_get_default(context)
+        default_quotas = self._get_cached_limits(
+            ('default',), db.quota_class_get_default, context)
         for resource in resources.values():
             quotas[resource.name] = default_quotas.get(resource.name,
                                                        resource.default)
@@ -175,7 +247,7 @@ class DbQuotaDriver(object):
         if project_id == context.project_id:
             quota_class = context.quota_class
         if quota_class:
-            class_quotas = db.quota_class_get_all_by_name(context, quota_class)
+            class_quotas = self._get_class_limits(context, quota_class)
         else:
             class_quotas = {}
 
@@ -241,11 +313,10 @@ class DbQuotaDriver(object):
         if user_quotas:
             user_quotas = user_quotas.copy()
         else:
-            user_quotas = db.quota_get_all_by_project_and_user(context,
-                                                               project_id,
-                                                               user_id)
+            user_quotas = self._get_user_limits(context, project_id,
+                                                user_id)
         # Use the project quota for default user quota.
-        proj_quotas = project_quotas or db.quota_get_all_by_project(
+        proj_quotas = project_quotas or self._get_project_limits(
             context, project_id)
         for key, value in proj_quotas.iteritems():
             if key not in user_quotas.keys():
@@ -283,7 +354,7 @@ class DbQuotaDriver(object):
                         will be returned.
         :param project_quotas: Quotas dictionary for the specified project.
         """
-        project_quotas = project_quotas or db.quota_get_all_by_project(
+        project_quotas = project_quotas or self._get_project_limits(
             context, project_id)
         project_usages = None
         if usages:
@@ -459,7 +530,7 @@ class DbQuotaDriver(object):
             user_id = context.user_id
 
         # Get the applicable quotas
-        project_quotas = db.quota_get_all_by_project(context, project_id)
+        project_quotas = self._get_project_limits(context, project_id)
         quotas = self._get_quotas(context, resources, values.keys(),
                                   has_sync=False, project_id=project_id,
                                   project_quotas=project_quotas)
@@ -553,7 +624,7 @@ class DbQuotaDriver(object):
         # NOTE(Vek): We're not worried about races at this point.
         #            Yes, the admin may be in the process of reducing
         #            quotas, but that's a pretty rare thing.
-        project_quotas = db.quota_get_all_by_project(context, project_id)
+        project_quotas = self._get_project_limits(context, project_id)
         LOG.debug('Quota limits for project %(project_id)s: '
                   '%(project_quotas)s', {'project_id': project_id,
                                          'project_quotas': project_quotas})
@@ -577,6 +648,17 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        if CONF.lock_free_quota_reserve:
+            # Without the periodic refresh of the scheduler, the usages due
+            # for a refresh are refreshed when reserving, as with locks
+            refresh_due = CONF.quota_usage_refresh_interval <= 0
+            return db.quota_reserve_conditional(context, resources, quotas,
+                                                user_quotas, deltas, expire,
+                                                CONF.until_refresh,
+                                                CONF.max_age,
+                                                project_id=project_id,
+                                                user_id=user_id,
+                                                refresh_due=refresh_due)
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
@@ -667,6 +749,7 @@ class DbQuotaDriver(object):
         """
 
         db.quota_destroy_all_by_project_and_user(context, project_id, user_id)
+        self.invalidate_limits()
 
     def destroy_all_by_project(self, context, project_id):
         """Destroy all quotas, usages, and reservations associated with a
@@ -677,6 +760,7 @@ class DbQuotaDriver(object):
         """
 
         db.quota_destroy_all_by_project(context, project_id)
+        self.invalidate_limits()
 
     def expire(self, context):
         """Expire reservations.
@@ -689,6 +773,16 @@ class DbQuotaDriver(object):
 
         db.reservation_expire(context)
 
+    def refresh_usages(self, context, resources):
+        """Refresh the usages which are out of sync or due for a refresh.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        """
+
+        db.quota_usage_refresh(context, resources, CONF.until_refresh,
+                               CONF.max_age)
+
 
 class NoopQuotaDriver(object):
     """Driver that turns quotas calls into no-ops and pretends that quotas
@@ -962,6 +1056,18 @@ class NoopQuotaDriver(object):
         """
         pass
 
+    def refresh_usages(self, context, resources):
+        """Refresh the usages which are out of sync or due for a refresh.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        """
+        pass
+
+    def invalidate_limits(self):
+        """Forget the quota limits cached by this process."""
+        pass
+
 
 class BaseResource(object):
     """Describe a single resource for quota checking."""
@@ -1443,6 +1549,25 @@ class QuotaEngine(object):
 
         self._driver.expire(context)
 
+    def refresh_usages(self, context):
+        """Refresh the usages which are out of sync or due for a refresh.
+
+        :param context: The request context, for access checks.
+        """
+
+        # Quota drivers from outside of nova may not refresh usages
+        if hasattr(self._driver, 'refresh_usages'):
+            self._driver.refresh_usages(context, self._resources)
+
+    def invalidate_limits(self):
+        """Forget the quota limits cached by this process, after they were
+        updated.
+        """
+
+        # Quota drivers from outside of nova may not cache limits
+        if hasattr(self._driver, 'invalidate_limits'):
+            self._driver.invalidate_limits()
+
     @property
     def resources(self):
         return sorted(self._resources.keys())
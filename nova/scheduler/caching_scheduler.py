@@ -13,7 +13,32 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+import tempfile
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+from nova.i18n import _LW
 from nova.scheduler import filter_scheduler
+from nova import utils
+
+caching_scheduler_opts = [
+    cfg.StrOpt('scheduler_shared_claims_file',
+               help='File, local to the scheduler node, used by the '
+                    'caching scheduler workers to share the resources they '
+                    'consumed on the hosts between two refreshes of their '
+                    'cache. Leave it unset to keep each worker cache '
+                    'private.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(caching_scheduler_opts)
+CONF.import_opt('scheduler_driver_task_period', 'nova.scheduler.manager')
+
+LOG = logging.getLogger(__name__)
 
 
 class CachingScheduler(filter_scheduler.FilterScheduler):
@@ -45,6 +70,12 @@ class CachingScheduler(filter_scheduler.FilterScheduler):
     more retries, because the data stored on any additional scheduler will
     be more out of date, than if it was fetched from the database.
 
+    When scheduler_shared_claims_file is set, the workers running on the
+    same node record the resources consumed on the chosen hosts in that
+    file, and apply the ones consumed by their siblings to their own copy
+    of the cache, so they don't keep picking the same hosts between two
+    refreshes. Only RAM, disk and vCPUs are shared this way.
+
     In a similar way, if you have a high number of server deletes, the
     extra capacity from those deletes will not show up until the cache is
     refreshed.
@@ -53,6 +84,8 @@ class CachingScheduler(filter_scheduler.FilterScheduler):
     def __init__(self, *args, **kwargs):
         super(CachingScheduler, self).__init__(*args, **kwargs)
         self.all_host_states = None
+        # Sequence number of the last shared claim applied to the cache
+        self._last_claim_seq = 0
 
     def run_periodic_tasks(self, context):
         """Called from a periodic tasks in the manager."""
@@ -60,7 +93,7 @@ class CachingScheduler(filter_scheduler.FilterScheduler):
         # NOTE(johngarbutt) Fetching the list of hosts before we get
         # a user request, so no user requests have to wait while we
         # fetch the list of hosts.
-        self.all_host_states = self._get_up_hosts(elevated)
+        self._refresh_host_states(elevated)
 
     def _get_all_host_states(self, context):
         """Called from the filter scheduler, in a template pattern."""
@@ -68,10 +101,102 @@ class CachingScheduler(filter_scheduler.FilterScheduler):
             # NOTE(johngarbutt) We only get here when we a scheduler request
             # comes in before the first run of the periodic task.
             # Rather than raise an error, we fetch the list of hosts.
-            self.all_host_states = self._get_up_hosts(context)
+            self._refresh_host_states(context)
+        elif CONF.scheduler_shared_claims_file:
+            self._apply_shared_claims()
 
         return self.all_host_states
 
+    def _schedule(self, context, request_spec, filter_properties):
+        selected_hosts = super(CachingScheduler, self)._schedule(
+            context, request_spec, filter_properties)
+        if selected_hosts and CONF.scheduler_shared_claims_file:
+            self._record_shared_claims(request_spec['instance_properties'],
+                                       [host.obj for host in selected_hosts])
+        return selected_hosts
+
+    def _refresh_host_states(self, context):
+        if CONF.scheduler_shared_claims_file:
+            # Claims recorded while the hosts are fetched may
+            # not be reflected in the database yet, so only the ones recorded
+            # before the refresh started are skipped.
+            self._last_claim_seq = self._read_shared_claims()['seq']
+        self.all_host_states = self._get_up_hosts(context)
+
     def _get_up_hosts(self, context):
         all_hosts_iterator = self.host_manager.get_all_host_states(context)
         return list(all_hosts_iterator)
+
+    def _read_shared_claims(self):
+        path = CONF.scheduler_shared_claims_file
+        if os.path.exists(path):
+            with open(path) as f:
+                try:
+                    return jsonutils.loads(f.read())
+                except ValueError:
+                    LOG.warning(_LW("Cannot decode JSON from %(path)s"),
+                                {"path": path})
+        return {'seq': 0, 'claims': []}
+
+    def _apply_shared_claims(self):
+        """Consume the resources claimed by sibling workers from the cache."""
+        shared = self._read_shared_claims()
+        if shared['seq'] <= self._last_claim_seq:
+            return
+
+        host_states = {(state.host, state.nodename): state
+                       for state in self.all_host_states}
+        pid = os.getpid()
+        for claim in shared['claims']:
+            if claim['seq'] <= self._last_claim_seq or claim['pid'] == pid:
+                continue
+            host_state = host_states.get((claim['host'], claim['nodename']))
+            if host_state is not None:
+                host_state.consume_from_instance(
+                    {'memory_mb': claim['memory_mb'],
+                     'root_gb': claim['root_gb'],
+                     'ephemeral_gb': claim['ephemeral_gb'],
+                     'vcpus': claim['vcpus'],
+                     'numa_topology': None,
+                     'pci_requests': None})
+        self._last_claim_seq = shared['seq']
+
+    def _record_shared_claims(self, instance_properties, host_states):
+        """Record the resources consumed on host_states for the siblings."""
+        path = CONF.scheduler_shared_claims_file
+        lock_path = os.path.dirname(os.path.abspath(path))
+
+        @utils.synchronized('caching-scheduler-claims', external=True,
+                            lock_path=lock_path)
+        def do_record_shared_claims():
+            # Claims older than a cache refresh period have
+            # been picked up from the database by every worker since, so
+            # they can be dropped.
+            now = time.time()
+            expiry = now - CONF.scheduler_driver_task_period * 2
+            shared = self._read_shared_claims()
+            claims = [claim for claim in shared['claims']
+                      if claim['time'] > expiry]
+            seq = shared['seq']
+            pid = os.getpid()
+            for host_state in host_states:
+                seq += 1
+                claims.append({'seq': seq,
+                               'pid': pid,
+                               'time': now,
+                               'host': host_state.host,
+                               'nodename': host_state.nodename,
+                               'memory_mb': instance_properties['memory_mb'],
+                               'root_gb': instance_properties['root_gb'],
+                               'ephemeral_gb':
+                                   instance_properties['ephemeral_gb'],
+                               'vcpus': instance_properties['vcpus']})
+
+            # Readers don't take the lock, so the file is
+            # replaced atomically rather than rewritten in place.
+            fd, tmp_path = tempfile.mkstemp(dir=lock_path)
+            with os.fdopen(fd, 'w') as f:
+                f.write(jsonutils.dumps({'seq': seq, 'claims': claims}))
+            os.rename(tmp_path, path)
+
+        do_record_shared_claims()
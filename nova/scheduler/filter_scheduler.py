@@ -131,28 +131,31 @@ class FilterScheduler(driver.Scheduler):
         hosts = self._get_all_host_states(elevated)
 
         selected_hosts = []
+        changed_hosts = None
         num_instances = request_spec.get('num_instances', 1)
         for num in xrange(num_instances):
             # Filter local hosts based on requirements ...
+            # Only the host chosen for the previous instance has changed, so
+            # the stateless filters don't need to be run on the other ones.
             hosts = self.host_manager.get_filtered_hosts(hosts,
-                    filter_properties, index=num)
+                    filter_properties, index=num, changed_hosts=changed_hosts)
             if not hosts:
                 # Can't get any more locally.
                 break
 
             LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
 
-            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    filter_properties)
-
-            LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
-
             scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
             if scheduler_host_subset_size < 1:
                 scheduler_host_subset_size = 1
 
+            # Only the best hosts of the subset can be chosen, so there is
+            # no need to get the others sorted.
+            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                    filter_properties, scheduler_host_subset_size)
+
+            LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
             LOG.debug("Selected host: %(host)s", {'host': chosen_host})
@@ -161,6 +164,7 @@ class FilterScheduler(driver.Scheduler):
             # Now consume the resources so the filter/weights
             # will change for the next instance.
             chosen_host.obj.consume_from_instance(instance_properties)
+            changed_hosts = [chosen_host.obj]
             if update_group_hosts is True:
                 # NOTE(sbauza): Group details are serialized into a list now
                 # that they are populated by the conductor, we need to
@@ -17,11 +17,28 @@
 Scheduler host filters
 """
 
+import six
+
 from nova import filters
 
 
 class BaseHostFilter(filters.BaseFilter):
-    """Base class for host filters."""
+    """Base class for host filters.
+
+    A filter whose limit, like an allocation ratio, is looked up through a
+    hook taking the host can override filter_all() to look it up once and
+    check all the hosts in a single pass, sharing the check of a host with
+    host_passes(). As subclasses may override the hook to compute the limit
+    of each host, like the Aggregate* filters do, such a filter_all() has to
+    go back to host_passes() unless _limit_is_global() is True.
+    """
+    def _limit_is_global(self, cls, hook):
+        """Return True if the method named hook is the one of cls, whose
+        limit is the same for every host.
+        """
+        return (six.get_unbound_function(getattr(type(self), hook)) is
+                six.get_unbound_function(getattr(cls, hook)))
+
     def _filter_one(self, obj, filter_properties):
         """Return True if the object passes the filter, otherwise False."""
         return self.host_passes(obj, filter_properties)
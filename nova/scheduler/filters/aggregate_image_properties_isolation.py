@@ -64,3 +64,41 @@ class AggregateImagePropertiesIsolation(filters.BaseHostFilter):
                            'options': options})
                 return False
         return True
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts whose aggregates match the image properties.
+
+        The hosts whose aggregates have a mismatching value for one of the
+        image properties are looked up once in the aggregates metadata index
+        of the HostManager, when it provides one.
+        """
+        metadata_index = filter_properties.get('aggregates_metadata_index')
+        if metadata_index is None:
+            return super(AggregateImagePropertiesIsolation, self).filter_all(
+                filter_obj_list, filter_properties)
+
+        cfg_namespace = CONF.aggregate_image_properties_isolation_namespace
+        cfg_separator = CONF.aggregate_image_properties_isolation_separator
+
+        spec = filter_properties.get('request_spec', {})
+        image_props = spec.get('image', {}).get('properties', {})
+
+        failing_hosts = set()
+        for key, hosts_by_value in metadata_index.iteritems():
+            if (cfg_namespace and
+                    not key.startswith(cfg_namespace + cfg_separator)):
+                continue
+            prop = image_props.get(key)
+            if prop:
+                key_hosts = utils.aggregate_metadata_get_hosts(
+                    metadata_index, key)
+                failing_hosts |= key_hosts - hosts_by_value.get(prop, set())
+
+        passing_hosts = []
+        for host_state in filter_obj_list:
+            if host_state.host in failing_hosts:
+                LOG.debug("%(host_state)s fails image aggregate properties "
+                            "requirements.", {'host_state': host_state})
+                continue
+            passing_hosts.append(host_state)
+        return passing_hosts
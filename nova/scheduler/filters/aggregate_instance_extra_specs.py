@@ -45,14 +45,9 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
         metadata = utils.aggregate_metadata_get_by_host(host_state)
 
         for key, req in instance_type['extra_specs'].iteritems():
-            # Either not scope format, or aggregate_instance_extra_specs scope
-            scope = key.split(':', 1)
-            if len(scope) > 1:
-                if scope[0] != _SCOPE:
-                    continue
-                else:
-                    del scope[0]
-            key = scope[0]
+            key = self._get_aggregate_key(key)
+            if key is None:
+                continue
             aggregate_vals = metadata.get(key, None)
             if not aggregate_vals:
                 LOG.debug("%(host_state)s fails instance_type extra_specs "
@@ -70,3 +65,56 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
                            'aggregate_vals': aggregate_vals})
                 return False
         return True
+
+    @staticmethod
+    def _get_aggregate_key(key):
+        """Return the aggregate metadata key matching an extra spec key.
+
+        Either not scope format, or aggregate_instance_extra_specs scope.
+        Returns None for the extra specs in other scopes.
+        """
+        scope = key.split(':', 1)
+        if len(scope) > 1:
+            if scope[0] != _SCOPE:
+                return None
+            else:
+                del scope[0]
+        return scope[0]
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts whose aggregates match the extra specs.
+
+        The hosts matching each extra spec are looked up once in the
+        aggregates metadata index of the HostManager, when it provides one.
+        """
+        metadata_index = filter_properties.get('aggregates_metadata_index')
+        instance_type = filter_properties.get('instance_type')
+        if metadata_index is None or 'extra_specs' not in instance_type:
+            return super(AggregateInstanceExtraSpecsFilter, self).filter_all(
+                filter_obj_list, filter_properties)
+
+        allowed_hosts = None
+        for key, req in instance_type['extra_specs'].iteritems():
+            key = self._get_aggregate_key(key)
+            if key is None:
+                continue
+            matching_hosts = set()
+            for value, hosts in metadata_index.get(key, {}).iteritems():
+                if extra_specs_ops.match(value, req):
+                    matching_hosts |= hosts
+            if allowed_hosts is None:
+                allowed_hosts = matching_hosts
+            else:
+                allowed_hosts &= matching_hosts
+
+        if allowed_hosts is None:
+            return list(filter_obj_list)
+
+        passing_hosts = []
+        for host_state in filter_obj_list:
+            if host_state.host not in allowed_hosts:
+                LOG.debug("%(host_state)s fails instance_type extra_specs "
+                          "requirements.", {'host_state': host_state})
+                continue
+            passing_hosts.append(host_state)
+        return passing_hosts
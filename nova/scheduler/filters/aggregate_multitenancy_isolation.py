@@ -48,3 +48,32 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
                 LOG.debug("%s fails tenant id on aggregate", host_state)
                 return False
         return True
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts which can create instances for the tenant.
+
+        The isolated hosts are looked up once in the aggregates metadata
+        index of the HostManager, when it provides one.
+        """
+        metadata_index = filter_properties.get('aggregates_metadata_index')
+        if metadata_index is None:
+            return super(AggregateMultiTenancyIsolation, self).filter_all(
+                filter_obj_list, filter_properties)
+
+        spec = filter_properties.get('request_spec', {})
+        props = spec.get('instance_properties', {})
+        tenant_id = props.get('project_id')
+
+        isolated_hosts = utils.aggregate_metadata_get_hosts(
+            metadata_index, 'filter_tenant_id')
+        tenant_hosts = metadata_index.get('filter_tenant_id', {}).get(
+            tenant_id, set())
+
+        passing_hosts = []
+        for host_state in filter_obj_list:
+            host = host_state.host
+            if host in isolated_hosts and host not in tenant_hosts:
+                LOG.debug("%s fails tenant id on aggregate", host_state)
+                continue
+            passing_hosts.append(host_state)
+        return passing_hosts
@@ -62,3 +62,43 @@ class AvailabilityZoneFilter(filters.BaseHostFilter):
                        'host_az': host_az})
 
         return hosts_passes
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts in the requested availability zone.
+
+        The hosts of each zone are looked up once in the aggregates metadata
+        index of the HostManager, when it provides one.
+        """
+        metadata_index = filter_properties.get('aggregates_metadata_index')
+        if metadata_index is None:
+            return super(AvailabilityZoneFilter, self).filter_all(
+                filter_obj_list, filter_properties)
+
+        spec = filter_properties.get('request_spec', {})
+        props = spec.get('instance_properties', {})
+        availability_zone = props.get('availability_zone')
+
+        if not availability_zone:
+            return list(filter_obj_list)
+
+        zone_hosts = metadata_index.get('availability_zone', {}).get(
+            availability_zone, set())
+        if availability_zone == CONF.default_availability_zone:
+            # Hosts outside of any zone are in the default one
+            zoned_hosts = utils.aggregate_metadata_get_hosts(
+                metadata_index, 'availability_zone')
+        else:
+            zoned_hosts = None
+
+        passing_hosts = []
+        for host_state in filter_obj_list:
+            host = host_state.host
+            if host in zone_hosts or (zoned_hosts is not None and
+                                      host not in zoned_hosts):
+                passing_hosts.append(host_state)
+            else:
+                LOG.debug("Availability Zone '%(az)s' requested. "
+                          "%(host_state)s is not in it.",
+                          {'host_state': host_state,
+                           'az': availability_zone})
+        return passing_hosts
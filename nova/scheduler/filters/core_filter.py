@@ -37,23 +37,17 @@ CONF.register_opt(cpu_allocation_ratio_opt)
 
 class BaseCoreFilter(filters.BaseHostFilter):
 
+    stateless = True
+
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
-    def host_passes(self, host_state, filter_properties):
-        """Return True if host has sufficient CPU cores."""
-        instance_type = filter_properties.get('instance_type')
-        if not instance_type:
-            return True
-
+    def _cores_pass(self, host_state, instance_vcpus, cpu_allocation_ratio):
         if not host_state.vcpus_total:
             # Fail safe
             LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
             return True
 
-        instance_vcpus = instance_type['vcpus']
-        cpu_allocation_ratio = self._get_cpu_allocation_ratio(host_state,
-                                                          filter_properties)
         vcpus_total = host_state.vcpus_total * cpu_allocation_ratio
 
         # Only provide a VCPU limit to compute if the virt driver is reporting
@@ -73,6 +67,17 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def host_passes(self, host_state, filter_properties):
+        """Return True if host has sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return True
+
+        cpu_allocation_ratio = self._get_cpu_allocation_ratio(host_state,
+                                                          filter_properties)
+        return self._cores_pass(host_state, instance_type['vcpus'],
+                                cpu_allocation_ratio)
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -80,6 +85,19 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return CONF.cpu_allocation_ratio
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return list(filter_obj_list)
+        if not self._limit_is_global(CoreFilter, '_get_cpu_allocation_ratio'):
+            return super(CoreFilter, self).filter_all(filter_obj_list,
+                                                      filter_properties)
+        cpu_allocation_ratio = self._get_cpu_allocation_ratio(
+            None, filter_properties)
+        return [host_state for host_state in filter_obj_list
+                if self._cores_pass(host_state, instance_type['vcpus'],
+                                    cpu_allocation_ratio)]
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -36,17 +36,13 @@ CONF.register_opt(max_io_ops_per_host_opt)
 class IoOpsFilter(filters.BaseHostFilter):
     """Filter out hosts with too many concurrent I/O operations."""
 
+    stateless = True
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
         return CONF.max_io_ops_per_host
 
-    def host_passes(self, host_state, filter_properties):
-        """Use information about current vm and task states collected from
-        compute node statistics to decide whether to filter.
-        """
-        num_io_ops = host_state.num_io_ops
-        max_io_ops = self._get_max_io_ops_per_host(
-            host_state, filter_properties)
-        passes = num_io_ops < max_io_ops
+    def _io_ops_passes(self, host_state, max_io_ops):
+        passes = host_state.num_io_ops < max_io_ops
         if not passes:
             LOG.debug("%(host_state)s fails I/O ops check: Max IOs per host "
                         "is set to %(max_io_ops)s",
@@ -54,6 +50,22 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def host_passes(self, host_state, filter_properties):
+        """Use information about current vm and task states collected from
+        compute node statistics to decide whether to filter.
+        """
+        max_io_ops = self._get_max_io_ops_per_host(
+            host_state, filter_properties)
+        return self._io_ops_passes(host_state, max_io_ops)
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        if not self._limit_is_global(IoOpsFilter, '_get_max_io_ops_per_host'):
+            return super(IoOpsFilter, self).filter_all(filter_obj_list,
+                                                       filter_properties)
+        max_io_ops = self._get_max_io_ops_per_host(None, filter_properties)
+        return [host_state for host_state in filter_obj_list
+                if self._io_ops_passes(host_state, max_io_ops)]
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -33,14 +33,13 @@ CONF.register_opt(max_instances_per_host_opt)
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    stateless = True
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
         return CONF.max_instances_per_host
 
-    def host_passes(self, host_state, filter_properties):
-        num_instances = host_state.num_instances
-        max_instances = self._get_max_instances_per_host(
-            host_state, filter_properties)
-        passes = num_instances < max_instances
+    def _num_instances_passes(self, host_state, max_instances):
+        passes = host_state.num_instances < max_instances
         if not passes:
             LOG.debug("%(host_state)s fails num_instances check: Max "
                         "instances per host is set to %(max_instances)s",
@@ -48,6 +47,21 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def host_passes(self, host_state, filter_properties):
+        max_instances = self._get_max_instances_per_host(
+            host_state, filter_properties)
+        return self._num_instances_passes(host_state, max_instances)
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        if not self._limit_is_global(NumInstancesFilter,
+                                     '_get_max_instances_per_host'):
+            return super(NumInstancesFilter, self).filter_all(
+                filter_obj_list, filter_properties)
+        max_instances = self._get_max_instances_per_host(None,
+                                                         filter_properties)
+        return [host_state for host_state in filter_obj_list
+                if self._num_instances_passes(host_state, max_instances)]
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -40,6 +40,8 @@ class PciPassthroughFilter(filters.BaseHostFilter):
 
     """
 
+    stateless = True
+
     def host_passes(self, host_state, filter_properties):
         """Return true if the host has the required PCI devices."""
         pci_requests = filter_properties.get('pci_requests')
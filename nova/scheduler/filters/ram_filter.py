@@ -36,19 +36,15 @@ CONF.register_opt(ram_allocation_ratio_opt)
 
 class BaseRamFilter(filters.BaseHostFilter):
 
+    stateless = True
+
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
-    def host_passes(self, host_state, filter_properties):
-        """Only return hosts with sufficient available RAM."""
-        instance_type = filter_properties.get('instance_type')
-        requested_ram = instance_type['memory_mb']
+    def _ram_passes(self, host_state, requested_ram, ram_allocation_ratio):
         free_ram_mb = host_state.free_ram_mb
         total_usable_ram_mb = host_state.total_usable_ram_mb
 
-        ram_allocation_ratio = self._get_ram_allocation_ratio(host_state,
-                                                          filter_properties)
-
         memory_mb_limit = total_usable_ram_mb * ram_allocation_ratio
         used_ram_mb = total_usable_ram_mb - free_ram_mb
         usable_ram = memory_mb_limit - used_ram_mb
@@ -64,6 +60,14 @@ class BaseRamFilter(filters.BaseHostFilter):
         host_state.limits['memory_mb'] = memory_mb_limit
         return True
 
+    def host_passes(self, host_state, filter_properties):
+        """Only return hosts with sufficient available RAM."""
+        instance_type = filter_properties.get('instance_type')
+        ram_allocation_ratio = self._get_ram_allocation_ratio(host_state,
+                                                          filter_properties)
+        return self._ram_passes(host_state, instance_type['memory_mb'],
+                                ram_allocation_ratio)
+
 
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
@@ -71,6 +75,18 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         return CONF.ram_allocation_ratio
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        if not self._limit_is_global(RamFilter, '_get_ram_allocation_ratio'):
+            return super(RamFilter, self).filter_all(filter_obj_list,
+                                                     filter_properties)
+        instance_type = filter_properties.get('instance_type')
+        requested_ram = instance_type['memory_mb']
+        ram_allocation_ratio = self._get_ram_allocation_ratio(
+            None, filter_properties)
+        return [host_state for host_state in filter_obj_list
+                if self._ram_passes(host_state, requested_ram,
+                                    ram_allocation_ratio)]
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
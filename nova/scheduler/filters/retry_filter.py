@@ -25,6 +25,9 @@ class RetryFilter(filters.BaseHostFilter):
     purposes
     """
 
+    # The previously attempted hosts don't change within a request
+    stateless = True
+
     def host_passes(self, host_state, filter_properties):
         """Skip nodes that have already been attempted."""
         retry = filter_properties.get('retry', None)
@@ -36,7 +36,11 @@ def aggregate_values_from_key(host_state, key_name):
 
 def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata for a specific host."""
-    aggrlist = host_state.aggregates
+    return aggregates_metadata_get(host_state.aggregates, key=key)
+
+
+def aggregates_metadata_get(aggrlist, key=None):
+    """Returns a dict of all metadata for a list of aggregates."""
     metadata = collections.defaultdict(set)
     for aggr in aggrlist:
         if key is not None and key not in aggr.metadata:
@@ -48,6 +52,18 @@ def aggregate_metadata_get_by_host(host_state, key=None):
     return metadata
 
 
+def aggregate_metadata_get_hosts(metadata_index, key):
+    """Returns the set of hosts whose aggregates have a metadata key.
+
+    metadata_index is the HostManager.aggregates_metadata_index dict of sets
+    of host names, keyed by metadata key and value.
+    """
+    hosts = set()
+    for value_hosts in metadata_index.get(key, {}).itervalues():
+        hosts |= value_hosts
+    return hosts
+
+
 def validate_num_values(vals, default=None, cast_to=int, based_on=min):
     """Returns a correctly casted value based on a set of values.
 
@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import threading
 import time
 import UserDict
 
@@ -35,6 +36,8 @@ from nova.i18n import _, _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
+from nova.scheduler.filters import utils as filters_utils
+from nova.scheduler import stats as scheduler_stats
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -66,6 +69,35 @@ host_manager_opts = [
                default=True,
                help='Determines if the Scheduler tracks changes to instances '
                     'to help with its filtering decisions.'),
+    cfg.BoolOpt('scheduler_incremental_host_states',
+                default=False,
+                help='Determines if the Scheduler only reads the compute '
+                     'nodes which changed since its previous pass when '
+                     'refreshing its host states, instead of reading all of '
+                     'them for every request. A full rescan is still done '
+                     'every scheduler_host_states_full_sync_interval '
+                     'seconds.'),
+    cfg.IntOpt('scheduler_host_states_full_sync_interval',
+               default=300,
+               help='Number of seconds between two full rescans of the '
+                    'compute nodes when scheduler_incremental_host_states is '
+                    'enabled. The full rescan catches any change missed by '
+                    'the incremental refreshes, e.g. because of clock skew '
+                    'between the hosts writing the compute nodes.'),
+    cfg.IntOpt('scheduler_instance_info_init_timeout',
+               default=60,
+               help='Maximum number of seconds a request waits for the '
+                    'initial load of the instances of all the hosts when '
+                    'scheduler_tracks_instance_changes is enabled. Once it '
+                    'expires, the instances of the hosts are read from the '
+                    'database for each request until they are loaded.'),
+    cfg.IntOpt('scheduler_instance_info_init_max_age',
+               default=300,
+               help='Number of seconds during which the instances loaded at '
+                    'start-up for a host are used as is while waiting for '
+                    'the host to send its own instance updates. Afterwards, '
+                    'the instances of the hosts which did not send any update '
+                    'are read from the database for each request.'),
 ]
 
 CONF = cfg.CONF
@@ -105,6 +137,24 @@ class ReadOnlyDict(UserDict.IterableUserDict):
 MetricItem = collections.namedtuple(
              'MetricItem', ['value', 'timestamp', 'source'])
 
+# Representation of an instance running on a host, limited to the fields the
+# filters look at.
+InstanceSummary = collections.namedtuple(
+             'InstanceSummary', ['uuid', 'instance_type_id'])
+
+
+def _summarize_instance(instance):
+    instance_type_id = None
+    if instance.obj_attr_is_set('instance_type_id'):
+        instance_type_id = instance.instance_type_id
+    return InstanceSummary(instance.uuid, instance_type_id)
+
+
+def _summarize_instances(instances):
+    """Returns a dict of InstanceSummary keyed by instance uuid."""
+    return {instance.uuid: _summarize_instance(instance)
+            for instance in instances}
+
 
 class HostState(object):
     """Mutable and immutable information tracked for a host.
@@ -310,13 +360,17 @@ class HostManager(object):
 
     def __init__(self):
         self.host_state_map = {}
+        # Time spent in each filter and weigher
+        self.stats = scheduler_stats.SchedulerStats()
         self.filter_handler = filters.HostFilterHandler()
+        self.filter_handler.stats = self.stats
         filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
         self.filter_cls_map = {cls.__name__: cls for cls in filter_classes}
         self.filter_obj_map = {}
         self.default_filters = self._choose_host_filters(self._load_filters())
         self.weight_handler = weights.HostWeightHandler()
+        self.weight_handler.stats = self.stats
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.scheduler_weight_classes)
         self.weighers = [cls() for cls in weigher_classes]
@@ -325,12 +379,28 @@ class HostManager(object):
         # Dict of set of aggregate IDs keyed by the name of the host belonging
         # to those aggregates
         self.host_aggregates_map = collections.defaultdict(set)
+        # Dict of dicts of set of host names, keyed by aggregate metadata key
+        # and value, so that the aggregate filters don't need to collect the
+        # metadata of each host
+        self.aggregates_metadata_index = {}
+        # Dict of aggregate metadata indexed for each host name
+        self._indexed_host_metadata = {}
         self._init_aggregates()
         self.tracks_instance_changes = CONF.scheduler_tracks_instance_changes
         # Dict of instances and status, keyed by host
         self._instance_info = {}
+        # Set once the initial load of the instances is over, or None when
+        # the requests don't wait for it, and time at which it completed
+        self._instance_info_ready = None
+        self._instance_info_loaded_at = None
         if self.tracks_instance_changes:
             self._init_instance_info()
+        # Time of the last full read of the compute nodes, and point in time
+        # from which the next incremental read has to fetch changes
+        self._last_full_host_states_sync = None
+        self._compute_nodes_changed_since = None
+        # Number of compute node rows read by the last get_all_host_states()
+        self.compute_node_rows_fetched = 0
 
     def _load_filters(self):
         return CONF.scheduler_default_filters
@@ -342,6 +412,8 @@ class HostManager(object):
             self.aggs_by_id[agg.id] = agg
             for host in agg.hosts:
                 self.host_aggregates_map[host].add(agg.id)
+        for host in self.host_aggregates_map:
+            self._index_host_metadata(host)
 
     def update_aggregates(self, aggregates):
         """Updates internal HostManager information about aggregates."""
@@ -353,6 +425,7 @@ class HostManager(object):
 
     def _update_aggregate(self, aggregate):
         self.aggs_by_id[aggregate.id] = aggregate
+        changed_hosts = set(aggregate.hosts)
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
         # Refreshing the mapping dict to remove all hosts that are no longer
@@ -361,6 +434,9 @@ class HostManager(object):
             if (aggregate.id in self.host_aggregates_map[host]
                     and host not in aggregate.hosts):
                 self.host_aggregates_map[host].remove(aggregate.id)
+                changed_hosts.add(host)
+        for host in changed_hosts:
+            self._index_host_metadata(host)
 
     def delete_aggregate(self, aggregate):
         """Deletes internal HostManager information about a specific aggregate.
@@ -370,6 +446,28 @@ class HostManager(object):
         for host in aggregate.hosts:
             if aggregate.id in self.host_aggregates_map[host]:
                 self.host_aggregates_map[host].remove(aggregate.id)
+            self._index_host_metadata(host)
+
+    def _index_host_metadata(self, host):
+        """Updates aggregates_metadata_index for the aggregates of a host."""
+        index = self.aggregates_metadata_index
+        for key, values in self._indexed_host_metadata.pop(host, {}).items():
+            for value in values:
+                index[key][value].discard(host)
+                if not index[key][value]:
+                    del index[key][value]
+            if not index[key]:
+                del index[key]
+
+        aggregates = [self.aggs_by_id[agg_id]
+                      for agg_id in self.host_aggregates_map.get(host, ())
+                      if agg_id in self.aggs_by_id]
+        metadata = filters_utils.aggregates_metadata_get(aggregates)
+        for key, values in metadata.items():
+            for value in values:
+                index.setdefault(key, {}).setdefault(value, set()).add(host)
+        if metadata:
+            self._indexed_host_metadata[host] = metadata
 
     def _init_instance_info(self):
         """Creates the initial view of instances for all hosts.
@@ -383,39 +481,68 @@ class HostManager(object):
         def _async_init_instance_info():
             context = context_module.get_admin_context()
             LOG.debug("START:_async_init_instance_info")
-            self._instance_info = {}
-            compute_nodes = objects.ComputeNodeList.get_all(context).objects
-            LOG.debug("Total number of compute nodes: %s", len(compute_nodes))
-            # Break the queries into batches of 10 to reduce the total number
-            # of calls to the DB.
-            batch_size = 10
-            start_node = 0
-            end_node = batch_size
-            while start_node <= len(compute_nodes):
-                curr_nodes = compute_nodes[start_node:end_node]
-                start_node += batch_size
-                end_node += batch_size
-                filters = {"host": [curr_node.host
-                                    for curr_node in curr_nodes]}
-                result = objects.InstanceList.get_by_filters(context,
-                                                             filters)
-                instances = result.objects
-                LOG.debug("Adding %s instances for hosts %s-%s",
-                          len(instances), start_node, end_node)
-                for instance in instances:
-                    host = instance.host
-                    if host not in self._instance_info:
-                        self._instance_info[host] = {"instances": {},
-                                                     "updated": False}
-                    inst_dict = self._instance_info[host]
-                    inst_dict["instances"][instance.uuid] = instance
-                # Call sleep() to cooperatively yield
-                time.sleep(0)
+            try:
+                self._load_instance_info(context)
+                self._instance_info_loaded_at = timeutils.utcnow()
+            finally:
+                # Never leave the requests waiting for a load which failed
+                ready.set()
             LOG.debug("END:_async_init_instance_info")
 
+        # Requests wait for the load to complete rather than reading the
+        # instances of each host from the database
+        ready = self._instance_info_ready = threading.Event()
         # Run this async so that we don't block the scheduler start-up
         utils.spawn_n(_async_init_instance_info)
 
+    def _load_instance_info(self, context):
+        """Loads the instances of all hosts, by pages of instances."""
+        self._instance_info = {}
+        compute_nodes = objects.ComputeNodeList.get_all(context).objects
+        LOG.debug("Total number of compute nodes: %s", len(compute_nodes))
+        # Hosts without any instance have nothing to load, but are still
+        # known to be empty
+        for compute_node in compute_nodes:
+            self._instance_info.setdefault(
+                compute_node.host,
+                {"instances": {}, "updated": False, "initial": True})
+        # Read all the instances with a few large queries sorted on a unique
+        # key, rather than one query per group of hosts.
+        page_size = 1000
+        marker = None
+        while True:
+            result = objects.InstanceList.get_by_filters(context,
+                    {"deleted": False}, sort_key="id", sort_dir="asc",
+                    limit=page_size, marker=marker, expected_attrs=[])
+            instances = result.objects
+            LOG.debug("Adding %s instances", len(instances))
+            for instance in instances:
+                host = instance.host
+                if not host:
+                    continue
+                host_info = self._instance_info.setdefault(
+                    host, {"instances": {}, "updated": False, "initial": True})
+                host_info["instances"][instance.uuid] = _summarize_instance(
+                    instance)
+            if len(instances) < page_size:
+                break
+            marker = instances[-1].uuid
+            # Call sleep() to cooperatively yield
+            time.sleep(0)
+
+    def _wait_for_instance_info(self):
+        """Waits for the initial load of the instances to complete."""
+        ready = self._instance_info_ready
+        if ready is None or ready.is_set():
+            return
+        LOG.debug("Waiting for the initial load of the instances")
+        if not ready.wait(CONF.scheduler_instance_info_init_timeout):
+            LOG.warning(_LW("The initial load of the instances is not "
+                            "complete, reading them from the database."))
+            # Don't make the next requests wait for a load this slow, they
+            # read the instances from the database until it completes
+            self._instance_info_ready = None
+
     def _choose_host_filters(self, filter_cls_names):
         """Since the caller may specify which filters to use we need
         to have an authoritative list of what is permissible. This
@@ -441,8 +568,14 @@ class HostManager(object):
         return good_filters
 
     def get_filtered_hosts(self, hosts, filter_properties,
-            filter_class_names=None, index=0):
-        """Filter hosts and return only ones passing all filters."""
+            filter_class_names=None, index=0, changed_hosts=None):
+        """Filter hosts and return only ones passing all filters.
+
+        For the instances after the first one of a request, hosts is the
+        list returned for the previous instance, and changed_hosts can be
+        set to the hosts changed since, so that the stateless filters only
+        need to be run on those.
+        """
 
         def _strip_ignore_hosts(host_map, hosts_to_ignore):
             ignored_hosts = []
@@ -491,6 +624,10 @@ class HostManager(object):
             filters = self.default_filters
         else:
             filters = self._choose_host_filters(filter_class_names)
+        # The aggregate filters look up the hosts matching the metadata they
+        # need here, rather than the metadata of each host
+        filter_properties['aggregates_metadata_index'] = (
+            self.aggregates_metadata_index)
         ignore_hosts = filter_properties.get('ignore_hosts', [])
         force_hosts = filter_properties.get('force_hosts', [])
         force_nodes = filter_properties.get('force_nodes', [])
@@ -515,12 +652,42 @@ class HostManager(object):
             hosts = name_to_cls_map.itervalues()
 
         return self.filter_handler.get_filtered_objects(filters,
-                hosts, filter_properties, index)
+                hosts, filter_properties, index, changed_hosts)
 
-    def get_weighed_hosts(self, hosts, weight_properties):
-        """Weigh the hosts."""
+    def get_weighed_hosts(self, hosts, weight_properties, max_hosts=None):
+        """Weigh the hosts.
+
+        If max_hosts is set, only the max_hosts best weighed hosts are
+        returned.
+        """
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, weight_properties)
+                hosts, weight_properties, max_hosts)
+
+    def _get_compute_nodes(self, context):
+        """Returns the compute nodes to apply on top of host_state_map.
+
+        Returns a tuple of the ComputeNodeList and a boolean telling if that
+        list holds all the compute nodes, or only the ones which changed since
+        the previous call when scheduler_incremental_host_states is enabled.
+        """
+        now = timeutils.utcnow()
+        full_sync = (not CONF.scheduler_incremental_host_states or
+                     self._compute_nodes_changed_since is None or
+                     timeutils.is_older_than(
+                         self._last_full_host_states_sync,
+                         CONF.scheduler_host_states_full_sync_interval))
+        if full_sync:
+            compute_nodes = objects.ComputeNodeList.get_all(context)
+            self._last_full_host_states_sync = now
+        else:
+            compute_nodes = objects.ComputeNodeList.get_all_changed_since(
+                context, self._compute_nodes_changed_since)
+        if CONF.scheduler_incremental_host_states:
+            self._compute_nodes_changed_since = now
+        self.compute_node_rows_fetched = len(compute_nodes)
+        LOG.debug("Fetched %(rows)d compute node rows (full sync: %(full)s)",
+                  {'rows': self.compute_node_rows_fetched, 'full': full_sync})
+        return compute_nodes, full_sync
 
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
@@ -532,35 +699,45 @@ class HostManager(object):
                         for service in objects.ServiceList.get_by_binary(
                             context, 'nova-compute')}
         # Get resource usage across the available compute nodes:
-        compute_nodes = objects.ComputeNodeList.get_all(context)
+        compute_nodes, full_sync = self._get_compute_nodes(context)
         seen_nodes = set()
+        deleted_nodes = set()
         for compute in compute_nodes:
-            service = service_refs.get(compute.host)
+            host = compute.host
+            node = compute.hypervisor_hostname
+            state_key = (host, node)
+            if not full_sync and compute.deleted:
+                deleted_nodes.add(state_key)
+                continue
+            service = service_refs.get(host)
 
             if not service:
                 LOG.warning(_LW(
                     "No compute service record found for host %(host)s"),
-                    {'host': compute.host})
+                    {'host': host})
                 continue
-            host = compute.host
-            node = compute.hypervisor_hostname
-            state_key = (host, node)
             host_state = self.host_state_map.get(state_key)
             if host_state:
                 host_state.update_from_compute_node(compute)
             else:
                 host_state = self.host_state_cls(host, node, compute=compute)
                 self.host_state_map[state_key] = host_state
-            # We force to update the aggregates info each time a new request
-            # comes in, because some changes on the aggregates could have been
-            # happening after setting this field for the first time
-            host_state.aggregates = [self.aggs_by_id[agg_id] for agg_id in
-                                     self.host_aggregates_map[
-                                         host_state.host]]
-            host_state.update_service(dict(service.iteritems()))
-            self._add_instance_info(context, compute, host_state)
             seen_nodes.add(state_key)
 
+        if not full_sync:
+            # Unchanged compute nodes are still active, unless their service
+            # record is gone.
+            for state_key in self.host_state_map:
+                host, node = state_key
+                if state_key in deleted_nodes or state_key in seen_nodes:
+                    continue
+                if host not in service_refs:
+                    LOG.warning(_LW(
+                        "No compute service record found for host %(host)s"),
+                        {'host': host})
+                    continue
+                seen_nodes.add(state_key)
+
         # remove compute nodes from host_state_map if they are not active
         dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
@@ -569,9 +746,21 @@ class HostManager(object):
                          "from scheduler"), {'host': host, 'node': node})
             del self.host_state_map[state_key]
 
+        self._wait_for_instance_info()
+        for host_state in self.host_state_map.itervalues():
+            # We force to update the aggregates info each time a new request
+            # comes in, because some changes on the aggregates could have been
+            # happening after setting this field for the first time
+            host_state.aggregates = [self.aggs_by_id[agg_id] for agg_id in
+                                     self.host_aggregates_map[
+                                         host_state.host]]
+            service = service_refs[host_state.host]
+            host_state.update_service(dict(service.iteritems()))
+            self._add_instance_info(context, host_state)
+
         return self.host_state_map.itervalues()
 
-    def _add_instance_info(self, context, compute, host_state):
+    def _add_instance_info(self, context, host_state):
         """Adds the host instance info to the host_state object.
 
         Some older compute nodes may not be sending instance change updates to
@@ -579,25 +768,33 @@ class HostManager(object):
         reasons. In either of these cases, there will either be no information
         for the host, or the 'updated' value for that host dict will be False.
         In those cases, we need to grab the current InstanceList instead of
-        relying on the version in _instance_info.
+        relying on the version in _instance_info, unless it was recently
+        loaded at start-up.
         """
-        host_name = compute.host
+        host_name = host_state.host
         host_info = self._instance_info.get(host_name)
-        if host_info and host_info.get("updated"):
+        if host_info and (host_info.get("updated") or
+                          self._is_initial_instance_info(host_info)):
             inst_dict = host_info["instances"]
         else:
             # Host is running old version, or updates aren't flowing.
             inst_list = objects.InstanceList.get_by_host(context, host_name)
-            inst_dict = {instance.uuid: instance
-                         for instance in inst_list.objects}
+            inst_dict = _summarize_instances(inst_list.objects)
         host_state.instances = inst_dict
 
+    def _is_initial_instance_info(self, host_info):
+        """Tells if host_info comes from a recent initial load."""
+        loaded_at = self._instance_info_loaded_at
+        return bool(host_info.get("initial") and loaded_at and
+                    not timeutils.is_older_than(
+                        loaded_at, CONF.scheduler_instance_info_init_max_age))
+
     def _recreate_instance_info(self, context, host_name):
         """Get the InstanceList for the specified host, and store it in the
         _instance_info dict.
         """
         instances = objects.InstanceList.get_by_host(context, host_name)
-        inst_dict = {instance.uuid: instance for instance in instances}
+        inst_dict = _summarize_instances(instances)
         host_info = self._instance_info[host_name] = {}
         host_info["instances"] = inst_dict
         host_info["updated"] = False
@@ -613,17 +810,15 @@ class HostManager(object):
         host_info = self._instance_info.get(host_name)
         if host_info:
             inst_dict = host_info.get("instances")
-            for instance in instance_info.objects:
-                # Overwrite the entry (if any) with the new info.
-                inst_dict[instance.uuid] = instance
+            # Overwrite the entries (if any) with the new info.
+            inst_dict.update(_summarize_instances(instance_info.objects))
             host_info["updated"] = True
         else:
             instances = instance_info.objects
             if len(instances) > 1:
                 # This is a host sending its full instance list, so use it.
                 host_info = self._instance_info[host_name] = {}
-                host_info["instances"] = {instance.uuid: instance
-                                          for instance in instances}
+                host_info["instances"] = _summarize_instances(instances)
                 host_info["updated"] = True
             else:
                 self._recreate_instance_info(context, host_name)
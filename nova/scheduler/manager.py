@@ -45,6 +45,11 @@ scheduler_driver_opts = [
                     'Please note this is likely to interact with the value '
                     'of service_down_time, but exactly how they interact '
                     'will depend on your choice of scheduler driver.'),
+    cfg.IntOpt('scheduler_stats_log_interval',
+               default=600,
+               help='How often (in seconds) to log the time spent in each '
+                    'scheduler filter and weigher since the previous log. '
+                    'A negative value disables the logging.'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(scheduler_driver_opts)
@@ -55,7 +60,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.2')
+    target = messaging.Target(version='4.3')
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -69,11 +74,21 @@ class SchedulerManager(manager.Manager):
     def _expire_reservations(self, context):
         QUOTAS.expire(context)
 
+    @periodic_task.periodic_task(spacing=CONF.quota_usage_refresh_interval)
+    def _refresh_quota_usages(self, context):
+        QUOTAS.refresh_usages(context)
+
     @periodic_task.periodic_task(spacing=CONF.scheduler_driver_task_period,
                                  run_immediately=True)
     def _run_periodic_tasks(self, context):
         self.driver.run_periodic_tasks(context)
 
+    @periodic_task.periodic_task(spacing=CONF.scheduler_stats_log_interval)
+    def _log_scheduler_stats(self, context):
+        stats = self.driver.host_manager.stats
+        stats.log_summary()
+        stats.reset()
+
     @messaging.expected_exceptions(exception.NoValidHost)
     def select_destinations(self, context, request_spec, filter_properties):
         """Returns destinations(s) best suited for this request_spec and
@@ -126,6 +141,12 @@ class SchedulerManager(manager.Manager):
         self.driver.host_manager.sync_instance_info(context, host_name,
                                                     instance_uuids)
 
+    def get_scheduler_stats(self, context):
+        """Returns the time spent in each filter and weigher, and the number
+        of hosts eliminated by each filter, since the last periodic log.
+        """
+        return self.driver.host_manager.stats.to_dict()
+
 
 class _SchedulerManagerV3Proxy(object):
 
@@ -90,6 +90,7 @@ class SchedulerAPI(object):
         * 4.1 - Add update_aggregates() and delete_aggregate()
         * 4.2 - Added update_instance_info(), delete_instance_info(), and
                 sync_instance_info()  methods
+        * 4.3 - Added get_scheduler_stats()
 
 
     '''
@@ -140,3 +141,7 @@ class SchedulerAPI(object):
         cctxt = self.client.prepare(version='4.2', fanout=True)
         return cctxt.cast(ctxt, 'sync_instance_info', host_name=host_name,
                           instance_uuids=instance_uuids)
+
+    def get_scheduler_stats(self, ctxt):
+        cctxt = self.client.prepare(version='4.3')
+        return cctxt.call(ctxt, 'get_scheduler_stats')
@@ -0,0 +1,101 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Timing statistics of the scheduler filters and weighers.
+"""
+
+import bisect
+
+from oslo_log import log as logging
+
+from nova.i18n import _LI
+
+LOG = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the buckets of the histograms. The last
+# bucket counts the calls which took longer than the last bound.
+HISTOGRAM_BOUNDS_MS = [1, 5, 10, 50, 100, 500, 1000]
+
+
+class SchedulerStats(object):
+    """Records the time spent in each filter and weigher.
+
+    The filter and weight handlers call record() for every invocation of a
+    filter or weigher they are given this object for.
+    """
+
+    def __init__(self):
+        self._stats = {'filters': {}, 'weighers': {}}
+
+    def record(self, kind, name, seconds, num_objs, num_passed=None):
+        """Records a call of a filter or weigher.
+
+        :param kind: 'filters' or 'weighers'
+        :param name: name of the filter or weigher class
+        :param seconds: time spent in the call
+        :param num_objs: number of hosts given to the call
+        :param num_passed: number of hosts passing a filter
+        """
+        stats = self._stats[kind].get(name)
+        if stats is None:
+            stats = self._stats[kind][name] = {
+                'calls': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'hosts': 0,
+                'hosts_eliminated': 0,
+                'histogram': [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+            }
+        ms = seconds * 1000
+        stats['calls'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['hosts'] += num_objs
+        if num_passed is not None:
+            stats['hosts_eliminated'] += num_objs - num_passed
+        stats['histogram'][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+
+    def to_dict(self):
+        """Returns the statistics recorded so far, keyed by kind and name.
+
+        The histogram of each filter or weigher is a list of call counts, one
+        for each of the histogram_bounds_ms plus one for the longer calls.
+        """
+        result = {'histogram_bounds_ms': list(HISTOGRAM_BOUNDS_MS)}
+        for kind, kind_stats in self._stats.iteritems():
+            result[kind] = {}
+            for name, stats in kind_stats.iteritems():
+                stats = dict(stats, histogram=list(stats['histogram']))
+                result[kind][name] = stats
+        return result
+
+    def reset(self):
+        self._stats = {'filters': {}, 'weighers': {}}
+
+    def log_summary(self):
+        """Logs the statistics of each filter and weigher, slowest first."""
+        for kind in ('filters', 'weighers'):
+            kind_stats = self._stats[kind]
+            for name in sorted(kind_stats,
+                               key=lambda name: kind_stats[name]['total_ms'],
+                               reverse=True):
+                stats = kind_stats[name]
+                LOG.info(_LI("%(name)s: %(calls)d calls, %(total_ms).1f ms "
+                             "in total, %(avg_ms).3f ms on average, "
+                             "%(max_ms).3f ms at most, %(hosts_eliminated)d "
+                             "of %(hosts)d hosts eliminated"),
+                         dict(stats, name=name,
+                              avg_ms=stats['total_ms'] / stats['calls']))
@@ -51,6 +51,7 @@ from nova.tests import fixtures as nova_fixtures
 from nova.tests.unit import conf_fixture
 from nova.tests.unit import policy_fixture
 from nova import utils
+from nova.virt import hardware
 
 
 CONF = cfg.CONF
@@ -241,6 +242,10 @@ class TestCase(testtools.TestCase):
         # caching of that value.
         utils._IS_NEUTRON = None
 
+        # The results of the NUMA fittings are cached in memory, forget
+        # them so that they do not leak into other tests.
+        hardware._numa_fit_cache.clear()
+
         mox_fixture = self.useFixture(moxstubout.MoxStubout())
         self.mox = mox_fixture.mox
         self.stubs = mox_fixture.stubs
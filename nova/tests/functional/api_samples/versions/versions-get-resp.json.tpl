@@ -22,7 +22,7 @@
                 }
             ],
             "status": "CURRENT",
-            "version": "2.3",
+            "version": "2.4",
             "min_version": "2.1",
             "updated": "2013-07-23T11:33:21Z"
         }
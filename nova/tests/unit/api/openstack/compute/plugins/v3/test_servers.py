@@ -591,6 +591,20 @@ class ServersControllerTest(ControllerTest):
                            'marker': [fakes.get_fake_uuid(2)]}
         self.assertThat(params, matchers.DictMatches(expected_params))
 
+    def test_get_servers_with_limit_page_token(self):
+        req = fakes.HTTPRequestV3.blank('/servers?limit=3', version='2.4')
+        res_dict = self.controller.index(req)
+
+        servers_links = res_dict['servers_links']
+        href_parts = urlparse.urlparse(servers_links[0]['href'])
+        params = urlparse.parse_qs(href_parts.query)
+        page_token = nova_utils.decode_page_token(
+            params.pop('page_token')[0])
+        self.assertEqual(fakes.get_fake_uuid(2), page_token['marker'])
+        expected_params = {'limit': ['3'],
+                           'marker': [fakes.get_fake_uuid(2)]}
+        self.assertThat(params, matchers.DictMatches(expected_params))
+
     def test_get_servers_with_limit_bad_value(self):
         req = fakes.HTTPRequestV3.blank('/servers?limit=aaa')
         self.assertRaises(webob.exc.HTTPBadRequest,
@@ -671,6 +685,34 @@ class ServersControllerTest(ControllerTest):
         servers = self.controller.index(req)['servers']
         self.assertEqual([s['name'] for s in servers], ['server3', 'server4'])
 
+    @mock.patch('nova.compute.api.API.get_all')
+    def test_get_servers_with_page_token(self, mock_get_all):
+        mock_get_all.return_value = objects.InstanceList(objects=[])
+        page_token = nova_utils.encode_page_token(
+            fakes.get_fake_uuid(2), ['created_at'], ['desc'], {})
+        url = '/servers?limit=2&marker=%s&page_token=%s' % (
+            fakes.get_fake_uuid(1), page_token)
+        req = fakes.HTTPRequestV3.blank(url, version='2.4')
+        self.controller.index(req)
+        self.assertEqual(page_token,
+                         mock_get_all.call_args[1]['marker'])
+
+    @mock.patch('nova.compute.api.API.get_all')
+    def test_get_servers_with_page_token_old_version(self, mock_get_all):
+        mock_get_all.return_value = objects.InstanceList(objects=[])
+        url = '/servers?limit=2&marker=%s&page_token=%s' % (
+            fakes.get_fake_uuid(1), nova_utils.PAGE_TOKEN_PREFIX)
+        req = fakes.HTTPRequestV3.blank(url, version='2.3')
+        self.controller.index(req)
+        self.assertEqual(fakes.get_fake_uuid(1),
+                         mock_get_all.call_args[1]['marker'])
+
+    def test_get_servers_with_bad_page_token(self):
+        url = '/servers?page_token=%s' % nova_utils.PAGE_TOKEN_PREFIX
+        req = fakes.HTTPRequestV3.blank(url, version='2.4')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
     def test_get_servers_with_bad_marker(self):
         req = fakes.HTTPRequestV3.blank('/servers?limit=2&marker=asdf')
         self.assertRaises(webob.exc.HTTPBadRequest,
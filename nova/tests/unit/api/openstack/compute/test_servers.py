@@ -637,6 +637,16 @@ class ServersControllerTest(ControllerTest):
         servers = self.controller.index(req)['servers']
         self.assertEqual([s['name'] for s in servers], ['server3', 'server4'])
 
+    @mock.patch('nova.compute.api.API.get_all')
+    def test_get_servers_ignores_page_token(self, mock_get_all):
+        mock_get_all.return_value = objects.InstanceList(objects=[])
+        url = '/fake/servers?limit=2&marker=%s&page_token=%s' % (
+            fakes.get_fake_uuid(1), nova_utils.PAGE_TOKEN_PREFIX)
+        req = fakes.HTTPRequest.blank(url)
+        self.controller.index(req)
+        self.assertEqual(fakes.get_fake_uuid(1),
+                         mock_get_all.call_args[1]['marker'])
+
     def test_get_servers_with_bad_marker(self):
         req = fakes.HTTPRequest.blank('/fake/servers?limit=2&marker=asdf')
         self.assertRaises(webob.exc.HTTPBadRequest,
@@ -6863,17 +6863,17 @@ class ComputeTestCase(BaseTestCase):
         instances.append(instance2)
 
         self.mox.StubOutWithMock(objects.InstanceList,
-                                 'get_by_filters')
+                                 'iter_by_filters')
         self.mox.StubOutWithMock(self.compute, '_deleted_old_enough')
         self.mox.StubOutWithMock(objects.BlockDeviceMappingList,
                                  'get_by_instance_uuid')
         self.mox.StubOutWithMock(self.compute, '_delete_instance')
 
-        objects.InstanceList.get_by_filters(
+        objects.InstanceList.iter_by_filters(
             ctxt, mox.IgnoreArg(),
             expected_attrs=instance_obj.INSTANCE_DEFAULT_FIELDS,
             use_slave=True
-            ).AndReturn(instances)
+            ).AndReturn(iter(instances))
 
         # The first instance delete fails.
         self.compute._deleted_old_enough(instance1, 3600).AndReturn(True)
@@ -6906,7 +6906,8 @@ class ComputeTestCase(BaseTestCase):
         self.compute.driver.get_info(mox.IgnoreArg()).AndRaise(
             exception.InstanceNotFound(instance_id='fake-uuid'))
         self.compute._sync_instance_power_state(ctxt, mox.IgnoreArg(),
-                                                power_state.NOSTATE).AndRaise(
+                                                power_state.NOSTATE,
+                                                use_slave=True).AndRaise(
             exception.InstanceNotFound(instance_id='fake-uuid'))
 
         self.compute.driver.get_info(mox.IgnoreArg()).AndReturn(
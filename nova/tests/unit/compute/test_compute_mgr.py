@@ -1154,7 +1154,7 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.mox.ReplayAll()
         self.compute._instance_usage_audit(self.context)
 
-    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    @mock.patch.object(objects.InstanceList, 'get_columns_by_host')
     def test_sync_power_states(self, mock_get):
         instance = mock.Mock()
         mock_get.return_value = [instance]
@@ -1162,7 +1162,8 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                'spawn_n') as mock_spawn:
             self.compute._sync_power_states(mock.sentinel.context)
             mock_get.assert_called_with(mock.sentinel.context,
-                                        self.compute.host, expected_attrs=[],
+                                        self.compute.host,
+                                        ['uuid', 'task_state'],
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
@@ -1245,29 +1246,51 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                 self._test_sync_to_stop(power_state.RUNNING, vs, ps,
                                         stop=False)
 
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
     @mock.patch('nova.compute.manager.ComputeManager.'
                 '_sync_instance_power_state')
     def test_query_driver_power_state_and_sync_pending_task(
-            self, mock_sync_power_state):
+            self, mock_sync_power_state, mock_get_by_uuid):
+        with mock.patch.object(self.compute.driver,
+                               'get_info') as mock_get_info:
+            db_record = mock.Mock(uuid='fake-uuid',
+                                  task_state=task_states.POWERING_OFF)
+            self.compute._query_driver_power_state_and_sync(self.context,
+                                                            db_record)
+            self.assertFalse(mock_get_by_uuid.called)
+            self.assertFalse(mock_get_info.called)
+            self.assertFalse(mock_sync_power_state.called)
+
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
+    @mock.patch('nova.compute.manager.ComputeManager.'
+                '_sync_instance_power_state')
+    def test_query_driver_power_state_and_sync_not_found_db(
+            self, mock_sync_power_state, mock_get_by_uuid):
+        mock_get_by_uuid.side_effect = exception.InstanceNotFound(
+            instance_id='fake-uuid')
         with mock.patch.object(self.compute.driver,
                                'get_info') as mock_get_info:
-            db_instance = objects.Instance(uuid='fake-uuid',
-                                           task_state=task_states.POWERING_OFF)
+            db_record = mock.Mock(uuid='fake-uuid', task_state=None)
             self.compute._query_driver_power_state_and_sync(self.context,
-                                                            db_instance)
+                                                            db_record)
+            mock_get_by_uuid.assert_called_once_with(
+                self.context, 'fake-uuid', expected_attrs=[], use_slave=True)
             self.assertFalse(mock_get_info.called)
             self.assertFalse(mock_sync_power_state.called)
 
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
     @mock.patch('nova.compute.manager.ComputeManager.'
                 '_sync_instance_power_state')
     def test_query_driver_power_state_and_sync_not_found_driver(
-            self, mock_sync_power_state):
+            self, mock_sync_power_state, mock_get_by_uuid):
         error = exception.InstanceNotFound(instance_id=1)
         with mock.patch.object(self.compute.driver,
                                'get_info', side_effect=error) as mock_get_info:
+            db_record = mock.Mock(uuid='fake-uuid', task_state=None)
             db_instance = objects.Instance(uuid='fake-uuid', task_state=None)
+            mock_get_by_uuid.return_value = db_instance
             self.compute._query_driver_power_state_and_sync(self.context,
-                                                            db_instance)
+                                                            db_record)
             mock_get_info.assert_called_once_with(db_instance)
             mock_sync_power_state.assert_called_once_with(self.context,
                                                           db_instance,
@@ -2462,6 +2485,11 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             self.assertIsInstance(mock_r.call_args_list[0][0][0],
                                   objects.Instance)
 
+    def test_get_object_versions(self):
+        versions = self.compute.get_object_versions(self.context)
+        self.assertEqual(objects.Instance.VERSION, versions['Instance'])
+        self.assertEqual(objects.ComputeNode.VERSION, versions['ComputeNode'])
+
 
 class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
     def setUp(self):
@@ -49,19 +49,22 @@ class ComputeXenTestCase(stubs.XenAPITestBaseNoDB):
                 objects.InstanceList(), [db_instance], None)
         instance = instance_list[0]
 
-        self.mox.StubOutWithMock(objects.InstanceList, 'get_by_host')
+        self.mox.StubOutWithMock(objects.InstanceList, 'get_columns_by_host')
+        self.mox.StubOutWithMock(objects.Instance, 'get_by_uuid')
         self.mox.StubOutWithMock(self.compute.driver, 'get_num_instances')
         self.mox.StubOutWithMock(vm_utils, 'lookup')
         self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
 
-        objects.InstanceList.get_by_host(ctxt,
-                self.compute.host, expected_attrs=[],
-                use_slave=True).AndReturn(instance_list)
-        self.compute.driver.get_num_instances().AndReturn(1)
+        objects.InstanceList.get_columns_by_host(ctxt,
+                self.compute.host, ['uuid', 'task_state'],
+                use_slave=True).AndReturn([instance])
+        objects.Instance.get_by_uuid(ctxt, instance.uuid, expected_attrs=[],
+                use_slave=True).AndReturn(instance)
         vm_utils.lookup(self.compute.driver._session, instance['name'],
                 False).AndReturn(None)
         self.compute._sync_instance_power_state(ctxt, instance,
-                power_state.NOSTATE)
+                power_state.NOSTATE, use_slave=True)
+        self.compute.driver.get_num_instances().AndReturn(1)
 
         self.mox.ReplayAll()
 
@@ -18,10 +18,13 @@ Unit Tests for nova.compute.rpcapi
 
 import contextlib
 
+import fixtures
 import mock
 from oslo_config import cfg
+import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 
+from nova.compute import cells_api
 from nova.compute import rpcapi as compute_rpcapi
 from nova import context
 from nova.objects import block_device as objects_block_dev
@@ -1041,3 +1044,97 @@ class ComputeRpcAPITestCase(test.NoDBTestCase):
                                limits={'numa_topology': limits},
                                legacy_limits={'numa_topology': legacy_limits},
                                version='3.33')
+
+
+@mock.patch.dict(compute_rpcapi._OBJECT_VERSIONS, clear=True)
+class ObjectVersionsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ObjectVersionsTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.instance = fake_instance.fake_instance_obj(self.context,
+                                                        host='fake_host')
+        self.client = mock.Mock()
+        self.client.can_send_version.return_value = True
+        self.cctxt = self.client.prepare.return_value
+        # Fetch the versions right away rather than in a green thread
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.utils.spawn_n',
+            lambda func, *args, **kwargs: func(*args, **kwargs)))
+
+    def _get_object_versions(self):
+        return compute_rpcapi._get_object_versions(
+            self.client, self.context, 'fake_host')
+
+    def test_cast_backports_objects(self):
+        self.flags(compute='4.1', group='upgrade_levels')
+        rpcapi = compute_rpcapi.ComputeAPI()
+        rpcapi.client._client = self.client
+        self.cctxt.call.return_value = {'Instance': '1.19'}
+        rpcapi.unquiesce_instance(self.context, self.instance)
+        rpcapi.unquiesce_instance(self.context, self.instance)
+        self.cctxt.call.assert_called_once_with(self.context,
+                                                'get_object_versions')
+        self.client.prepare.assert_any_call(
+            server='fake_host', version='4.1',
+            timeout=CONF.object_versions_timeout)
+        self.assertEqual(2, self.cctxt.cast.call_count)
+        # The first cast does not wait for the versions of the host
+        args, kwargs = self.cctxt.cast.call_args_list[1]
+        self.assertEqual('unquiesce_instance', args[1])
+        self.assertEqual('1.19', kwargs['instance']['nova_object.version'])
+        self.assertIsNone(kwargs['mapping'])
+
+    def test_client_not_wrapped_without_pin(self):
+        rpcapi = compute_rpcapi.ComputeAPI()
+        self.assertNotIsInstance(rpcapi.client,
+                                 compute_rpcapi._ObjectVersionsClient)
+
+    def test_cells_client_not_wrapped(self):
+        self.flags(compute='4.1', group='upgrade_levels')
+        rpcapi = cells_api.ComputeRPCProxyAPI()
+        self.assertNotIsInstance(rpcapi.client,
+                                 compute_rpcapi._ObjectVersionsClient)
+
+    def test_get_object_versions_unsupported(self):
+        self.client.can_send_version.return_value = False
+        self.assertIsNone(self._get_object_versions())
+        self.assertFalse(self.client.prepare.called)
+
+    def test_get_object_versions_disabled(self):
+        self.flags(object_versions_timeout=0)
+        self.assertIsNone(self._get_object_versions())
+        self.assertFalse(self.client.prepare.called)
+
+    @mock.patch('nova.utils.spawn_n')
+    def test_get_object_versions_pending(self, mock_spawn):
+        self.addCleanup(compute_rpcapi._OBJECT_VERSIONS_PENDING.clear)
+        for i in range(2):
+            self.assertIsNone(self._get_object_versions())
+        mock_spawn.assert_called_once_with(
+            compute_rpcapi._fetch_object_versions, self.client,
+            self.context, 'fake_host')
+
+    @mock.patch('time.time')
+    def test_get_object_versions_failure_retried(self, mock_time):
+        mock_time.return_value = 1000
+        self.cctxt.call.side_effect = [messaging.MessagingTimeout(),
+                                       {'Instance': '1.19'}]
+        for i in range(2):
+            self.assertIsNone(self._get_object_versions())
+        self.assertEqual(1, self.cctxt.call.call_count)
+        mock_time.return_value += compute_rpcapi._OBJECT_VERSIONS_TTL
+        self._get_object_versions()
+        self.assertEqual({'Instance': '1.19'}, self._get_object_versions())
+
+    @mock.patch('time.time')
+    def test_get_object_versions_expire(self, mock_time):
+        mock_time.return_value = 1000
+        self.cctxt.call.side_effect = [{'Instance': '1.18'},
+                                       {'Instance': '1.19'}]
+        self._get_object_versions()
+        self.assertEqual({'Instance': '1.18'}, self._get_object_versions())
+        mock_time.return_value += compute_rpcapi._OBJECT_VERSIONS_TTL
+        # The expired versions are used until the new ones are known
+        self.assertEqual({'Instance': '1.18'}, self._get_object_versions())
+        self.assertEqual({'Instance': '1.19'}, self._get_object_versions())
@@ -496,6 +496,14 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.assertRaises(messaging.ExpectedException,
                           self._test_object_action, True, True)
 
+    def test_object_actions_read_from_master(self):
+        self.context.db_wrote = False
+        self._test_object_action(False, False)
+        self.assertTrue(self.context.db_wrote)
+        self.context.db_wrote = False
+        self._test_object_action(True, False)
+        self.assertTrue(self.context.db_wrote)
+
     def test_object_action_copies_object(self):
         class TestObject(obj_base.NovaObject):
             fields = {'dict': fields.DictOfStringsField()}
@@ -515,6 +523,23 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.assertIn('dict', updates)
         self.assertEqual({'foo': 'bar'}, updates['dict'])
 
+    def test_object_delta_action(self):
+        class TestObject(obj_base.NovaObject):
+            fields = {'sent': fields.IntegerField(),
+                      'unchanged': fields.IntegerField(),
+                      'loaded': fields.IntegerField()}
+
+            def save(self):
+                self.sent = 2
+                self.loaded = 3
+                self.obj_reset_changes()
+
+        obj = TestObject(sent=1, unchanged=1)
+        updates, result = self.conductor.object_delta_action(
+            self.context, obj, 'save', tuple(), {})
+        self.assertEqual({'sent': 2, 'obj_what_changed': set()}, updates)
+        self.assertTrue(self.context.db_wrote)
+
     def _test_expected_exceptions(self, db_method, conductor_method, errors,
                                   *args, **kwargs):
         # Tests that expected exceptions are handled properly.
@@ -813,6 +838,17 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor.security_groups_trigger_handler(self.context,
                                                        'event', ['arg'])
 
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_action')
+    def test_object_delta_action_old_conductor(self, mock_action):
+        with mock.patch.object(self.conductor.client, 'can_send_version',
+                               return_value=False) as mock_can_send:
+            result = self.conductor.object_delta_action(
+                self.context, mock.sentinel.obj, 'save', [], {})
+        mock_can_send.assert_called_once_with('2.2')
+        mock_action.assert_called_once_with(
+            self.context, mock.sentinel.obj, 'save', [], {})
+        self.assertEqual(mock_action.return_value, result)
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
@@ -36,6 +36,7 @@ from oslo_utils import uuidutils
 import six
 from sqlalchemy import Column
 from sqlalchemy.dialects import sqlite
+from sqlalchemy import ForeignKey
 from sqlalchemy import inspect
 from sqlalchemy import Integer
 from sqlalchemy import MetaData
@@ -399,6 +400,70 @@ class UnsupportedDbRegexpTestCase(DbTestCase):
                     marker = insts[-1]['uuid']
                     self.assertEqual(correct[-1]['uuid'], marker)
 
+    def test_instance_get_all_by_filters_sort_keys_page_token(self,
+            mock_get_regexp):
+        '''Verifies sort order with pagination by page tokens.'''
+        test1_active = self.create_instance_with_args(
+                            display_name='test1',
+                            vm_state=vm_states.ACTIVE)
+        test1_error = self.create_instance_with_args(
+                           display_name='test1',
+                           vm_state=vm_states.ERROR)
+        test1_error2 = self.create_instance_with_args(
+                            display_name='test1',
+                            vm_state=vm_states.ERROR)
+        test2_active = self.create_instance_with_args(
+                            display_name='test2',
+                            vm_state=vm_states.ACTIVE)
+        test2_error = self.create_instance_with_args(
+                           display_name='test2',
+                           vm_state=vm_states.ERROR)
+        self.create_instance_with_args(display_name='other')
+        filters = {'display_name': '%test%'}
+        sort_keys = ['display_name', 'vm_state']
+        sort_dirs = ['asc', 'desc']
+        correct_order = [test1_error, test1_error2, test1_active,
+                         test2_error, test2_active]
+
+        with mock.patch.object(sqlalchemy_api,
+                               '_instance_get_by_uuid') as mock_get:
+            for limit in range(1, 4):
+                marker = None
+                for i in range(0, 6, limit):
+                    correct = correct_order[i:i + limit]
+                    insts = self._assert_equals_inst_order(
+                        correct, filters,
+                        sort_keys=sort_keys, sort_dirs=sort_dirs,
+                        limit=limit, marker=marker)
+                    if correct:
+                        last = insts[-1]
+                        marker = utils.encode_page_token(
+                            last['uuid'], sort_keys, sort_dirs,
+                            {key: last[key] for key in
+                             ('display_name', 'vm_state', 'created_at',
+                              'id')})
+            self.assertFalse(mock_get.called)
+
+    def test_instance_get_all_by_filters_page_token_other_sort(self,
+            mock_get_regexp):
+        '''Verifies the marker of a token for other sort keys is used.'''
+        test1 = self.create_instance_with_args(display_name='test1')
+        test2 = self.create_instance_with_args(display_name='test2')
+        marker = utils.encode_page_token(
+            test1['uuid'], ['vm_state'], ['asc'],
+            {'vm_state': test1['vm_state'], 'id': test1['id'],
+             'created_at': test1['created_at']})
+        self._assert_equals_inst_order(
+            [test2], {}, sort_keys=['display_name'], sort_dirs=['asc'],
+            marker=marker)
+
+    def test_instance_get_all_by_filters_page_token_invalid(self,
+            mock_get_regexp):
+        self.assertRaises(exception.InvalidPageToken,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, {},
+                          marker=utils.PAGE_TOKEN_PREFIX + 'garbage')
+
     def test_instance_get_deleted_by_filters_sort_keys_paginate(self,
             mock_get_regexp):
         '''Verifies sort order with pagination for deleted instances.'''
@@ -1001,6 +1066,106 @@ class SqlAlchemyDbApiNoDbTestCase(test.NoDBTestCase):
         mock_facade.get_session.assert_called_once_with()
 
 
+class _FakeRoutedBackend(object):
+    @staticmethod
+    @sqlalchemy_api.read_only
+    def thing_get(context):
+        return sqlalchemy_api._routed_to_slave()
+
+    @staticmethod
+    def thing_update(context):
+        sqlalchemy_api._note_write(None, None, ' UPDATE things SET x=1',
+                                   None, None, False)
+        return sqlalchemy_api._routed_to_slave()
+
+    @staticmethod
+    @sqlalchemy_api.read_only
+    def thing_get_twice(context, backend):
+        return backend.thing_get(context)
+
+
+class ReplicaRoutingTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ReplicaRoutingTestCase, self).setUp()
+        self.flags(slave_read_routing=True)
+        self.flags(slave_connection='sqlite://', group='database')
+        patcher = mock.patch.dict(sqlalchemy_api._SLAVE_LAG_CHECK,
+                                  {'checked_at': None, 'lag_ok': False})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.context = context.RequestContext('fake-user', 'fake-project')
+        self.backend = sqlalchemy_api._ReplicaRoutingBackend(
+            _FakeRoutedBackend())
+
+    def test_read_only_routed_to_slave(self):
+        self.assertTrue(self.backend.thing_get(self.context))
+        self.assertFalse(sqlalchemy_api._routed_to_slave())
+
+    def test_not_read_only_not_routed(self):
+        self.assertFalse(self.backend.thing_update(self.context))
+
+    def test_nested_call_follows_outer_routing(self):
+        self.assertTrue(self.backend.thing_get_twice(self.context,
+                                                     self.backend))
+
+    def test_read_your_writes(self):
+        self.assertFalse(self.context.db_wrote)
+        self.backend.thing_update(self.context)
+        self.assertTrue(self.context.db_wrote)
+        self.assertFalse(self.backend.thing_get(self.context))
+        self.assertTrue(self.context.to_dict()['db_wrote'])
+
+    def test_note_write_ignores_reads(self):
+        sqlalchemy_api._routing.context = self.context
+        try:
+            sqlalchemy_api._note_write(None, None, 'SELECT 1', None, None,
+                                       False)
+        finally:
+            sqlalchemy_api._routing.context = None
+        self.assertFalse(self.context.db_wrote)
+
+    def test_no_slave_connection(self):
+        self.flags(slave_connection='', group='database')
+        self.assertFalse(self.backend.thing_get(self.context))
+
+    def test_allow_and_deny_lists(self):
+        self.flags(slave_read_deny=['thing_get'])
+        self.assertFalse(self.backend.thing_get(self.context))
+        self.flags(slave_read_deny=[], slave_read_allow=['other_get'])
+        self.assertFalse(self.backend.thing_get(self.context))
+        self.flags(slave_read_allow=['thing_get'])
+        self.assertTrue(self.backend.thing_get(self.context))
+
+    @mock.patch.object(sqlalchemy_api, '_slave_lag')
+    @mock.patch.object(sqlalchemy_api.time, 'time')
+    def test_lag_guard(self, mock_time, mock_lag):
+        self.flags(slave_read_max_lag=5, slave_lag_check_interval=10)
+        mock_time.return_value = 100
+        mock_lag.return_value = 2
+        self.assertTrue(self.backend.thing_get(self.context))
+        # The lag is only measured again after slave_lag_check_interval
+        mock_lag.return_value = 30
+        mock_time.return_value = 105
+        self.assertTrue(self.backend.thing_get(self.context))
+        mock_time.return_value = 110
+        self.assertFalse(self.backend.thing_get(self.context))
+        # Replication not running
+        mock_lag.return_value = None
+        mock_time.return_value = 120
+        self.assertFalse(self.backend.thing_get(self.context))
+        self.assertEqual(3, mock_lag.call_count)
+
+    @mock.patch.object(sqlalchemy_api, '_create_facade_lazily')
+    def test_get_session_routed(self, mock_facade):
+        sqlalchemy_api._routing.use_slave = True
+        try:
+            sqlalchemy_api.get_session()
+        finally:
+            sqlalchemy_api._routing.use_slave = False
+        mock_facade.return_value.get_session.assert_called_once_with(
+            use_slave=True)
+
+
 class SqlAlchemyDbApiTestCase(DbTestCase):
     def test_instance_get_all_by_host(self):
         ctxt = context.get_admin_context()
@@ -1020,6 +1185,20 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         self.assertEqual(2, len(result))
         self.assertEqual(types.UnicodeType, type(result[0]))
 
+    def test_instance_get_all_columns_by_host(self):
+        ctxt = context.get_admin_context()
+        inst1 = self.create_instance_with_args(task_state='spawning')
+        inst2 = self.create_instance_with_args(vm_state='soft-delete')
+        inst3 = self.create_instance_with_args()
+        self.create_instance_with_args(host='host2')
+        db.instance_destroy(ctxt, inst3['uuid'])
+        result = db.instance_get_all_columns_by_host(
+            ctxt, 'host1', ['uuid', 'task_state', 'vm_state'])
+        self.assertEqual(
+            sorted([(inst1['uuid'], 'spawning', 'fake'),
+                    (inst2['uuid'], None, 'soft-delete')]),
+            sorted(result))
+
     def test_instance_get_active_by_window_joined(self):
         now = datetime.datetime(2013, 10, 10, 17, 16, 37, 156701)
         start_time = now - datetime.timedelta(minutes=10)
@@ -2061,6 +2240,47 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         instances = db.instance_get_all_by_filters(self.ctxt, {}, limit=0)
         self.assertEqual([], instances)
 
+    def test_instance_get_all_by_filters_chunked(self):
+        instances = [self.create_instance_with_args(
+                         metadata={'key': 'value%d' % i})
+                     for i in range(5)]
+        chunks = list(db.instance_get_all_by_filters_chunked(
+            self.ctxt, {}, chunk_size=2))
+        self.assertEqual([2, 2, 1], [len(chunk) for chunk in chunks])
+        filtered_instances = [inst for chunk in chunks for inst in chunk]
+        self.assertEqual(sorted(inst['uuid'] for inst in instances),
+                         [inst['uuid'] for inst in filtered_instances])
+        self._assertEqualListsOfInstances(instances, filtered_instances)
+        for inst in filtered_instances:
+            self.assertEqual(1, len(inst['metadata']))
+
+    def test_instance_get_all_by_filters_chunked_after_uuid(self):
+        uuids = sorted(self.create_instance_with_args()['uuid']
+                       for i in range(3))
+        chunks = list(db.instance_get_all_by_filters_chunked(
+            self.ctxt, {}, chunk_size=3, after_uuid=uuids[0]))
+        self.assertEqual([uuids[1:]],
+                         [[inst['uuid'] for inst in chunk]
+                          for chunk in chunks])
+
+    def test_instance_get_all_by_filters_chunked_filters(self):
+        self.create_instance_with_args(host='host1')
+        instance = self.create_instance_with_args(host='host2')
+        chunks = list(db.instance_get_all_by_filters_chunked(
+            self.ctxt, {'host': 'host2'}, chunk_size=1))
+        self.assertEqual([[instance['uuid']]],
+                         [[inst['uuid'] for inst in chunk]
+                          for chunk in chunks])
+
+    def test_instance_get_all_by_filters_chunked_is_lazy(self):
+        self.create_instance_with_args()
+        with mock.patch.object(sqlalchemy_api,
+                               '_instances_fill_metadata') as mock_fill:
+            chunks = db.instance_get_all_by_filters_chunked(self.ctxt, {})
+            self.assertFalse(mock_fill.called)
+            next(chunks)
+            self.assertEqual(1, mock_fill.call_count)
+
     def test_instance_metadata_get_multi(self):
         uuids = [self.create_instance_with_args()['uuid'] for i in range(3)]
         meta = sqlalchemy_api._instance_metadata_get_multi(self.ctxt, uuids)
@@ -2092,6 +2312,73 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                                 {'display_name': 't.*st.'})
         self._assertEqualListsOfInstances(result, [i1, i2])
 
+    def test_instance_get_all_by_filters_regex_anchored(self):
+        i1 = self.create_instance_with_args(display_name='web1')
+        i2 = self.create_instance_with_args(display_name='web12')
+        self.create_instance_with_args(display_name='aweb1')
+        self.create_instance_with_args(display_name='wEb1')
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^web1$'})
+        self._assertEqualListsOfInstances([i1], result)
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^web1'})
+        self._assertEqualListsOfInstances([i1, i2], result)
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^web1.$'})
+        self._assertEqualListsOfInstances([i2], result)
+
+    def test_instance_get_all_by_filters_regex_like_chars(self):
+        i1 = self.create_instance_with_args(display_name='web_1%')
+        self.create_instance_with_args(display_name='webx1')
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^web_1'})
+        self._assertEqualListsOfInstances([i1], result)
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^web_1%$'})
+        self._assertEqualListsOfInstances([i1], result)
+
+    def test_regex_literal_prefix(self):
+        self.assertEqual(('web', ''),
+                         sqlalchemy_api._regex_literal_prefix('web'))
+        self.assertEqual(('web-', '[0-9]+'),
+                         sqlalchemy_api._regex_literal_prefix('web-[0-9]+'))
+        self.assertEqual(('we', 'b*'),
+                         sqlalchemy_api._regex_literal_prefix('web*'))
+        self.assertEqual(('a.b', '$'),
+                         sqlalchemy_api._regex_literal_prefix('a\\.b$'))
+        self.assertEqual(('a', '\\d'),
+                         sqlalchemy_api._regex_literal_prefix('a\\d'))
+        self.assertEqual(('', '.*'),
+                         sqlalchemy_api._regex_literal_prefix('.*'))
+
+    def test_plan_regex_filter(self):
+        column = models.Instance.display_name
+
+        def plan(pattern):
+            return sqlalchemy_api._plan_regex_filter(column, pattern)
+
+        self.assertEqual(('regex', None, True), plan('web'))
+        self.assertEqual(('regex', None, True), plan('^web|db'))
+        self.assertEqual(('regex', None, True), plan('^.*web'))
+        kind, predicate, needs_regex = plan('^web1$')
+        self.assertEqual('equal', kind)
+        self.assertFalse(needs_regex)
+        self.assertEqual('instances.display_name = :display_name_1',
+                         str(predicate))
+        kind, predicate, needs_regex = plan('^web_1')
+        self.assertEqual('prefix', kind)
+        self.assertTrue(needs_regex)
+        self.assertEqual({'display_name_1': 'web!_1%'},
+                         predicate.compile().params)
+
+    @mock.patch.object(sqlalchemy_api.LOG, 'debug')
+    def test_instance_get_all_by_filters_regex_plan_logged(self, mock_debug):
+        db.instance_get_all_by_filters(self.ctxt, {'display_name': '^web',
+                                                   'hostname': 'web'})
+        mock_debug.assert_any_call(
+            'Instance regex filters planned as: %s',
+            'display_name=prefix, hostname=regex')
+
     def test_instance_get_all_by_filters_changes_since(self):
         i1 = self.create_instance_with_args(updated_at=
                                             '2013-12-05T15:03:25.000000')
@@ -2436,6 +2723,30 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                     db.instance_update, self.ctxt, instance['uuid'],
                     {'host': 'h1', 'expected_vm_state': ('spam', 'bar')})
 
+    def test_instance_update_many(self):
+        instances = [self.create_instance_with_args(task_state=task_state)
+                     for task_state in (None, None, 'deleting')]
+        uuids = [instance['uuid'] for instance in instances]
+        uuids.append('00000000-0000-0000-0000-000000000000')
+        conflicts = db.instance_update_many(
+            self.ctxt, uuids, {'task_state': 'spawning', 'host': 'h2',
+                               'expected_task_state': None})
+        self.assertEqual(set(uuids[2:]), set(conflicts))
+        self.assertIsInstance(conflicts[uuids[2]],
+                              exception.UnexpectedDeletingTaskStateError)
+        self.assertIsInstance(conflicts[uuids[3]], exception.InstanceNotFound)
+        for instance_uuid in uuids[:2]:
+            instance = db.instance_get_by_uuid(self.ctxt, instance_uuid)
+            self.assertEqual('spawning', instance['task_state'])
+            self.assertEqual('h2', instance['host'])
+        instance = db.instance_get_by_uuid(self.ctxt, uuids[2])
+        self.assertEqual('deleting', instance['task_state'])
+        self.assertEqual('h1', instance['host'])
+
+    def test_instance_update_many_metadata(self):
+        self.assertRaises(exception.InvalidInput, db.instance_update_many,
+                          self.ctxt, [], {'metadata': {'foo': 'bar'}})
+
     def test_instance_update_with_instance_uuid(self):
         # test instance_update() works when an instance UUID is passed.
         ctxt = context.get_admin_context()
@@ -6226,6 +6537,83 @@ class QuotaTestCase(test.TestCase, ModelsObjectComparatorMixin):
             resources_names.remove(reservation.resource)
         self.assertEqual(len(resources_names), 0)
 
+    def _reserve_conditional(self, user_id, delta, limit=3, in_use=1,
+                             until_refresh=None, refresh_due=True):
+        def sync(elevated, project_id, user_id, session):
+            return {'resource0': in_use}
+        resources = {'resource0': quota.ReservableResource(
+            'resource0', '_sync_resource0')}
+        quotas = {'resource0': limit}
+        with mock.patch.dict(sqlalchemy_api.QUOTA_SYNC_FUNCTIONS,
+                             {'_sync_resource0': sync}):
+            return db.quota_reserve_conditional(
+                self.ctxt, resources, quotas, quotas, {'resource0': delta},
+                timeutils.utcnow(), until_refresh, None, 'project1', user_id,
+                refresh_due=refresh_due)
+
+    def test_quota_reserve_conditional(self):
+        reservations = self._reserve_conditional('user1', 2)
+        self.assertEqual(1, len(reservations))
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource0',
+                                   'user1')
+        self.assertEqual(1, usage.in_use)
+        self.assertEqual(2, usage.reserved)
+        self.assertRaises(exception.OverQuota,
+                          self._reserve_conditional, 'user1', 1)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource0',
+                                   'user1')
+        self.assertEqual(2, usage.reserved)
+
+    def test_quota_reserve_conditional_refresh_due(self):
+        self._reserve_conditional('user1', 1, until_refresh=2)
+        # The reservation counts until_refresh down to 1, the next one is
+        # due for a refresh
+        self._reserve_conditional('user1', 1, in_use=0, until_refresh=2,
+                                  refresh_due=False)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource0',
+                                   'user1')
+        self.assertEqual(1, usage.in_use)
+        self._reserve_conditional('user1', -1, in_use=0, until_refresh=2)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource0',
+                                   'user1')
+        self.assertEqual(0, usage.in_use)
+
+    @mock.patch.object(sqlalchemy_api, '_quota_reserve_retry_sleep')
+    def test_quota_reserve_conditional_project_over(self, mock_sleep):
+        self._reserve_conditional('user1', 1)
+        # Both users only have 2 of the 3 instances of the project
+        self.assertRaises(exception.OverQuota,
+                          self._reserve_conditional, 'user2', 1)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource0',
+                                   'user2')
+        self.assertEqual(0, usage.reserved)
+        self.assertEqual(
+            sqlalchemy_api._QUOTA_RESERVE_CONDITIONAL_RETRIES - 1,
+            mock_sleep.call_count)
+        self.assertEqual(1, sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation, read_deleted="no").count())
+
+    def test_quota_usage_refresh(self):
+        self._reserve_conditional('user1', 1)
+        db.quota_usage_update(self.ctxt, 'project1', 'user1', 'resource0',
+                              in_use=-1)
+
+        def sync(elevated, project_id, user_id, session):
+            return {'resource0': 2}
+        resources = {'resource0': quota.ReservableResource(
+            'resource0', '_sync_resource0')}
+        with mock.patch.dict(sqlalchemy_api.QUOTA_SYNC_FUNCTIONS,
+                             {'_sync_resource0': sync}):
+            self.assertEqual(1, db.quota_usage_refresh(self.ctxt, resources,
+                                                       None, None))
+            # Nothing is due for a refresh any more
+            self.assertEqual(0, db.quota_usage_refresh(self.ctxt, resources,
+                                                       None, None))
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource0',
+                                   'user1')
+        self.assertEqual(2, usage.in_use)
+        self.assertEqual(1, usage.reserved)
+
     def test_quota_destroy_all_by_project(self):
         reservations = _quota_reserve(self.ctxt, 'project1', 'user1')
         db.quota_destroy_all_by_project(self.ctxt, 'project1')
@@ -6620,6 +7008,22 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
             # Clean up the service
             db.service_destroy(self.ctxt, service['id'])
 
+    def test_compute_node_get_all_changed_since(self):
+        before = timeutils.utcnow() - datetime.timedelta(minutes=1)
+        after = timeutils.utcnow() + datetime.timedelta(minutes=1)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, before)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+        self.assertEqual(
+            [], db.compute_node_get_all_changed_since(self.ctxt, after))
+
+    def test_compute_node_get_all_changed_since_deleted(self):
+        before = timeutils.utcnow() - datetime.timedelta(minutes=1)
+        db.compute_node_delete(self.ctxt, self.item['id'])
+        self.assertEqual([], db.compute_node_get_all(self.ctxt))
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, before)
+        self.assertEqual(1, len(nodes))
+        self.assertTrue(nodes[0]['deleted'])
+
     def test_compute_node_get_all_mult_compute_nodes_one_service_entry(self):
         service_data = self.service_dict.copy()
         service_data['host'] = 'host2'
@@ -7947,6 +8351,98 @@ class ArchiveTestCase(test.TestCase):
             'shadow_instance_id_mappings'
         )
 
+    def _create_deleted_instance_id_mappings(self):
+        ids = []
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(uuid=uuidstr,
+                                                                 deleted=1)
+            ids.append(self.conn.execute(ins_stmt).inserted_primary_key[0])
+        return ids
+
+    def test_archive_table_levels(self):
+        levels = sqlalchemy_api._archive_table_levels()
+        level_of = {tablename: level
+                    for level, tablenames in enumerate(levels)
+                    for tablename in tablenames}
+        self.assertLess(level_of['instance_metadata'], level_of['instances'])
+        self.assertLess(level_of['instance_extra'], level_of['instances'])
+        self.assertLess(level_of['instance_actions_events'],
+                        level_of['instance_actions'])
+        self.assertLess(level_of['consoles'], level_of['console_pools'])
+
+    def test_archive_table_levels_cycle(self):
+        metadata = MetaData()
+        Table('a', metadata, Column('id', Integer, primary_key=True),
+              Column('b_id', Integer, ForeignKey('b.id')))
+        Table('b', metadata, Column('id', Integer, primary_key=True),
+              Column('a_id', Integer, ForeignKey('a.id')))
+        Table('c', metadata, Column('id', Integer, primary_key=True),
+              Column('a_id', Integer, ForeignKey('a.id')))
+        with mock.patch.object(models.BASE, 'metadata', metadata):
+            levels = sqlalchemy_api._archive_table_levels()
+        self.assertEqual(['a', 'b', 'c'],
+                         sorted(tablename for tablenames in levels
+                                for tablename in tablenames))
+
+    def test_archive_run_rows_left_not_negative(self):
+        run = sqlalchemy_api._ArchiveRun(3, None)
+        self.assertEqual(3, run.take(5))
+        run.archived(3, 4)
+        self.assertEqual(0, run.rows_left)
+        self.assertEqual(0, run.take(5))
+
+    def test_archive_deleted_rows_stats(self):
+        self._create_deleted_instance_id_mappings()
+        table_stats = db.archive_deleted_rows(self.context, workers=4)
+        self.assertEqual(['instance_id_mappings'], list(table_stats))
+        self.assertEqual(6, table_stats['instance_id_mappings']['rows'])
+        self.assertIn('seconds', table_stats['instance_id_mappings'])
+        self._assert_shadow_tables_empty_except(
+            'shadow_instance_id_mappings')
+
+    def test_archive_deleted_rows_checkpoint(self):
+        ids = self._create_deleted_instance_id_mappings()
+        checkpoint = {}
+        sqlalchemy_api.archive_deleted_rows(self.context, max_rows=2,
+                                            checkpoint=checkpoint,
+                                            batch_size=1)
+        self.assertEqual({'instance_id_mappings': ids[1]}, checkpoint)
+        # A resumed run does not scan the rows before the checkpoint again
+        with mock.patch.object(sqlalchemy_api, '_archive_deleted_rows_batch',
+                wraps=sqlalchemy_api._archive_deleted_rows_batch) as batch:
+            table_stats = sqlalchemy_api.archive_deleted_rows(
+                self.context, max_rows=3, checkpoint=checkpoint)
+        self.assertEqual(3, table_stats['instance_id_mappings']['rows'])
+        self.assertEqual({'instance_id_mappings': ids[4]}, checkpoint)
+        self.assertIn(mock.call(mock.ANY, mock.ANY, mock.ANY, 3,
+                                after=ids[1]),
+                      batch.call_args_list)
+        qsiim = sql.select([self.shadow_instance_id_mappings.c.id])
+        self.assertEqual(sorted(ids[:5]),
+                         sorted(row[0] for row in
+                                self.conn.execute(qsiim).fetchall()))
+
+    def test_archive_deleted_rows_checkpoint_restarts(self):
+        ids = self._create_deleted_instance_id_mappings()
+        # Rows deleted behind the checkpoint are archived as well
+        checkpoint = {'instance_id_mappings': ids[3]}
+        table_stats = db.archive_deleted_rows(self.context,
+                                              checkpoint=checkpoint)
+        self.assertEqual(6, table_stats['instance_id_mappings']['rows'])
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.time', return_value=100.0)
+    def test_archive_deleted_rows_rate_limited(self, mock_time, mock_sleep):
+        self._create_deleted_instance_id_mappings()
+        sqlalchemy_api.archive_deleted_rows(self.context,
+                                            max_rows_per_second=2,
+                                            batch_size=2)
+        # The clock does not move, so each batch of 2 rows waits 1 more
+        # second than the previous one.
+        delays = [args[0] for args, kwargs in mock_sleep.call_args_list
+                  if args[0]]
+        self.assertEqual([1.0, 2.0, 3.0], delays)
+
 
 class InstanceGroupDBApiTestCase(test.TestCase, ModelsObjectComparatorMixin):
     def setUp(self):
@@ -0,0 +1,131 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the metrics of the database API and engines."""
+
+import fixtures
+import mock
+from sqlalchemy import create_engine
+
+from nova.db.sqlalchemy import metrics
+from nova import test
+
+
+class _FakeBackend(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.version = 1
+
+    def get_two(self):
+        return self.engine.execute('SELECT 1 UNION SELECT 2').fetchall()
+
+    def get_two_twice(self, backend):
+        # An API function calling another one through the backend
+        return backend.get_two() + self.get_two()
+
+    def _private(self):
+        pass
+
+
+class DbMetricsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(DbMetricsTestCase, self).setUp()
+        self.metrics = metrics.DbMetrics()
+        self.engine = create_engine('sqlite://')
+        self.metrics.instrument_engine(self.engine)
+        self.backend = metrics.MeteredBackend(_FakeBackend(self.engine),
+                                              self.metrics)
+
+    def test_call(self):
+        self.assertEqual([(1,), (2,)], self.backend.get_two())
+        self.assertEqual([(1,), (2,)], self.backend.get_two())
+        report = self.metrics.report()
+        stats = report['functions']['get_two']
+        self.assertEqual(2, stats['calls'])
+        self.assertEqual(2, stats['statements'])
+        self.assertEqual(2, sum(stats['latency']))
+        self.assertEqual(2, report['pool']['checkouts'])
+        self.assertEqual(2, sum(report['pool']['latency']))
+
+    def test_nested_call(self):
+        self.backend.get_two_twice(self.backend)
+        functions = self.metrics.report()['functions']
+        self.assertEqual(['get_two_twice'], list(functions))
+        self.assertEqual(1, functions['get_two_twice']['calls'])
+        self.assertEqual(2, functions['get_two_twice']['statements'])
+
+    def test_statement_outside_function(self):
+        self.engine.execute('SELECT 1')
+        stats = self.metrics.report()['functions'][metrics.OTHER]
+        self.assertEqual(0, stats['calls'])
+        self.assertEqual(1, stats['statements'])
+
+    def test_call_error(self):
+        self.assertRaises(AttributeError, self.backend.get_two_twice, None)
+        self.assertEqual(1, self.metrics.functions['get_two_twice']['calls'])
+        self.backend.get_two()
+        self.assertEqual(1, self.metrics.functions['get_two']['calls'])
+
+    def test_attributes_not_wrapped(self):
+        self.assertEqual(1, self.backend.version)
+        self.assertEqual(_FakeBackend._private.__func__,
+                         self.backend._private.__func__)
+
+    def test_latency_bucket(self):
+        self.assertEqual(0, metrics._bucket(0.0005))
+        self.assertEqual(1, metrics._bucket(0.005))
+        self.assertEqual(len(metrics.LATENCY_BUCKETS), metrics._bucket(10))
+
+    def test_merge_reports(self):
+        self.backend.get_two()
+        report = self.metrics.report()
+        self.backend.get_two()
+        merged = metrics.merge_reports([report, self.metrics.report()])
+        self.assertEqual(3, merged['functions']['get_two']['calls'])
+        self.assertEqual(3, sum(merged['functions']['get_two']['latency']))
+        self.assertEqual(3, merged['pool']['checkouts'])
+
+    def test_format_report(self):
+        self.backend.get_two()
+        lines = metrics.format_report(self.metrics.report())
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].startswith('get_two '))
+        self.assertTrue(lines[2].startswith('pool: 1 checkouts'))
+
+    def test_dump_and_read_reports(self):
+        self.flags(db_metrics_dir=self.useFixture(fixtures.TempDir()).path)
+        self.assertEqual([], metrics.read_reports())
+        self.backend.get_two()
+        with mock.patch.object(metrics, 'get_metrics',
+                               return_value=self.metrics):
+            metrics.dump()
+            metrics.dump()
+        reports = metrics.read_reports()
+        self.assertEqual(1, len(reports))
+        self.assertEqual(1, reports[0]['functions']['get_two']['calls'])
+
+    @mock.patch.object(metrics, '_dump_safely')
+    @mock.patch('nova.utils.spawn_n')
+    def test_dump_on_signal_spawns_dump(self, mock_spawn, mock_dump):
+        metrics._dump_on_signal(None, None)
+        mock_spawn.assert_called_once_with(mock_dump)
+        self.assertFalse(mock_dump.called)
+
+    @mock.patch.object(metrics.LOG, 'exception')
+    @mock.patch.object(metrics, 'dump', side_effect=IOError)
+    def test_dump_safely_logs_errors(self, mock_dump, mock_log):
+        metrics._dump_safely()
+        mock_dump.assert_called_once_with()
+        self.assertTrue(mock_log.called)
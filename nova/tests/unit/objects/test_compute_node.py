@@ -346,6 +346,19 @@ class _TestComputeNodeObject(object):
                          subs=self.subs(),
                          comparators=self.comparators())
 
+    def test_get_all_changed_since(self):
+        changes_since = timeutils.parse_isotime('2015-01-01T00:00:00Z')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all_changed_since(
+            self.context, changes_since).AndReturn([fake_compute_node])
+        self.mox.ReplayAll()
+        computes = compute_node.ComputeNodeList.get_all_changed_since(
+            self.context, changes_since)
+        self.assertEqual(1, len(computes))
+        self.compare_obj(computes[0], fake_compute_node,
+                         subs=self.subs(),
+                         comparators=self.comparators())
+
     def test_get_by_hypervisor(self):
         self.mox.StubOutWithMock(db, 'compute_node_search_by_hypervisor')
         db.compute_node_search_by_hypervisor(self.context, 'hyper').AndReturn(
@@ -1210,6 +1210,31 @@ class TestInstanceObject(test_objects._LocalTest,
 
 class TestRemoteInstanceObject(test_objects._RemoteTest,
                                _TestInstanceObject):
+    def test_save_delta_keeps_new_flavor(self):
+        self.flags(send_object_deltas=True)
+        flavor = flavors.get_default_flavor()
+        inst = objects.Instance(context=self.context,
+                                flavor=flavor,
+                                old_flavor=None, new_flavor=None,
+                                user_id=self.context.user_id,
+                                project_id=self.context.project_id)
+        inst.create()
+        inst = objects.Instance.get_by_uuid(self.context, inst.uuid,
+                                            expected_attrs=['flavor'])
+        new_flavor = flavors.get_flavor_by_name('m1.large')
+        # set_flavor() saves the instance
+        inst.set_flavor(new_flavor, 'new')
+        sent, method = self.remote_object_calls[-1]
+        self.assertEqual('save', method)
+        for name in ('flavor', 'old_flavor', 'new_flavor'):
+            self.assertTrue(sent.obj_attr_is_set(name))
+        self.assertEqual('m1.large', inst.new_flavor.name)
+        inst = objects.Instance.get_by_uuid(self.context, inst.uuid,
+                                            expected_attrs=['flavor'])
+        self.assertEqual(flavor.flavorid, inst.flavor.flavorid)
+        self.assertIsNone(inst.old_flavor)
+        self.assertEqual(new_flavor.flavorid, inst.new_flavor.flavorid)
+
     def test_flavor_shows_up_in_lazy_loaded_sysmeta_for_old_instance(self):
         flavor = flavors.get_default_flavor()
         inst = objects.Instance(context=self.context,
@@ -1359,6 +1384,52 @@ class _TestInstanceListObject(object):
         self.assertEqual(inst_list.objects[0].uuid, fakes[1]['uuid'])
         self.assertRemotes()
 
+    def test_get_by_filters_chunk(self):
+        fakes = [self.fake_instance(1), self.fake_instance(2)]
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_filters_chunked')
+        db.instance_get_all_by_filters_chunked(
+            self.context, {'foo': 'bar'}, chunk_size=2, after_uuid='uuid',
+            columns_to_join=['metadata'], use_slave=True).AndReturn(
+                iter([fakes, [self.fake_instance(3)]]))
+        self.mox.ReplayAll()
+        inst_list = instance.InstanceList.get_by_filters_chunk(
+            self.context, {'foo': 'bar'}, after_uuid='uuid', limit=2,
+            expected_attrs=['metadata'], use_slave=True)
+
+        self.assertEqual(2, len(inst_list))
+        for i in range(0, len(fakes)):
+            self.assertIsInstance(inst_list.objects[i], instance.Instance)
+            self.assertEqual(inst_list.objects[i].uuid, fakes[i]['uuid'])
+        self.assertRemotes()
+
+    def test_get_by_filters_chunk_empty(self):
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_filters_chunked')
+        db.instance_get_all_by_filters_chunked(
+            self.context, {}, chunk_size=1000, after_uuid=None,
+            columns_to_join=None, use_slave=False).AndReturn(iter([]))
+        self.mox.ReplayAll()
+        inst_list = instance.InstanceList.get_by_filters_chunk(
+            self.context, {})
+        self.assertEqual(0, len(inst_list))
+
+    @mock.patch.object(instance.InstanceList, 'get_by_filters_chunk')
+    def test_iter_by_filters(self, mock_get_chunk):
+        chunks = [[instance.Instance(uuid='uuid%d' % i) for i in range(2)],
+                  [instance.Instance(uuid='uuid2')]]
+        mock_get_chunk.side_effect = chunks
+        instances = instance.InstanceList.iter_by_filters(
+            self.context, {'foo': 'bar'}, chunk_size=2,
+            expected_attrs=['metadata'], use_slave=True)
+        self.assertFalse(mock_get_chunk.called)
+
+        self.assertEqual(['uuid0', 'uuid1', 'uuid2'],
+                         [inst.uuid for inst in instances])
+        mock_get_chunk.assert_has_calls([
+            mock.call(self.context, {'foo': 'bar'}, after_uuid=None,
+                      limit=2, expected_attrs=['metadata'], use_slave=True),
+            mock.call(self.context, {'foo': 'bar'}, after_uuid='uuid1',
+                      limit=2, expected_attrs=['metadata'], use_slave=True)])
+
     def test_get_by_host(self):
         fakes = [self.fake_instance(1),
                  self.fake_instance(2)]
@@ -1375,6 +1446,29 @@ class _TestInstanceListObject(object):
         self.assertEqual(inst_list.obj_what_changed(), set())
         self.assertRemotes()
 
+    @mock.patch.object(db, 'instance_get_all_columns_by_host')
+    def test_get_columns_by_host(self, mock_get):
+        mock_get.return_value = [('uuid1', None), ('uuid2', 'spawning')]
+        records = instance.InstanceList.get_columns_by_host(
+            self.context, 'foo', ['uuid', 'task_state'], use_slave=True)
+        mock_get.assert_called_once_with(self.context, 'foo',
+                                         ['uuid', 'task_state'],
+                                         use_slave=True)
+        self.assertEqual(['uuid1', 'uuid2'], [r.uuid for r in records])
+        self.assertEqual([None, 'spawning'], [r.task_state for r in records])
+        self.assertRaises(AttributeError, setattr, records[0], 'uuid', 'x')
+        self.assertEqual((), type(records[0]).__slots__)
+        self.assertIs(type(records[0]), type(records[1]))
+        self.assertRemotes()
+
+    @mock.patch.object(db, 'instance_get_all_columns_by_host')
+    def test_get_columns_by_host_invalid_column(self, mock_get):
+        for column in ('foo', 'metadata', 'info_cache', 'created_at'):
+            self.assertRaises(exception.ObjectActionError,
+                              instance.InstanceList.get_columns_by_host,
+                              self.context, 'foo', ['uuid', column])
+        self.assertFalse(mock_get.called)
+
     def test_get_by_host_and_node(self):
         fakes = [self.fake_instance(1),
                  self.fake_instance(2)]
@@ -1485,6 +1579,43 @@ class _TestInstanceListObject(object):
                          dict(instances[0].fault.iteritems()))
         self.assertIsNone(instances[1].fault)
 
+    @mock.patch.object(instance.Instance, 'save')
+    @mock.patch.object(db, 'instance_update_many')
+    def test_bulk_save(self, mock_update_many, mock_save):
+        insts = [instance.Instance(uuid='uuid%d' % i, task_state=None)
+                 for i in range(3)]
+        for inst in insts:
+            inst.obj_reset_changes()
+            inst.task_state = 'spawning'
+        insts[2].metadata = {'foo': 'bar'}
+        mock_update_many.return_value = {
+            'uuid1': exception.UnexpectedTaskStateError(actual='deleting',
+                                                        expected=(None,))}
+        inst_list = instance.InstanceList(self.context, objects=insts)
+
+        errors = inst_list.bulk_save(expected_task_state=[None])
+
+        self.assertEqual({'uuid1': 'UnexpectedTaskStateError'}, errors)
+        mock_update_many.assert_called_once_with(
+            self.context, ['uuid0', 'uuid1'],
+            {'task_state': 'spawning', 'updated_at': mock.ANY,
+             'expected_task_state': [None]})
+        mock_save.assert_called_once_with(expected_vm_state=None,
+                                          expected_task_state=[None])
+        self.assertEqual(set(), inst_list[0].obj_what_changed())
+        self.assertIn('task_state', inst_list[1].obj_what_changed())
+
+    def test_bulk_save_notifications(self):
+        self.flags(notify_on_state_change='vm_state')
+        inst = instance.Instance(uuid='uuid0', task_state=None)
+        inst.obj_reset_changes()
+        inst.task_state = 'spawning'
+        inst_list = instance.InstanceList(self.context, objects=[inst])
+        with mock.patch.object(instance.Instance, 'save',
+                side_effect=exception.InstanceNotFound(instance_id='uuid0')):
+            self.assertEqual({'uuid0': 'InstanceNotFound'},
+                             inst_list.bulk_save())
+
     def test_fill_faults(self):
         self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
 
@@ -16,6 +16,7 @@ from collections import OrderedDict
 import contextlib
 import copy
 import datetime
+import gc
 import hashlib
 import inspect
 import os
@@ -267,6 +268,68 @@ class TestObjMakeList(test.NoDBTestCase):
             self.assertEqual(db_objs[index]['missing'], item.missing)
 
 
+class TestCompactObject(test.NoDBTestCase):
+    def setUp(self):
+        super(TestCompactObject, self).setUp()
+
+        class MyCompactObj(MyObj):
+            obj_compact = True
+            __slots__ = ('_extra',)
+
+        class MyCompactSubObj(MyCompactObj):
+            fields = {'new_field': fields.StringField()}
+
+        self.cls = MyCompactObj
+        self.subcls = MyCompactSubObj
+
+    def _assertNoDict(self, obj):
+        # Reading obj.__dict__ would create it
+        self.assertFalse([ref for ref in gc.get_referents(obj)
+                          if type(ref) is dict])
+
+    def test_slots(self):
+        self.assertEqual(('_bar', '_changed_fields', '_context',
+                          '_created_at', '_deleted', '_deleted_at', '_extra',
+                          '_foo', '_missing', '_mutable_default',
+                          '_readonly', '_rel_object', '_rel_objects',
+                          '_updated_at'),
+                         self.cls.__slots__)
+        self.assertEqual(('_new_field',), self.subcls.__slots__)
+        self.assertFalse(hasattr(MyObj, '__slots__'))
+
+    def test_no_dict(self):
+        obj = self.subcls(foo=1, bar='bar', new_field='new')
+        obj._extra = 'extra'
+        self._assertNoDict(obj)
+        self.assertEqual(set(['foo', 'bar', 'new_field']),
+                         obj.obj_what_changed())
+        self.assertTrue(obj.obj_attr_is_set('bar'))
+        self.assertFalse(obj.obj_attr_is_set('missing'))
+
+    def test_primitive_round_trip(self):
+        obj = self.cls(foo=1, bar='bar')
+        obj.obj_reset_changes(['foo'])
+        obj2 = base.NovaObject.obj_from_primitive(obj.obj_to_primitive())
+        self.assertIsInstance(obj2, self.cls)
+        self._assertNoDict(obj2)
+        self.assertEqual(1, obj2.foo)
+        self.assertEqual('bar', obj2.bar)
+        self.assertEqual(set(['bar']), obj2.obj_what_changed())
+
+    def test_clone(self):
+        obj = self.cls(foo=1, rel_object=MyOwnedObject(baz=2))
+        obj2 = obj.obj_clone()
+        self.assertEqual(1, obj2.foo)
+        self.assertEqual(2, obj2.rel_object.baz)
+        self.assertIsNot(obj.rel_object, obj2.rel_object)
+        self.assertFalse(obj2.obj_attr_is_set('bar'))
+
+    def test_other_attributes(self):
+        obj = self.cls(foo=1)
+        obj.not_a_slot = 'value'
+        self.assertEqual('value', obj.not_a_slot)
+
+
 def compare_obj(test, obj, db_obj, subs=None, allow_missing=None,
                 comparators=None):
     """Compare a NovaObject and a dict-like database object.
@@ -393,6 +456,18 @@ class _RemoteTest(_BaseTestCase):
         self.stubs.Set(self.conductor_service.manager, 'object_action',
                        fake_object_action)
 
+        orig_object_delta_action = \
+            self.conductor_service.manager.object_delta_action
+
+        def fake_object_delta_action(*args, **kwargs):
+            self.remote_object_calls.append((kwargs.get('objinst'),
+                                             kwargs.get('objmethod')))
+            with things_temporarily_local():
+                result = orig_object_delta_action(*args, **kwargs)
+            return result
+        self.stubs.Set(self.conductor_service.manager, 'object_delta_action',
+                       fake_object_delta_action)
+
         # Things are remoted by default in this session
         self.useFixture(nova_fixtures.IndirectionAPIFixture(
                             conductor_rpcapi.ConductorAPI()))
@@ -540,6 +615,85 @@ class _TestObject(object):
         obj2.obj_reset_changes()
         self.assertEqual(obj2.obj_what_changed(), set())
 
+    def test_primitive_table(self):
+        table = {entry[0]: entry for entry in MyObj._obj_primitive_table}
+        self.assertEqual(set(MyObj.fields), set(table))
+        self.assertEqual('_foo', table['foo'][1])
+        for name in ('foo', 'bar', 'readonly', 'deleted'):
+            self.assertIsNotNone(table[name][3])
+        for name in ('created_at', 'rel_object', 'rel_objects',
+                     'mutable_default'):
+            self.assertIsNone(table[name][3])
+
+    def test_from_primitive_coerces(self):
+        primitive = {'nova_object.name': 'MyObj',
+                     'nova_object.namespace': 'nova',
+                     'nova_object.version': '1.6',
+                     'nova_object.data': {
+                         'foo': None, 'bar': 2, 'rel_object': None,
+                         'created_at': '2015-03-02T22:31:56Z',
+                         'mutable_default': ['a']}}
+        obj = MyObj.obj_from_primitive(primitive)
+        self.assertEqual(1, obj.foo)
+        self.assertEqual(u'2', obj.bar)
+        self.assertIsInstance(obj.bar, unicode)
+        self.assertIsNone(obj.rel_object)
+        self.assertEqual(timeutils.parse_isotime('2015-03-02T22:31:56Z'),
+                         obj.created_at)
+        self.assertEqual(['a'], obj.mutable_default)
+        self.assertFalse(obj.obj_attr_is_set('missing'))
+        self.assertEqual(set(), obj.obj_what_changed())
+
+    def test_to_primitive_round_trip(self):
+        obj = MyObj(foo=1, bar='bar', readonly=2, rel_object=None,
+                    created_at=timeutils.parse_isotime('2015-03-02T22:31:56Z'),
+                    rel_objects=[MyOwnedObject(baz=3)])
+        primitive = obj.obj_to_primitive()
+        self.assertEqual('2015-03-02T22:31:56Z',
+                         primitive['nova_object.data']['created_at'])
+        obj2 = MyObj.obj_from_primitive(primitive)
+        for name in ('foo', 'bar', 'readonly', 'rel_object', 'created_at'):
+            self.assertEqual(getattr(obj, name), getattr(obj2, name))
+        self.assertEqual(3, obj2.rel_objects[0].baz)
+        self.assertEqual(obj.obj_what_changed(), obj2.obj_what_changed())
+
+    def test_obj_set_from_db(self):
+        created_at = datetime.datetime(2015, 3, 2, 22, 31, 56)
+        db_obj = {'foo': None, 'bar': 'bar', 'missing': u'missing',
+                  'deleted': False, 'created_at': created_at,
+                  'readonly': 2}
+        coerced = []
+        real_coerce = fields.Field.coerce
+
+        def fake_coerce(field, obj, attr, value):
+            coerced.append(attr)
+            return real_coerce(field, obj, attr, value)
+
+        obj = MyObj()
+        with mock.patch.object(fields.Field, 'coerce', fake_coerce):
+            base.obj_set_from_db(obj, db_obj, db_obj.keys())
+        # The integer, the boolean and the unicode string are trusted
+        self.assertEqual(set(['foo', 'bar', 'created_at']), set(coerced))
+        # The default of a non-nullable field is still applied
+        self.assertEqual(1, obj.foo)
+        self.assertEqual(2, obj.readonly)
+        self.assertEqual(u'missing', obj.missing)
+        self.assertIsInstance(obj.bar, unicode)
+        self.assertIsNotNone(obj.created_at.utcoffset())
+        self.assertEqual(set(), obj.obj_what_changed())
+
+    def test_obj_set_from_db_verify(self):
+        self.flags(verify_db_hydration=True)
+        obj = MyObj()
+        base.obj_set_from_db(obj, {'foo': 1, 'bar': u'bar'}, ['foo', 'bar'])
+        self.assertEqual(1, obj.foo)
+        self.assertEqual(set(['foo', 'bar']), obj.obj_what_changed())
+
+    def test_obj_set_from_db_invalid_value(self):
+        obj = MyObj()
+        self.assertRaises(ValueError, base.obj_set_from_db, obj,
+                          {'foo': 'not-an-int'}, ['foo'])
+
     def test_obj_class_from_name(self):
         obj = base.NovaObject.obj_class_from_name('MyObj', '1.5')
         self.assertEqual('1.5', obj.VERSION)
@@ -979,6 +1133,55 @@ class TestRemoteObject(_RemoteTest, _TestObject):
         obj = MyObj2.query(self.context)
         self.assertEqual('bar', obj.bar)
 
+    @mock.patch.object(MyObj, 'obj_delta_fields', ('foo',))
+    def test_save_sends_delta(self):
+        self.flags(send_object_deltas=True)
+        obj = MyObj(context=self.context, foo=1, bar='bar', readonly=1)
+        obj.obj_reset_changes()
+        obj.bar = 'changed'
+        obj.save()
+        sent, method = self.remote_object_calls[-1]
+        self.assertEqual('save', method)
+        self.assertEqual(set(['foo', 'bar']),
+                         set(name for name in sent.fields
+                             if sent.obj_attr_is_set(name)))
+        self.assertEqual(1, obj.readonly)
+        self.assertEqual('changed', obj.bar)
+        self.assertEqual(set(), obj.obj_what_changed())
+
+    @mock.patch.object(MyObj, 'obj_delta_groups', (('bar', 'readonly'),))
+    @mock.patch.object(MyObj, 'obj_delta_fields', ('foo',))
+    def test_save_sends_delta_groups(self):
+        self.flags(send_object_deltas=True)
+        obj = MyObj(context=self.context, foo=1, bar='bar', readonly=1)
+        obj.obj_reset_changes()
+        obj.bar = 'changed'
+        obj.save()
+        sent, method = self.remote_object_calls[-1]
+        self.assertEqual(set(['foo', 'bar', 'readonly']),
+                         set(name for name in sent.fields
+                             if sent.obj_attr_is_set(name)))
+
+    @mock.patch.object(MyObj, 'obj_delta_groups', (('bar', 'readonly'),))
+    @mock.patch.object(MyObj, 'obj_delta_fields', ('foo',))
+    def test_save_sends_whole_object_without_delta_group(self):
+        self.flags(send_object_deltas=True)
+        obj = MyObj(context=self.context, foo=1, bar='bar', rel_object=None)
+        obj.obj_reset_changes()
+        obj.bar = 'changed'
+        obj.save()
+        sent, method = self.remote_object_calls[-1]
+        self.assertTrue(sent.obj_attr_is_set('rel_object'))
+
+    def test_save_sends_whole_object_without_delta_fields(self):
+        self.flags(send_object_deltas=True)
+        obj = MyObj(context=self.context, foo=1, bar='bar', readonly=1)
+        obj.obj_reset_changes()
+        obj.bar = 'changed'
+        obj.save()
+        sent, method = self.remote_object_calls[-1]
+        self.assertTrue(sent.obj_attr_is_set('readonly'))
+
 
 class TestObjectListBase(test.NoDBTestCase):
     def test_list_like_operations(self):
@@ -1161,6 +1364,29 @@ class TestObjectSerializer(_BaseTestCase):
         self.assertIsInstance(obj2, MyObj)
         self.assertEqual(self.context, obj2._context)
 
+    def test_serialize_entity_version_manifest(self):
+        ser = base.NovaObjectSerializer(version_manifest={'MyObj': '1.1'})
+        obj = MyObj(bar='bar')
+        primitives = ser.serialize_entity(self.context, [obj])
+        self.assertEqual('1.1', primitives[0]['nova_object.version'])
+        self.assertEqual('oldbar', primitives[0]['nova_object.data']['bar'])
+
+    def test_serialize_entity_version_manifest_no_backport(self):
+        obj = MyObj(bar='bar')
+        for version in ('1.6', '1.7', '2.0'):
+            ser = base.NovaObjectSerializer(
+                version_manifest={'MyObj': version})
+            primitive = ser.serialize_entity(self.context, obj)
+            self.assertEqual('1.6', primitive['nova_object.version'])
+        ser = base.NovaObjectSerializer(version_manifest={'Other': '1.0'})
+        primitive = ser.serialize_entity(self.context, obj)
+        self.assertEqual('1.6', primitive['nova_object.version'])
+
+    def test_obj_version_manifest(self):
+        manifest = base.obj_version_manifest()
+        self.assertEqual(MyObj.VERSION, manifest['MyObj'])
+        self.assertEqual(objects.Instance.VERSION, manifest['Instance'])
+
     def test_object_serialization_iterables(self):
         ser = base.NovaObjectSerializer()
         obj = MyObj()
@@ -1207,7 +1433,7 @@ object_data = {
     'BlockDeviceMappingList': '1.10-44b9818d5e90a7396eb807540cbe42c0',
     'CellMapping': '1.0-4b1616970814c3c819e10c7ef6b9c3d5',
     'ComputeNode': '1.11-5f8cd6948ad98fcc0c39b79d49acc4b6',
-    'ComputeNodeList': '1.11-f09b7f64339350b4296ac85c07e3a573',
+    'ComputeNodeList': '1.12-0c912e0583539479288fcdccaa544fd8',
     'DNSDomain': '1.0-5bdc288d7c3b723ce86ede998fd5c9ba',
     'DNSDomainList': '1.0-bc58364180c693203ebcf5e5d5775736',
     'EC2Ids': '1.0-8e193896fa01cec598b875aea94da608',
@@ -1232,7 +1458,7 @@ object_data = {
     'InstanceGroup': '1.9-a77a59735d62790dcaa413a21acfaa73',
     'InstanceGroupList': '1.6-4642a730448b2336dfbf0f410f9c0cab',
     'InstanceInfoCache': '1.5-ef7394dae46cff2dd560324555cb85cf',
-    'InstanceList': '1.17-d453df4d1e7e1ec3b5b8b089672a870f',
+    'InstanceList': '1.20-8055fd33a466152aeeee26cdcfd19f41',
     'InstanceMapping': '1.0-d7cfc251f16c93df612af2b9de59e5b7',
     'InstanceMappingList': '1.0-1e388f466f8a306ab3c0a0bb26479435',
     'InstanceNUMACell': '1.2-5d2dfa36e9ecca9b63f24bf3bc958ea4',
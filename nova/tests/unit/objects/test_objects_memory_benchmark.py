@@ -0,0 +1,161 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Memory benchmark of the __dict__ and compact layouts of objects.
+
+The unit tests only check the sizes of the layouts. To measure them, run
+the benchmark with tools/benchmark.py, e.g.:
+
+    python tools/benchmark.py objects --objects 1000,10000,50000
+
+For each object class and number of objects, one JSON line is printed with,
+for both layouts, the bytes every object uses to store its fields, the time
+spent hydrating the objects from a primitive and the time spent reading all
+their fields. The fields of both layouts are copied from the object class,
+so the two only differ by where the objects store them.
+"""
+
+import gc
+import sys
+import time
+
+from nova import context
+from nova import objects
+from nova.objects import base
+from nova import test
+from nova.tests.unit import fake_instance
+
+COMPUTE_NODE = {
+    'id': 1,
+    'service_id': 1,
+    'host': 'host1',
+    'vcpus': 16,
+    'memory_mb': 65536,
+    'local_gb': 1024,
+    'vcpus_used': 4,
+    'memory_mb_used': 8192,
+    'local_gb_used': 80,
+    'hypervisor_type': 'QEMU',
+    'hypervisor_version': 2000000,
+    'hypervisor_hostname': 'host1',
+    'free_ram_mb': 57344,
+    'free_disk_gb': 944,
+    'current_workload': 0,
+    'running_vms': 4,
+    'cpu_info': '{}',
+    'disk_available_least': 900,
+    'metrics': '[]',
+    'stats': {'num_instances': '4'},
+    'host_ip': '192.168.1.1',
+    'numa_topology': None,
+    'supported_hv_specs': [],
+    'pci_device_pools': None,
+}
+
+
+def layout_size(obj):
+    """Return the bytes an object uses to store its fields.
+
+    This is the size of the object and of its __dict__ if it has one, not
+    of the values of its fields.
+    """
+    size = sys.getsizeof(obj)
+    slot_values = [getattr(obj, slot)
+                   for cls in type(obj).__mro__
+                   for slot in cls.__dict__.get('__slots__', ())
+                   if hasattr(obj, slot)]
+    # Reading obj.__dict__ would create it if the object had none
+    for ref in gc.get_referents(obj):
+        if (type(ref) is dict and
+                not any(ref is value for value in slot_values)):
+            size += sys.getsizeof(ref)
+    return size
+
+
+def make_layouts(obj_class):
+    """Return object classes with the fields of obj_class, by layout."""
+    layouts = {}
+    for layout, compact in (('dict', False), ('compact', True)):
+        name = '%sBenchmark%s' % (obj_class.obj_name(), layout.title())
+        layout_class = base.NovaObjectMetaclass(
+            name, (base.NovaObject,),
+            {'VERSION': obj_class.VERSION,
+             'fields': dict(obj_class.fields),
+             'obj_compact': compact})
+        # The metaclass registered the class in nova.objects
+        if getattr(objects, name, None) is layout_class:
+            delattr(objects, name)
+        layouts[layout] = layout_class
+    return layouts
+
+
+def make_primitives(ctxt):
+    """Return the primitives of sample objects, by object class."""
+    instance = fake_instance.fake_instance_obj(
+        ctxt, display_name='benchmark', hostname='benchmark',
+        vm_state='active', power_state=1, memory_mb=2048, vcpus=2,
+        root_gb=20)
+    node = objects.ComputeNode(context=ctxt, **COMPUTE_NODE)
+    return {objects.Instance: instance.obj_to_primitive(),
+            objects.ComputeNode: node.obj_to_primitive()}
+
+
+def run_benchmark(ctxt, obj_class, primitive, num_objects):
+    """Hydrate num_objects objects of both layouts from a primitive."""
+    result = {'object': obj_class.obj_name(), 'objects': num_objects}
+    for layout, layout_class in sorted(make_layouts(obj_class).items()):
+        start = time.time()
+        objs = [layout_class._obj_from_primitive(ctxt, layout_class.VERSION,
+                                                 primitive)
+                for i in xrange(num_objects)]
+        hydrate_seconds = time.time() - start
+        names = [name for name in layout_class.fields
+                 if objs[0].obj_attr_is_set(name)]
+        start = time.time()
+        for obj in objs:
+            for name in names:
+                getattr(obj, name)
+        read_seconds = time.time() - start
+        bytes_per_object = layout_size(objs[0])
+        result[layout] = {
+            'bytes_per_object': bytes_per_object,
+            'bytes': bytes_per_object * num_objects,
+            'hydrate_seconds': hydrate_seconds,
+            'read_seconds': read_seconds,
+        }
+    return result
+
+
+class ObjectsMemoryBenchmarkTestCase(test.NoDBTestCase):
+    """Checks the sizes of the layouts measured by the benchmark."""
+
+    def setUp(self):
+        super(ObjectsMemoryBenchmarkTestCase, self).setUp()
+        self.context = context.RequestContext('fake-user', 'fake-project')
+
+    def test_compact_layout_is_smaller(self):
+        primitives = make_primitives(self.context)
+        for obj_class, primitive in primitives.items():
+            layouts = make_layouts(obj_class)
+            sizes = {}
+            for layout, layout_class in layouts.items():
+                obj = layout_class._obj_from_primitive(
+                    self.context, layout_class.VERSION, primitive)
+                sizes[layout] = layout_size(obj)
+            self.assertLess(sizes['compact'], sizes['dict'])
+
+    def test_compact_objects_have_no_dict(self):
+        instance = fake_instance.fake_instance_obj(self.context)
+        node = objects.ComputeNode(context=self.context, **COMPUTE_NODE)
+        node.obj_reset_changes()
+        for obj in (instance, node):
+            self.assertEqual(sys.getsizeof(obj), layout_size(obj))
@@ -144,19 +144,34 @@ class _TestQuotasObject(object):
         self.mox.ReplayAll()
         quotas.rollback()
 
+    @mock.patch.object(quota.QUOTAS, 'invalidate_limits')
     @mock.patch('nova.db.quota_create')
-    def test_create_limit(self, mock_create):
+    def test_create_limit(self, mock_create, mock_invalidate):
         quotas_obj.Quotas.create_limit(self.context, 'fake-project',
                                        'foo', 10, user_id='user')
         mock_create.assert_called_once_with(self.context, 'fake-project',
                                             'foo', 10, user_id='user')
+        mock_invalidate.assert_called_once_with()
 
+    @mock.patch.object(quota.QuotaEngine, '_driver',
+                       new_callable=mock.PropertyMock,
+                       return_value=object())
+    @mock.patch('nova.db.quota_create')
+    def test_create_limit_driver_without_invalidate(self, mock_create,
+                                                    mock_driver):
+        quotas_obj.Quotas.create_limit(self.context, 'fake-project',
+                                       'foo', 10, user_id='user')
+        mock_create.assert_called_once_with(self.context, 'fake-project',
+                                            'foo', 10, user_id='user')
+
+    @mock.patch.object(quota.QUOTAS, 'invalidate_limits')
     @mock.patch('nova.db.quota_update')
-    def test_update_limit(self, mock_update):
+    def test_update_limit(self, mock_update, mock_invalidate):
         quotas_obj.Quotas.update_limit(self.context, 'fake-project',
                                        'foo', 10, user_id='user')
         mock_update.assert_called_once_with(self.context, 'fake-project',
                                             'foo', 10, user_id='user')
+        mock_invalidate.assert_called_once_with()
 
 
 class TestQuotasObject(_TestQuotasObject, test_objects._LocalTest):
@@ -105,3 +105,20 @@ class TestAggImagePropsIsolationFilter(test.NoDBTestCase):
                                                     'foo2': 'bar3'}}}}
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_aggregate_image_properties_isolation_filter_all(self,
+            agg_mock):
+        metadata_index = {'foo': {'bar': set(['host1']),
+                                  'bar2': set(['host2'])},
+                          'foo2': {'bar3': set(['host1', 'host3'])}}
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'request_spec': {
+                                 'image': {
+                                     'properties': {'foo': 'bar',
+                                                    'foo2': 'bar3'}}},
+                             'aggregates_metadata_index': metadata_index}
+        hosts = [fakes.FakeHostState('host%s' % i, 'compute', {})
+                 for i in range(1, 5)]
+        result = self.filt_cls.filter_all(hosts, filter_properties)
+        self.assertEqual([hosts[0], hosts[2], hosts[3]], list(result))
+        self.assertFalse(agg_mock.called)
@@ -82,3 +82,30 @@ class TestAggregateInstanceExtraSpecsFilter(test.NoDBTestCase):
             'trust:trusted_host': 'true'
         }
         self._do_test_aggregate_filter_extra_specs(especs, passes=False)
+
+    def test_aggregate_filter_filter_all_with_index(self, agg_mock):
+        metadata_index = {'opt1': {'1': set(['host1', 'host2']),
+                                   '3': set(['host3'])},
+                          'opt2': {'2': set(['host1', 'host3'])}}
+        especs = {
+            'opt1': '1',
+            'aggregate_instance_extra_specs:opt2': '2',
+            'trust:trusted_host': 'true',
+        }
+        filter_properties = {'context': mock.sentinel.ctx,
+            'instance_type': {'memory_mb': 1024, 'extra_specs': especs},
+            'aggregates_metadata_index': metadata_index}
+        hosts = [fakes.FakeHostState('host%s' % i, 'node', {})
+                 for i in range(1, 5)]
+        result = self.filt_cls.filter_all(hosts, filter_properties)
+        self.assertEqual([hosts[0]], list(result))
+        self.assertFalse(agg_mock.called)
+
+    def test_aggregate_filter_filter_all_other_scopes(self, agg_mock):
+        filter_properties = {'context': mock.sentinel.ctx,
+            'instance_type': {'memory_mb': 1024,
+                              'extra_specs': {'trust:trusted_host': 'true'}},
+            'aggregates_metadata_index': {}}
+        hosts = [fakes.FakeHostState('host1', 'node', {})]
+        result = self.filt_cls.filter_all(hosts, filter_properties)
+        self.assertEqual(hosts, list(result))
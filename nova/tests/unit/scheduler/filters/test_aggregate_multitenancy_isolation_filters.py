@@ -72,3 +72,18 @@ class TestAggregateMultitenancyIsolationFilter(test.NoDBTestCase):
                                      'project_id': 'my_tenantid'}}}
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_aggregate_multi_tenancy_isolation_filter_all(self, agg_mock):
+        metadata_index = {'filter_tenant_id': {
+                              'my_tenantid': set(['host1']),
+                              'other_tenantid': set(['host1', 'host2'])}}
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'request_spec': {
+                                 'instance_properties': {
+                                     'project_id': 'my_tenantid'}},
+                             'aggregates_metadata_index': metadata_index}
+        hosts = [fakes.FakeHostState('host%s' % i, 'compute', {})
+                 for i in range(1, 4)]
+        result = self.filt_cls.filter_all(hosts, filter_properties)
+        self.assertEqual([hosts[0], hosts[2]], list(result))
+        self.assertFalse(agg_mock.called)
@@ -52,3 +52,23 @@ class TestAvailabilityZoneFilter(test.NoDBTestCase):
         request = self._make_zone_request('bad')
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertFalse(self.filt_cls.host_passes(host, request))
+
+    def _test_availability_zone_filter_all(self, zone):
+        request = self._make_zone_request(zone)
+        request['aggregates_metadata_index'] = {
+            'availability_zone': {'nova': set(['host1']),
+                                  'az1': set(['host2'])}}
+        self.hosts = [fakes.FakeHostState('host%s' % i, 'node1', {})
+                      for i in range(1, 4)]
+        return list(self.filt_cls.filter_all(self.hosts, request))
+
+    def test_availability_zone_filter_all(self, agg_mock):
+        result = self._test_availability_zone_filter_all('az1')
+        self.assertEqual([self.hosts[1]], result)
+        self.assertFalse(agg_mock.called)
+
+    def test_availability_zone_filter_all_default_zone(self, agg_mock):
+        self.flags(default_availability_zone='nova')
+        result = self._test_availability_zone_filter_all('nova')
+        self.assertEqual([self.hosts[0], self.hosts[2]], result)
+        self.assertFalse(agg_mock.called)
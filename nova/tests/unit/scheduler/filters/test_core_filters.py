@@ -41,6 +41,27 @@ class TestCoreFilter(test.NoDBTestCase):
                 {'vcpus_total': 4, 'vcpus_used': 8})
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_core_filter_all(self):
+        self.filt_cls = core_filter.CoreFilter()
+        filter_properties = {'instance_type': {'vcpus': 1}}
+        self.flags(cpu_allocation_ratio=2)
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 7})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'vcpus_total': 4, 'vcpus_used': 8})
+        host3 = fakes.FakeHostState('host3', 'node3', {})
+        hosts = self.filt_cls.filter_all([host1, host2, host3],
+                                         filter_properties)
+        self.assertEqual([host1, host3], list(hosts))
+        self.assertEqual(4 * 2, host1.limits['vcpu'])
+        self.assertEqual(4 * 2, host2.limits['vcpu'])
+
+    def test_core_filter_all_no_instance_type(self):
+        self.filt_cls = core_filter.CoreFilter()
+        host = fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 8})
+        self.assertEqual([host], list(self.filt_cls.filter_all([host], {})))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_core_filter_value_error(self, agg_mock):
         self.filt_cls = core_filter.AggregateCoreFilter()
@@ -61,6 +61,41 @@ class TestDiskFilter(test.NoDBTestCase):
                 {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12})
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_disk_filter_all(self):
+        self.flags(disk_allocation_ratio=10.0)
+        filt_cls = disk_filter.DiskFilter()
+        filter_properties = {'instance_type': {'root_gb': 100,
+            'ephemeral_gb': 18, 'swap': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 10 * 1024, 'total_usable_disk_gb': 12})
+        hosts = filt_cls.filter_all([host1, host2], filter_properties)
+        self.assertEqual([host1], list(hosts))
+        self.assertEqual(12 * 10.0, host1.limits['disk_gb'])
+        self.assertNotIn('disk_gb', host2.limits)
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_disk_filter_all(self, agg_mock):
+        filt_cls = disk_filter.AggregateDiskFilter()
+        self.flags(disk_allocation_ratio=1.0)
+        filter_properties = {
+            'context': mock.sentinel.ctx,
+            'instance_type': {'root_gb': 2,
+                              'ephemeral_gb': 0,
+                              'swap': 0}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'free_disk_mb': 1024,
+                                     'total_usable_disk_gb': 1})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'free_disk_mb': 1024,
+                                     'total_usable_disk_gb': 1})
+        agg_mock.side_effect = [set(['2']), set([])]
+        hosts = filt_cls.filter_all([host1, host2], filter_properties)
+        self.assertEqual([host1], list(hosts))
+        agg_mock.assert_has_calls([mock.call(host1, 'disk_allocation_ratio'),
+                                   mock.call(host2, 'disk_allocation_ratio')])
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_disk_filter_value_error(self, agg_mock):
         filt_cls = disk_filter.AggregateDiskFilter()
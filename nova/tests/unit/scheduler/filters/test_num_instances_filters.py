@@ -35,6 +35,29 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         filter_properties = {}
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_filter_num_instances_filter_all(self):
+        self.flags(max_instances_per_host=5)
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'num_instances': 4})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'num_instances': 5})
+        hosts = self.filt_cls.filter_all([host1, host2], {})
+        self.assertEqual([host1], list(hosts))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_filter_aggregate_num_instances_filter_all(self, agg_mock):
+        self.flags(max_instances_per_host=4)
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'num_instances': 5})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'num_instances': 5})
+        filter_properties = {'context': mock.sentinel.ctx}
+        agg_mock.side_effect = [set(['6']), set([])]
+        hosts = self.filt_cls.filter_all([host1, host2], filter_properties)
+        self.assertEqual([host1], list(hosts))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_filter_aggregate_num_instances_value(self, agg_mock):
         self.flags(max_instances_per_host=4)
@@ -45,6 +45,33 @@ class TestRamFilter(test.NoDBTestCase):
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(2048 * 2.0, host.limits['memory_mb'])
 
+    def test_ram_filter_all(self):
+        self.flags(ram_allocation_ratio=2.0)
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': -1024, 'total_usable_ram_mb': 2048})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': -1025, 'total_usable_ram_mb': 2048})
+        hosts = self.filt_cls.filter_all([host1, host2], filter_properties)
+        self.assertEqual([host1], list(hosts))
+        self.assertEqual(2048 * 2.0, host1.limits['memory_mb'])
+        self.assertNotIn('memory_mb', host2.limits)
+
+    def test_ram_filter_all_subclass_ratio(self):
+        class HostRamFilter(ram_filter.RamFilter):
+            def _get_ram_allocation_ratio(self, host_state,
+                                          filter_properties):
+                return 2.0 if host_state.host == 'host1' else 1.0
+
+        self.flags(ram_allocation_ratio=1.0)
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 0, 'total_usable_ram_mb': 1024})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 0, 'total_usable_ram_mb': 1024})
+        hosts = HostRamFilter().filter_all([host1, host2], filter_properties)
+        self.assertEqual([host1], list(hosts))
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -13,7 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
+import fixtures
 import mock
+from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 
 from nova import exception
@@ -93,6 +97,80 @@ class CachingSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertEqual(1, len(result))
         self.assertEqual(result[0]["host"], fake_host.host)
 
+    def _use_shared_claims_file(self, shared=None):
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        path = os.path.join(tmpdir, 'claims.json')
+        self.flags(scheduler_shared_claims_file=path)
+        if shared is not None:
+            with open(path, 'w') as f:
+                f.write(jsonutils.dumps(shared))
+        return path
+
+    def _get_fake_claim(self, seq, pid, index=0):
+        return {'seq': seq, 'pid': pid, 'time': 0,
+                'host': 'host_%s' % index, 'nodename': 'node_%s' % index,
+                'memory_mb': 512, 'root_gb': 1, 'ephemeral_gb': 1,
+                'vcpus': 1}
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_select_destination_records_shared_claims(self, mock_get_extra):
+        path = self._use_shared_claims_file(
+            {'seq': 3, 'claims': [self._get_fake_claim(3, -1)]})
+        fake_request_spec = self._get_fake_request_spec()
+        fake_host = self._get_fake_host_state()
+        self.driver.all_host_states = [fake_host]
+
+        self._test_select_destinations(fake_request_spec)
+
+        with open(path) as f:
+            shared = jsonutils.loads(f.read())
+        self.assertEqual(4, shared['seq'])
+        # The claim from the sibling has expired
+        self.assertEqual(1, len(shared['claims']))
+        claim = shared['claims'][0]
+        self.assertEqual(4, claim['seq'])
+        self.assertEqual(os.getpid(), claim['pid'])
+        self.assertEqual(('host_0', 'node_0'),
+                         (claim['host'], claim['nodename']))
+        self.assertEqual(512, claim['memory_mb'])
+
+    def test_get_all_host_states_applies_sibling_claims(self):
+        claims = [self._get_fake_claim(1, -1),
+                  self._get_fake_claim(2, -1),
+                  self._get_fake_claim(3, os.getpid()),
+                  self._get_fake_claim(4, -1, index=1),
+                  self._get_fake_claim(5, -1, index=2)]
+        self._use_shared_claims_file({'seq': 5, 'claims': claims})
+        host_states = [self._get_fake_host_state(0),
+                       self._get_fake_host_state(1)]
+        self.driver.all_host_states = host_states
+        self.driver._last_claim_seq = 1
+
+        result = self.driver._get_all_host_states(self.context)
+        # Applying the claims again must not consume them twice
+        self.driver._get_all_host_states(self.context)
+
+        self.assertEqual(host_states, result)
+        self.assertEqual(5, self.driver._last_claim_seq)
+        self.assertEqual(50000 - 512, host_states[0].free_ram_mb)
+        self.assertEqual(1, host_states[0].num_instances)
+        self.assertEqual(50000 - 512, host_states[1].free_ram_mb)
+        self.assertEqual(1, host_states[1].vcpus_used)
+
+    @mock.patch.object(caching_scheduler.CachingScheduler,
+                       "_get_up_hosts")
+    def test_run_periodic_tasks_skips_previous_claims(self, mock_up_hosts):
+        mock_up_hosts.return_value = []
+        self._use_shared_claims_file(
+            {'seq': 7, 'claims': [self._get_fake_claim(7, -1)]})
+
+        self.driver.run_periodic_tasks(self.context)
+
+        self.assertEqual(7, self.driver._last_claim_seq)
+        self.assertEqual([], self.driver.all_host_states)
+
     def _test_select_destinations(self, request_spec):
         return self.driver.select_destinations(
                 self.context, request_spec, {})
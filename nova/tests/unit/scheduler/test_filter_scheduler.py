@@ -16,6 +16,8 @@
 Tests For Filter Scheduler.
 """
 
+import contextlib
+
 import mock
 
 from nova import exception
@@ -27,7 +29,8 @@ from nova.tests.unit.scheduler import fakes
 from nova.tests.unit.scheduler import test_scheduler
 
 
-def fake_get_filtered_hosts(hosts, filter_properties, index):
+def fake_get_filtered_hosts(hosts, filter_properties, index,
+                            changed_hosts=None):
     return list(hosts)
 
 
@@ -52,7 +55,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                max_objs=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -79,6 +83,33 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         for weighed_host in weighed_hosts:
             self.assertIsNotNone(weighed_host.obj)
 
+    @mock.patch.object(host_manager.HostState, 'consume_from_instance')
+    def test_schedule_passes_changed_hosts(self, mock_consume):
+        host1 = host_manager.HostState('host1', 'node1')
+        host2 = host_manager.HostState('host2', 'node2')
+        request_spec = {'num_instances': 2,
+                        'instance_type': {},
+                        'instance_properties': {'project_id': 1,
+                                                'os_type': 'Linux'}}
+        host_manager_ = self.driver.host_manager
+        with contextlib.nested(
+            mock.patch.object(self.driver, '_get_all_host_states',
+                              return_value=[host1, host2]),
+            mock.patch.object(host_manager_, 'get_filtered_hosts',
+                              side_effect=fake_get_filtered_hosts),
+            mock.patch.object(host_manager_, 'get_weighed_hosts',
+                              return_value=[weights.WeighedHost(host2, 1.0),
+                                            weights.WeighedHost(host1, 0.0)]),
+        ) as (mock_get_all, mock_get_filtered, mock_get_weighed):
+            self.driver._schedule(self.context, request_spec, {})
+
+        self.assertEqual(
+            [mock.call([host1, host2], mock.ANY, index=0,
+                       changed_hosts=None),
+             mock.call([host1, host2], mock.ANY, index=1,
+                       changed_hosts=[host2])],
+            mock_get_filtered.call_args_list)
+
     def test_max_attempts(self):
         self.flags(scheduler_max_attempts=4)
         self.assertEqual(4, scheduler_utils._max_attempts())
@@ -143,11 +174,18 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                             instance_type={})
         filter_properties = {}
         self.mox.ReplayAll()
-        hosts = self.driver._schedule(self.context, request_spec,
-                filter_properties=filter_properties)
+        host_manager = self.driver.host_manager
+        with mock.patch.object(host_manager, 'get_weighed_hosts',
+                               wraps=host_manager.get_weighed_hosts
+                               ) as mock_get_weighed:
+            hosts = self.driver._schedule(self.context, request_spec,
+                    filter_properties=filter_properties)
 
         # one host should be chosen
         self.assertEqual(len(hosts), 1)
+        # and only the subset of best hosts should have been asked for
+        mock_get_weighed.assert_called_once_with(mock.ANY, filter_properties,
+                                                 2)
 
     @mock.patch('nova.objects.ServiceList.get_by_binary',
                 return_value=fakes.SERVICES)
@@ -205,7 +243,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                max_objs=None):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -256,7 +295,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         selected_hosts = []
         selected_nodes = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                max_objs=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -15,9 +15,12 @@
 Tests For Scheduler Host Filters.
 """
 
+import contextlib
 import inspect
 import sys
 
+import mock
+
 from nova import filters
 from nova import loadables
 from nova import test
@@ -199,3 +202,63 @@ class FiltersTestCase(test.NoDBTestCase):
                                                      filter_objs_initial,
                                                      filter_properties)
         self.assertIsNone(result)
+
+    def test_get_filtered_objects_stateless_changed_objs(self):
+        filter_objs = ['obj1', 'obj2', 'obj3']
+        filter_properties = 'fake_filter_properties'
+        stateless_filter = Filter1()
+        stateless_filter.stateless = True
+        other_filter = Filter2()
+
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       lambda *args, **kwargs: None)
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        with contextlib.nested(
+            mock.patch.object(stateless_filter, 'filter_all',
+                              return_value=[]),
+            mock.patch.object(other_filter, 'filter_all',
+                              side_effect=lambda objs, props: list(objs)),
+        ) as (mock_stateless, mock_other):
+            result = filter_handler.get_filtered_objects(
+                [stateless_filter, other_filter], filter_objs,
+                filter_properties, index=1, changed_objs=['obj2'])
+
+        self.assertEqual(['obj1', 'obj3'], result)
+        mock_stateless.assert_called_once_with(['obj2'], filter_properties)
+        mock_other.assert_called_once_with(['obj1', 'obj3'],
+                                           filter_properties)
+
+    def test_get_filtered_objects_stateless_first_index(self):
+        filter_objs = ['obj1', 'obj2', 'obj3']
+        filter_properties = 'fake_filter_properties'
+        stateless_filter = Filter1()
+        stateless_filter.stateless = True
+
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       lambda *args, **kwargs: None)
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        with mock.patch.object(stateless_filter, 'filter_all',
+                               return_value=['obj3']) as mock_filter_all:
+            result = filter_handler.get_filtered_objects(
+                [stateless_filter], filter_objs, filter_properties,
+                changed_objs=['obj2'])
+
+        self.assertEqual(['obj3'], result)
+        mock_filter_all.assert_called_once_with(filter_objs,
+                                                filter_properties)
+
+    def test_get_filtered_objects_records_stats(self):
+        filter_objs = ['obj1', 'obj2', 'obj3']
+        filter_properties = 'fake_filter_properties'
+        filt = Filter1()
+
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       lambda *args, **kwargs: None)
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        filter_handler.stats = mock.Mock()
+        with mock.patch.object(filt, 'filter_all', return_value=['obj3']):
+            filter_handler.get_filtered_objects([filt], filter_objs,
+                                                filter_properties)
+
+        filter_handler.stats.record.assert_called_once_with(
+            'filters', 'Filter1', mock.ANY, 3, 1)
@@ -17,10 +17,12 @@ Tests For HostManager
 """
 
 import collections
+import datetime
 
 import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import six
 
 import nova
@@ -78,16 +80,67 @@ class HostManagerTestCase(test.NoDBTestCase):
     @mock.patch.object(nova.objects.InstanceList, 'get_by_filters')
     @mock.patch.object(nova.objects.ComputeNodeList, 'get_all')
     @mock.patch('nova.utils.spawn_n')
-    def test_init_instance_info_batches(self, mock_spawn, mock_get_all,
-                                        mock_get_by_filters):
+    def test_init_instance_info_pages(self, mock_spawn, mock_get_all,
+                                      mock_get_by_filters):
         mock_spawn.side_effect = lambda f, *a, **k: f(*a, **k)
         cn_list = objects.ComputeNodeList()
         for num in range(22):
             host_name = 'host_%s' % num
             cn_list.objects.append(objects.ComputeNode(host=host_name))
         mock_get_all.return_value = cn_list
+        instances = [objects.Instance(host='host_%s' % (num % 20),
+                                      uuid='uuid%s' % num,
+                                      instance_type_id=1)
+                     for num in range(1500)]
+        mock_get_by_filters.side_effect = [
+            objects.InstanceList(objects=instances[:1000]),
+            objects.InstanceList(objects=instances[1000:])]
         self.host_manager._init_instance_info()
-        self.assertEqual(mock_get_by_filters.call_count, 3)
+        self.assertEqual(mock_get_by_filters.call_count, 2)
+        mock_get_by_filters.assert_called_with(
+            mock.ANY, {'deleted': False}, sort_key='id', sort_dir='asc',
+            limit=1000, marker='uuid999', expected_attrs=[])
+        # Hosts without instances are known too
+        self.assertEqual(22, len(self.host_manager._instance_info))
+        self.assertEqual({}, self.host_manager._instance_info['host_21'][
+            'instances'])
+        self.assertEqual(host_manager.InstanceSummary('uuid20', 1),
+                         self.host_manager._instance_info['host_0'][
+                             'instances']['uuid20'])
+        self.assertTrue(self.host_manager._instance_info_ready.is_set())
+        self.assertIsNotNone(self.host_manager._instance_info_loaded_at)
+
+    @mock.patch.object(nova.objects.ComputeNodeList, 'get_all')
+    @mock.patch('nova.utils.spawn_n')
+    def test_init_instance_info_failure_opens_gate(self, mock_spawn,
+                                                   mock_get_all):
+        mock_spawn.side_effect = lambda f, *a, **k: f(*a, **k)
+        mock_get_all.side_effect = test.TestingException
+        self.assertRaises(test.TestingException,
+                          self.host_manager._init_instance_info)
+        self.assertTrue(self.host_manager._instance_info_ready.is_set())
+        self.assertIsNone(self.host_manager._instance_info_loaded_at)
+
+    def test_wait_for_instance_info_timeout(self):
+        self.flags(scheduler_instance_info_init_timeout=0)
+        self.host_manager._instance_info_ready = mock.Mock()
+        self.host_manager._instance_info_ready.is_set.return_value = False
+        self.host_manager._instance_info_ready.wait.return_value = False
+        with mock.patch.object(host_manager.LOG, 'warning') as mock_warning:
+            self.host_manager._wait_for_instance_info()
+        self.host_manager._instance_info_ready.wait.assert_called_once_with(0)
+        self.assertTrue(mock_warning.called)
+
+    def test_wait_for_instance_info_after_timeout(self):
+        self.flags(scheduler_instance_info_init_timeout=0)
+        ready = self.host_manager._instance_info_ready = mock.Mock()
+        ready.is_set.return_value = False
+        ready.wait.return_value = False
+        self.host_manager._wait_for_instance_info()
+        # The next requests don't wait for the load anymore
+        self.host_manager._wait_for_instance_info()
+        ready.wait.assert_called_once_with(0)
+        self.assertIsNone(self.host_manager._instance_info_ready)
 
     @mock.patch.object(nova.objects.InstanceList, 'get_by_filters')
     @mock.patch.object(nova.objects.ComputeNodeList, 'get_all')
@@ -139,7 +192,8 @@ class HostManagerTestCase(test.NoDBTestCase):
     @mock.patch.object(objects.AggregateList, 'get_all')
     def test_init_aggregates_one_agg_with_hosts(self, agg_get_all,
                                                 mock_init_info):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={})
         agg_get_all.return_value = [fake_agg]
         self.host_manager = host_manager.HostManager()
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
@@ -147,14 +201,16 @@ class HostManagerTestCase(test.NoDBTestCase):
                          self.host_manager.host_aggregates_map)
 
     def test_update_aggregates(self):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={})
         self.host_manager.update_aggregates([fake_agg])
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
         self.assertEqual({'fake-host': set([1])},
                          self.host_manager.host_aggregates_map)
 
     def test_update_aggregates_remove_hosts(self):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={})
         self.host_manager.update_aggregates([fake_agg])
         self.assertEqual({1: fake_agg}, self.host_manager.aggs_by_id)
         self.assertEqual({'fake-host': set([1])},
@@ -167,7 +223,8 @@ class HostManagerTestCase(test.NoDBTestCase):
                          self.host_manager.host_aggregates_map)
 
     def test_delete_aggregate(self):
-        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={})
         self.host_manager.host_aggregates_map = collections.defaultdict(
             set, {'fake-host': set([1])})
         self.host_manager.aggs_by_id = {1: fake_agg}
@@ -176,6 +233,36 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual({'fake-host': set([])},
                          self.host_manager.host_aggregates_map)
 
+    def test_update_aggregates_metadata_index(self):
+        fake_agg1 = objects.Aggregate(id=1, hosts=['host1', 'host2'],
+                                      metadata={'k1': 'v1, v2'})
+        fake_agg2 = objects.Aggregate(id=2, hosts=['host2'],
+                                      metadata={'k1': 'v1', 'k2': 'v3'})
+        self.host_manager.update_aggregates([fake_agg1, fake_agg2])
+        self.assertEqual({'k1': {'v1': set(['host1', 'host2']),
+                                 'v2': set(['host1', 'host2'])},
+                          'k2': {'v3': set(['host2'])}},
+                         self.host_manager.aggregates_metadata_index)
+
+        # Remove host2 from the first aggregate and change its metadata
+        fake_agg1.hosts = ['host1']
+        fake_agg1.metadata = {'k2': 'v4'}
+        self.host_manager.update_aggregates([fake_agg1])
+        self.assertEqual({'k1': {'v1': set(['host2'])},
+                          'k2': {'v3': set(['host2']),
+                                 'v4': set(['host1'])}},
+                         self.host_manager.aggregates_metadata_index)
+
+        self.host_manager.delete_aggregate(fake_agg2)
+        self.assertEqual({'k2': {'v4': set(['host1'])}},
+                         self.host_manager.aggregates_metadata_index)
+
+    def test_get_filtered_hosts_passes_metadata_index(self):
+        fake_properties = {}
+        self.host_manager.get_filtered_hosts([], fake_properties)
+        self.assertIs(self.host_manager.aggregates_metadata_index,
+                      fake_properties['aggregates_metadata_index'])
+
     def test_choose_host_filters_not_found(self):
         self.assertRaises(exception.SchedulerHostFilterNotFound,
                           self.host_manager._choose_host_filters,
@@ -500,7 +587,7 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = host_manager.HostState('host1', cn1)
         self.assertFalse(host_state.instances)
         mock_get_by_host.return_value = None
-        hm._add_instance_info(context, cn1, host_state)
+        hm._add_instance_info(context, host_state)
         self.assertFalse(mock_get_by_host.called)
         self.assertTrue(host_state.instances)
         self.assertEqual(host_state.instances['uuid1'], inst1)
@@ -522,10 +609,42 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = host_manager.HostState('host1', cn1)
         self.assertFalse(host_state.instances)
         mock_get_by_host.return_value = objects.InstanceList(objects=[inst1])
-        hm._add_instance_info(context, cn1, host_state)
+        hm._add_instance_info(context, host_state)
         mock_get_by_host.assert_called_once_with(context, cn1.host)
         self.assertTrue(host_state.instances)
-        self.assertEqual(host_state.instances['uuid1'], inst1)
+        self.assertEqual(host_state.instances['uuid1'],
+                         host_manager.InstanceSummary('uuid1', None))
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_add_instance_info_initial(self, mock_get_by_host):
+        context = 'fake_context'
+        hm = self.host_manager
+        summary = host_manager.InstanceSummary('uuid1', 1)
+        hm._instance_info = {'host1': {'instances': {'uuid1': summary},
+                                       'updated': False,
+                                       'initial': True}}
+        hm._instance_info_loaded_at = timeutils.utcnow()
+        host_state = host_manager.HostState('host1', 'node1')
+        hm._add_instance_info(context, host_state)
+        self.assertFalse(mock_get_by_host.called)
+        self.assertEqual({'uuid1': summary}, host_state.instances)
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_add_instance_info_initial_too_old(self, mock_get_by_host):
+        self.flags(scheduler_instance_info_init_max_age=60)
+        context = 'fake_context'
+        hm = self.host_manager
+        summary = host_manager.InstanceSummary('uuid1', 1)
+        hm._instance_info = {'host1': {'instances': {'uuid1': summary},
+                                       'updated': False,
+                                       'initial': True}}
+        hm._instance_info_loaded_at = (timeutils.utcnow() -
+                                       datetime.timedelta(seconds=61))
+        mock_get_by_host.return_value = objects.InstanceList(objects=[])
+        host_state = host_manager.HostState('host1', 'node1')
+        hm._add_instance_info(context, host_state)
+        mock_get_by_host.assert_called_once_with(context, 'host1')
+        self.assertEqual({}, host_state.instances)
 
     @mock.patch('nova.objects.InstanceList.get_by_host')
     def test_recreate_instance_info(self, mock_get_by_host):
@@ -751,6 +870,109 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(len(host_states_map), 0)
 
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental(self, mock_get_by_binary,
+                                             mock_get_all,
+                                             mock_get_changed,
+                                             mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        context = 'fake_context'
+
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(5, self.host_manager.compute_node_rows_fetched)
+        since = self.host_manager._compute_nodes_changed_since
+        self.assertIsNotNone(since)
+
+        changed_node = fakes.COMPUTE_NODES[0].obj_clone()
+        changed_node.free_ram_mb = 256
+        changed_node.deleted = False
+        mock_get_changed.return_value = [changed_node]
+        self.host_manager.get_all_host_states(context)
+
+        mock_get_all.assert_called_once_with(context)
+        mock_get_changed.assert_called_once_with(context, since)
+        self.assertEqual(1, self.host_manager.compute_node_rows_fetched)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(4, len(host_states_map))
+        self.assertEqual(256, host_states_map[('host1', 'node1')].free_ram_mb)
+        self.assertEqual(1024,
+                         host_states_map[('host2', 'node2')].free_ram_mb)
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental_after_delete_one(
+            self, mock_get_by_binary, mock_get_all, mock_get_changed,
+            mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        context = 'fake_context'
+
+        self.host_manager.get_all_host_states(context)
+        deleted_node = fakes.COMPUTE_NODES[3].obj_clone()
+        deleted_node.deleted = True
+        mock_get_changed.return_value = [deleted_node]
+        self.host_manager.get_all_host_states(context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(3, len(host_states_map))
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental_service_gone(
+            self, mock_get_by_binary, mock_get_all, mock_get_changed,
+            mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        context = 'fake_context'
+
+        self.host_manager.get_all_host_states(context)
+        mock_get_by_binary.return_value = fakes.SERVICES[:2]
+        mock_get_changed.return_value = []
+        self.host_manager.get_all_host_states(context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(set([('host1', 'node1'), ('host2', 'node2')]),
+                         set(host_states_map))
+
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    @mock.patch.object(host_manager.timeutils, 'is_older_than',
+                       return_value=True)
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_incremental_full_sync(self,
+                                                       mock_get_by_binary,
+                                                       mock_get_all,
+                                                       mock_get_changed,
+                                                       mock_is_older,
+                                                       mock_get_by_host):
+        self.flags(scheduler_incremental_host_states=True)
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_by_binary.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        context = 'fake_context'
+
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.get_all_host_states(context)
+
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertFalse(mock_get_changed.called)
+
 
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
@@ -104,6 +104,21 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                                               mock.sentinel.host_name,
                                               mock.sentinel.instance_uuids)
 
+    def test_get_scheduler_stats(self):
+        stats = self.manager.driver.host_manager.stats
+        stats.record('filters', 'RamFilter', 0.002, 10, 4)
+        result = self.manager.get_scheduler_stats(mock.sentinel.context)
+        self.assertEqual(1, result['filters']['RamFilter']['calls'])
+        self.assertEqual(6, result['filters']['RamFilter']['hosts_eliminated'])
+
+    def test_log_scheduler_stats(self):
+        stats = self.manager.driver.host_manager.stats
+        stats.record('weighers', 'RAMWeigher', 0.002, 10)
+        with mock.patch.object(stats, 'log_summary') as mock_log:
+            self.manager._log_scheduler_stats(mock.sentinel.context)
+            mock_log.assert_called_once_with()
+        self.assertEqual({}, stats.to_dict()['weighers'])
+
 
 class SchedulerV3PassthroughTestCase(test.TestCase):
 
@@ -0,0 +1,292 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Placement benchmark of the FilterScheduler against synthetic fleets.
+
+The unit test only checks that the benchmark runs on a small fleet. To
+measure the scheduler, run it with tools/benchmark.py, e.g.:
+
+    python tools/benchmark.py scheduler --hosts 100,1000,10000,50000 \
+        --requests 200
+
+Each fleet size prints one JSON line with the requests per second, the time
+spent in each filter and weigher and the memory used. The fleets and the
+requests are generated from a fixed seed, so the results of two commits can
+be compared.
+"""
+
+import collections
+import functools
+import logging
+import random
+import resource
+import timeit
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+
+from nova import context
+from nova import exception
+from nova import objects
+from nova.scheduler import filter_scheduler
+from nova.scheduler import host_manager
+from nova import test
+
+CONF = cfg.CONF
+
+DEFAULT_FILTERS = [
+    'RetryFilter',
+    'AvailabilityZoneFilter',
+    'RamFilter',
+    'CoreFilter',
+    'DiskFilter',
+    'ComputeFilter',
+    'ComputeCapabilitiesFilter',
+    'ImagePropertiesFilter',
+    'ServerGroupAntiAffinityFilter',
+    'ServerGroupAffinityFilter',
+    'AggregateInstanceExtraSpecsFilter',
+    'AggregateMultiTenancyIsolation',
+    'NUMATopologyFilter',
+    'PciPassthroughFilter',
+]
+
+NUM_ZONES = 4
+HOSTS_PER_AGGREGATE = 50
+
+FLAVORS = [
+    {'memory_mb': 512, 'root_gb': 1, 'ephemeral_gb': 0, 'swap': 0,
+     'vcpus': 1},
+    {'memory_mb': 2048, 'root_gb': 20, 'ephemeral_gb': 0, 'swap': 0,
+     'vcpus': 2},
+    {'memory_mb': 4096, 'root_gb': 40, 'ephemeral_gb': 10, 'swap': 512,
+     'vcpus': 4},
+    {'memory_mb': 8192, 'root_gb': 80, 'ephemeral_gb': 20, 'swap': 1024,
+     'vcpus': 8},
+]
+
+
+def _max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _make_numa_topology(rand):
+    cells = []
+    for cell_id in xrange(2):
+        cpus = set(xrange(cell_id * 8, cell_id * 8 + 8))
+        cells.append(objects.NUMACell(
+            id=cell_id, cpuset=cpus, memory=32768,
+            cpu_usage=rand.randint(0, 4), memory_usage=rand.randint(0, 8192),
+            mempages=[], siblings=[], pinned_cpus=set()))
+    return objects.NUMATopology(cells=cells)._to_json()
+
+
+def _make_pci_pools(rand):
+    return objects.PciDevicePoolList(objects=[
+        objects.PciDevicePool(product_id='1520', vendor_id='8086',
+                              numa_node=numa_node, tags={},
+                              count=rand.randint(0, 8))
+        for numa_node in xrange(2)])
+
+
+def build_fleet(num_hosts, seed=0):
+    """Returns a list of HostState and a list of Aggregate objects.
+
+    Every fourth host has a NUMA topology and every tenth host has a pool of
+    PCI devices. The hosts are spread in availability zones, and a few
+    aggregates carry extra specs or isolate tenants.
+    """
+    rand = random.Random(seed)
+    now = timeutils.utcnow()
+    host_states = []
+    for index in xrange(num_hosts):
+        host = 'host%05d' % index
+        node = 'node%05d' % index
+        vcpus = rand.choice([16, 32, 64])
+        memory_mb = rand.choice([65536, 131072, 262144])
+        local_gb = rand.choice([1024, 2048, 4096])
+        vcpus_used = rand.randint(0, vcpus)
+        free_ram_mb = rand.randint(0, memory_mb)
+        free_disk_gb = rand.randint(0, local_gb)
+        compute = objects.ComputeNode(
+            id=index, host=host, hypervisor_hostname=node,
+            vcpus=vcpus, vcpus_used=vcpus_used, memory_mb=memory_mb,
+            free_ram_mb=free_ram_mb, local_gb=local_gb,
+            local_gb_used=local_gb - free_disk_gb,
+            free_disk_gb=free_disk_gb, disk_available_least=None,
+            updated_at=None, host_ip='127.0.0.1', hypervisor_type='QEMU',
+            hypervisor_version=2000000, supported_hv_specs=[],
+            cpu_info=None, metrics=None,
+            stats={'num_instances': str(rand.randint(0, 40)),
+                   'io_workload': str(rand.randint(0, 4))},
+            numa_topology=(_make_numa_topology(rand)
+                           if index % 4 == 0 else None),
+            pci_device_pools=(_make_pci_pools(rand)
+                              if index % 10 == 0 else None))
+        host_state = host_manager.HostState(host, node, compute=compute)
+        host_state.update_service({'disabled': False, 'updated_at': now,
+                                   'created_at': now})
+        host_states.append(host_state)
+
+    aggregates = []
+    num_aggregates = (num_hosts + HOSTS_PER_AGGREGATE - 1) // (
+        HOSTS_PER_AGGREGATE)
+    for agg_id in xrange(num_aggregates):
+        hosts = [state.host for state in host_states[
+            agg_id * HOSTS_PER_AGGREGATE:(agg_id + 1) * HOSTS_PER_AGGREGATE]]
+        metadata = {'availability_zone': 'az%d' % (agg_id % NUM_ZONES)}
+        if agg_id % 5 == 1:
+            metadata['ssd'] = 'true'
+        if agg_id % 7 == 3:
+            metadata['filter_tenant_id'] = 'tenant%d' % (agg_id % 3)
+        aggregates.append(objects.Aggregate(id=agg_id, name='agg%d' % agg_id,
+                                            hosts=hosts, metadata=metadata))
+    return host_states, aggregates
+
+
+def build_requests(num_requests, seed=0):
+    """Returns a list of (request_spec, filter_properties) tuples."""
+    rand = random.Random(seed)
+    requests = []
+    for index in xrange(num_requests):
+        flavor = dict(rand.choice(FLAVORS), flavorid=str(index),
+                      extra_specs={})
+        if index % 5 == 0:
+            flavor['extra_specs']['aggregate_instance_extra_specs:ssd'] = (
+                'true')
+        instance_properties = {key: flavor[key] for key in (
+            'memory_mb', 'root_gb', 'ephemeral_gb', 'vcpus')}
+        instance_properties.update({
+            'uuid': 'fake-uuid-%d' % index,
+            'project_id': 'tenant%d' % rand.randint(0, 9),
+            'os_type': 'linux',
+            'availability_zone': rand.choice(
+                [None] + ['az%d' % zone for zone in xrange(NUM_ZONES)]),
+            'numa_topology': None,
+            'pci_requests': None,
+        })
+        request_spec = {'instance_properties': instance_properties,
+                        'instance_type': flavor,
+                        'image': {'properties': {}},
+                        'num_instances': rand.choice([1, 1, 1, 2, 5])}
+        requests.append((request_spec, {}))
+    return requests
+
+
+class FleetHostManager(host_manager.HostManager):
+    """HostManager serving a synthetic fleet instead of the database."""
+
+    fleet = ([], [])
+
+    def _init_aggregates(self):
+        for agg in self.fleet[1]:
+            self.aggs_by_id[agg.id] = agg
+            for host in agg.hosts:
+                self.host_aggregates_map[host].add(agg.id)
+        for host in self.host_aggregates_map:
+            self._index_host_metadata(host)
+
+    def _init_instance_info(self):
+        pass
+
+    def get_all_host_states(self, context):
+        host_states = self.fleet[0]
+        for host_state in host_states:
+            host_state.aggregates = [
+                self.aggs_by_id[agg_id]
+                for agg_id in self.host_aggregates_map[host_state.host]]
+        return iter(host_states)
+
+
+def _timed(func, timings, name):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = timeit.default_timer()
+        try:
+            # filter_all() may return a generator doing the work lazily
+            return list(func(*args, **kwargs))
+        finally:
+            timings[name] += timeit.default_timer() - start
+    return wrapper
+
+
+def setup_scheduler(test_case, filters=DEFAULT_FILTERS, debug_logging=True):
+    """Configures the scheduler of a test case to serve a synthetic fleet."""
+    if not debug_logging:
+        # Formatting the debug messages about every host would otherwise
+        # dominate the measures
+        root = logging.getLogger()
+        test_case.addCleanup(root.setLevel, root.level)
+        root.setLevel(logging.INFO)
+    test_case.flags(scheduler_host_manager='%s.%s' % (
+                        __name__, FleetHostManager.__name__),
+                    scheduler_default_filters=filters,
+                    scheduler_tracks_instance_changes=False)
+
+
+def run_benchmark(num_hosts, num_requests, seed=0):
+    """Runs the requests against a fleet, and returns the measures."""
+    rss_before = _max_rss_kb()
+    host_states, aggregates = build_fleet(num_hosts, seed=seed)
+    FleetHostManager.fleet = (host_states, aggregates)
+    scheduler = filter_scheduler.FilterScheduler()
+    hm = scheduler.host_manager
+    rss_fleet = _max_rss_kb()
+
+    filter_timings = collections.defaultdict(float)
+    weigher_timings = collections.defaultdict(float)
+    for filter_obj in hm.default_filters:
+        filter_obj.filter_all = _timed(filter_obj.filter_all, filter_timings,
+                                       filter_obj.__class__.__name__)
+    for weigher in hm.weighers:
+        weigher.weigh_objects = _timed(weigher.weigh_objects,
+                                       weigher_timings,
+                                       weigher.__class__.__name__)
+
+    ctxt = context.get_admin_context()
+    requests = build_requests(num_requests, seed=seed)
+    failures = 0
+    start = timeit.default_timer()
+    for request_spec, filter_properties in requests:
+        try:
+            scheduler.select_destinations(ctxt, request_spec,
+                                          filter_properties)
+        except exception.NoValidHost:
+            failures += 1
+    elapsed = timeit.default_timer() - start
+
+    return {
+        'hosts': num_hosts,
+        'requests': num_requests,
+        'seed': seed,
+        'no_valid_host': failures,
+        'seconds': elapsed,
+        'requests_per_second': num_requests / elapsed if elapsed else None,
+        'filters': dict(filter_timings),
+        'weighers': dict(weigher_timings),
+        'fleet_rss_kb': rss_fleet - rss_before,
+        'max_rss_kb': _max_rss_kb(),
+    }
+
+
+class SchedulerBenchmarkTestCase(test.NoDBTestCase):
+    """Runs the placement benchmark on a small fleet."""
+
+    def setUp(self):
+        super(SchedulerBenchmarkTestCase, self).setUp()
+        setup_scheduler(self)
+
+    def test_benchmark(self):
+        result = run_benchmark(100, 10)
+        self.assertEqual(100, result['hosts'])
+        self.assertEqual(set(DEFAULT_FILTERS), set(result['filters']))
+        self.assertTrue(result['weighers'])
@@ -0,0 +1,67 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Scheduler Stats
+"""
+
+import mock
+
+from nova.scheduler import stats
+from nova import test
+
+
+class SchedulerStatsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(SchedulerStatsTestCase, self).setUp()
+        self.stats = stats.SchedulerStats()
+
+    def test_record(self):
+        self.stats.record('filters', 'RamFilter', 0.0005, 10, 8)
+        self.stats.record('filters', 'RamFilter', 0.02, 8, 2)
+        self.stats.record('filters', 'RamFilter', 2, 2, 2)
+        self.stats.record('weighers', 'RAMWeigher', 0.003, 2)
+
+        result = self.stats.to_dict()
+        self.assertEqual(stats.HISTOGRAM_BOUNDS_MS,
+                         result['histogram_bounds_ms'])
+        ram_filter = result['filters']['RamFilter']
+        self.assertEqual(3, ram_filter['calls'])
+        self.assertEqual(20, ram_filter['hosts'])
+        self.assertEqual(8, ram_filter['hosts_eliminated'])
+        self.assertAlmostEqual(2020.5, ram_filter['total_ms'])
+        self.assertAlmostEqual(2000, ram_filter['max_ms'])
+        self.assertEqual([1, 0, 0, 1, 0, 0, 0, 1], ram_filter['histogram'])
+        ram_weigher = result['weighers']['RAMWeigher']
+        self.assertEqual(1, ram_weigher['calls'])
+        self.assertEqual(0, ram_weigher['hosts_eliminated'])
+        self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0], ram_weigher['histogram'])
+
+    def test_to_dict_copies_histograms(self):
+        self.stats.record('filters', 'RamFilter', 0.0005, 10, 8)
+        result = self.stats.to_dict()
+        result['filters']['RamFilter']['histogram'][0] = 42
+        self.assertEqual(
+            1, self.stats.to_dict()['filters']['RamFilter']['histogram'][0])
+
+    def test_reset(self):
+        self.stats.record('filters', 'RamFilter', 0.0005, 10, 8)
+        self.stats.reset()
+        self.assertEqual({}, self.stats.to_dict()['filters'])
+
+    @mock.patch.object(stats.LOG, 'info')
+    def test_log_summary(self, mock_info):
+        self.stats.record('filters', 'RamFilter', 0.001, 10, 8)
+        self.stats.record('filters', 'CoreFilter', 0.002, 10, 8)
+        self.stats.record('weighers', 'RAMWeigher', 0.003, 2)
+        self.stats.log_summary()
+        names = [call[0][1]['name'] for call in mock_info.call_args_list]
+        self.assertEqual(['CoreFilter', 'RamFilter', 'RAMWeigher'], names)
@@ -16,6 +16,8 @@
 Tests For Scheduler RAM weights.
 """
 
+import mock
+
 from nova.scheduler import weights
 from nova.scheduler.weights import ram
 from nova import test
@@ -109,3 +111,26 @@ class RamWeigherTestCase(test.NoDBTestCase):
         weighed_host = weights[-1]
         self.assertEqual(0, weighed_host.weight)
         self.assertEqual('negative', weighed_host.obj.host)
+
+    def test_ram_filter_max_objs(self):
+        hostinfo_list = self._get_all_hosts()
+
+        # host1: free_ram_mb=512
+        # host2: free_ram_mb=1024
+        # host3: free_ram_mb=3072
+        # host4: free_ram_mb=8192
+
+        # so, only host4 and host3 should be returned, in that order
+        weights = self.weight_handler.get_weighed_objects(self.weighers,
+                                                          hostinfo_list, {},
+                                                          max_objs=2)
+        self.assertEqual(['host4', 'host3'],
+                         [weighed_host.obj.host for weighed_host in weights])
+        self.assertEqual(1.0, weights[0].weight)
+
+    def test_ram_filter_records_stats(self):
+        self.weight_handler.stats = mock.Mock()
+        hostinfo_list = self._get_all_hosts()
+        self._get_weighed_host(hostinfo_list)
+        self.weight_handler.stats.record.assert_called_once_with(
+            'weighers', 'RAMWeigher', mock.ANY, 4)
@@ -172,6 +172,7 @@ class ContextTestCase(test.NoDBTestCase):
             timestamp='2015-03-02T22:31:56.641629')
         values2 = ctx.to_dict()
         expected_values = {'auth_token': None,
+                           'db_wrote': False,
                            'domain': None,
                            'instance_lock_checked': False,
                            'is_admin': False,
@@ -206,7 +207,7 @@ class ContextTestCase(test.NoDBTestCase):
                   'auth_token': None,
                   'resource_uuid': None, 'read_only': False,
                   'user_identity': '111 222 - - -',
-                  'instance_lock_checked': False,
+                  'instance_lock_checked': False, 'db_wrote': False,
                   'user_name': None, 'project_name': None,
                   'timestamp': '2015-03-02T20:03:59.416299',
                   'remote_address': None, 'quota_class': None,
@@ -13,16 +13,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
 import StringIO
 import sys
 
 import fixtures
 import mock
+from oslo_serialization import jsonutils
 
 from nova.cmd import manage
 from nova import context
 from nova import db
 from nova.db import migration
+from nova.db.sqlalchemy import metrics as db_metrics
 from nova.db.sqlalchemy import migration as sqla_migration
 from nova import exception
 from nova import objects
@@ -383,6 +386,68 @@ class DBCommandsTestCase(test.TestCase):
     def test_archive_deleted_rows_negative(self):
         self.assertEqual(1, self.commands.archive_deleted_rows(-1))
 
+    def test_archive_deleted_rows_negative_workers(self):
+        self.assertEqual(1, self.commands.archive_deleted_rows(workers=0))
+
+    @mock.patch.object(db, 'archive_deleted_rows',
+                       return_value={'instances': {'rows': 10,
+                                                   'seconds': 2.0}})
+    def test_archive_deleted_rows(self, mock_archive):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.commands.archive_deleted_rows(max_rows='20', workers='2',
+                                           max_rows_per_second='100')
+        mock_archive.assert_called_once_with(
+            mock.ANY, 20, workers=2, max_rows_per_second=100, checkpoint={})
+        self.assertIn('instances: 10 rows archived in 2.0 seconds '
+                      '(5.0 rows/s)', sys.stdout.getvalue())
+
+    def test_archive_deleted_rows_checkpoint_file(self):
+        checkpoint_file = os.path.join(self.useFixture(
+            fixtures.TempDir()).path, 'checkpoint')
+        with open(checkpoint_file, 'w') as f:
+            f.write('{"instances": 5}')
+
+        def fake_archive(context, max_rows, workers, max_rows_per_second,
+                         checkpoint):
+            self.assertEqual({'instances': 5}, checkpoint)
+            checkpoint['instances'] = 7
+            raise test.TestingException()
+
+        with mock.patch.object(db, 'archive_deleted_rows',
+                               side_effect=fake_archive):
+            self.assertRaises(test.TestingException,
+                              self.commands.archive_deleted_rows,
+                              checkpoint_file=checkpoint_file)
+        with open(checkpoint_file) as f:
+            self.assertEqual({'instances': 7}, jsonutils.load(f))
+
+    def test_stats_no_reports(self):
+        self.flags(db_metrics_dir=self.useFixture(fixtures.TempDir()).path)
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.assertEqual(1, self.commands.stats())
+        self.assertIn('No database metrics found', sys.stdout.getvalue())
+
+    def test_stats(self):
+        report = {'process': 'nova-compute', 'pid': 42,
+                  'started_at': 0, 'reported_at': 60,
+                  'functions': {'instance_get': {
+                      'calls': 4, 'statements': 4, 'rows': 4,
+                      'seconds': 0.02,
+                      'latency': [0, 4, 0, 0, 0, 0, 0, 0, 0]}},
+                  'pool': {'checkouts': 4, 'seconds': 0.0, 'max_seconds': 0.0,
+                           'latency': [4, 0, 0, 0, 0, 0, 0, 0, 0]}}
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        with mock.patch.object(db_metrics, 'read_reports',
+                               return_value=[report, report]):
+            self.commands.stats()
+        output = sys.stdout.getvalue()
+        self.assertIn('nova-compute (pid 42)', output)
+        self.assertIn('instance_get', output)
+        self.assertIn('pool: 8 checkouts', output)
+
     @mock.patch.object(migration, 'db_null_instance_uuid_scan',
                        return_value={'foo': 0})
     def test_null_instance_uuid_scan_no_records_found(self, mock_scan):
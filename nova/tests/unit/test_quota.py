@@ -335,6 +335,12 @@ class FakeDriver(object):
     def expire(self, context):
         self.called.append(('expire', context))
 
+    def refresh_usages(self, context, resources):
+        self.called.append(('refresh_usages', context, resources))
+
+    def invalidate_limits(self):
+        self.called.append(('invalidate_limits',))
+
 
 class BaseResourceTestCase(test.TestCase):
     def test_no_flag(self):
@@ -791,6 +797,33 @@ class QuotaEngineTestCase(test.TestCase):
                 ('expire', context),
                 ])
 
+    def test_invalidate_limits(self):
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.invalidate_limits()
+
+        self.assertEqual(driver.called, [
+                ('invalidate_limits',),
+                ])
+
+    def test_invalidate_limits_unsupported(self):
+        quota_obj = self._make_quota_obj(object())
+        quota_obj.invalidate_limits()
+
+    def test_refresh_usages(self):
+        context = FakeContext(None, None)
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.refresh_usages(context)
+
+        self.assertEqual(driver.called, [
+                ('refresh_usages', context, quota_obj._resources),
+                ])
+
+    def test_refresh_usages_unsupported(self):
+        quota_obj = self._make_quota_obj(object())
+        quota_obj.refresh_usages(FakeContext(None, None))
+
     def test_resources(self):
         quota_obj = self._make_quota_obj(None)
 
@@ -849,6 +882,36 @@ class DbQuotaDriverTestCase(test.TestCase):
                 server_group_members=10,
                 ))
 
+    def test_get_defaults_cached(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self._stub_quota_class_get_default()
+        self.driver.get_defaults(None, quota.QUOTAS._resources)
+        self.driver.get_defaults(None, quota.QUOTAS._resources)
+        self.assertEqual(self.calls, ['quota_class_get_default'])
+
+        timeutils.advance_time_seconds(60)
+        self.driver.get_defaults(None, quota.QUOTAS._resources)
+        self.assertEqual(self.calls, ['quota_class_get_default'] * 2)
+
+        self.driver.invalidate_limits()
+        self.driver.get_defaults(None, quota.QUOTAS._resources)
+        self.assertEqual(self.calls, ['quota_class_get_default'] * 3)
+
+    def test_get_project_limits_cached(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self._stub_get_by_project()
+        context = FakeContext('test_project', 'test_class')
+        limits = self.driver._get_project_limits(context, 'test_project')
+        limits['cores'] = 20
+        limits = self.driver._get_project_limits(context, 'test_project')
+        self.assertEqual(self.calls, ['quota_get_all_by_project'])
+        self.assertEqual(10, limits['cores'])
+        # The cached limits are still only given to the project
+        self.assertRaises(exception.Forbidden,
+                          self.driver._get_project_limits,
+                          FakeContext('other_project', 'test_class'),
+                          'test_project')
+
     def _stub_quota_class_get_default(self):
         # Stub out quota_class_get_default
         def fake_qcgd(context):
@@ -2212,6 +2275,32 @@ class DbQuotaDriverTestCase(test.TestCase):
             return ['resv-1', 'resv-2', 'resv-3']
         self.stubs.Set(db, 'quota_reserve', fake_quota_reserve)
 
+    def test_reserve_lock_free(self):
+        self.flags(lock_free_quota_reserve=True)
+        self._stub_get_project_quotas()
+
+        def fake_quota_reserve_conditional(context, resources, quotas,
+                                           user_quotas, deltas, expire,
+                                           until_refresh, max_age,
+                                           project_id=None, user_id=None,
+                                           refresh_due=True):
+            self.calls.append(('quota_reserve_conditional', expire,
+                               until_refresh, max_age, refresh_due))
+            return ['resv-1']
+        self.stubs.Set(db, 'quota_reserve_conditional',
+                       fake_quota_reserve_conditional)
+        self._stub_quota_reserve()
+        result = self.driver.reserve(FakeContext('test_project', 'test_class'),
+                                     quota.QUOTAS._resources,
+                                     dict(instances=2), expire=3600)
+
+        expire = timeutils.utcnow() + datetime.timedelta(seconds=3600)
+        self.assertEqual(self.calls, [
+                'get_project_quotas',
+                ('quota_reserve_conditional', expire, 0, 0, True),
+                ])
+        self.assertEqual(result, ['resv-1'])
+
     def test_reserve_bad_expire(self):
         self._stub_get_project_quotas()
         self._stub_quota_reserve()
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import datetime
 import functools
 import hashlib
@@ -1020,3 +1021,45 @@ class SafeTruncateTestCase(test.NoDBTestCase):
         truncated_msg = utils.safe_truncate(msg, 255)
         byte_message = encodeutils.safe_encode(truncated_msg)
         self.assertEqual(254, len(byte_message))
+
+
+class PageTokenTestCase(test.NoDBTestCase):
+    def test_encode_decode(self):
+        created_at = datetime.datetime(2015, 6, 1, 12, 30, 15)
+        token = utils.encode_page_token('fake-uuid', ['display_name'],
+                                        ['asc'],
+                                        {'display_name': 'web1',
+                                         'created_at': created_at})
+        self.assertTrue(utils.is_page_token(token))
+        self.assertEqual({'marker': 'fake-uuid',
+                          'sort_keys': ['display_name'],
+                          'sort_dirs': ['asc'],
+                          'values': {'display_name': 'web1',
+                                     'created_at':
+                                         '2015-06-01T12:30:15.000000'}},
+                         utils.decode_page_token(token))
+
+    def test_is_page_token(self):
+        self.assertFalse(utils.is_page_token(None))
+        self.assertFalse(utils.is_page_token(
+            'a4a9c4f9-fe3c-4ea8-8ea9-5ba4b6d8b1a5'))
+
+    def test_decode_invalid(self):
+        for token in ('garbage', base64.urlsafe_b64encode('[]'),
+                      base64.urlsafe_b64encode('{"marker": "fake"}')):
+            self.assertRaises(exception.InvalidPageToken,
+                              utils.decode_page_token,
+                              utils.PAGE_TOKEN_PREFIX + token)
+
+    def test_decode_without_prefix(self):
+        token = utils.encode_page_token('fake-uuid', [], [], {})
+        self.assertRaises(exception.InvalidPageToken,
+                          utils.decode_page_token,
+                          token[len(utils.PAGE_TOKEN_PREFIX):])
+
+    def test_decode_invalid_values(self):
+        for value in ([1], {'a': 1}):
+            token = utils.encode_page_token('fake-uuid', ['display_name'],
+                                            ['asc'], {'display_name': value})
+            self.assertRaises(exception.InvalidPageToken,
+                              utils.decode_page_token, token)
@@ -1465,6 +1465,78 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
                                                         pci_stats=pci_stats)
             self.assertIsNone(fitted_instance1)
 
+    def test_get_fitting_cached(self):
+        with mock.patch.object(hw, '_numa_fit_instance_to_host',
+                               wraps=hw._numa_fit_instance_to_host) as fit:
+            fitted_instance1 = hw.numa_fit_instance_to_host(
+                self.host, self.instance3, self.limits)
+            fitted_instance2 = hw.numa_fit_instance_to_host(
+                self.host.obj_clone(), self.instance3.obj_clone(),
+                self.limits)
+        self.assertEqual(1, fit.call_count)
+        self.assertEqual(1, fitted_instance1.cells[0].id)
+        self.assertEqual(1, fitted_instance2.cells[0].id)
+        self.assertIsNot(fitted_instance1, fitted_instance2)
+        # The requested topology is left untouched
+        self.assertEqual(0, self.instance3.cells[0].id)
+
+    def test_get_fitting_cached_failure(self):
+        with mock.patch.object(hw, '_numa_fit_instance_to_host',
+                               wraps=hw._numa_fit_instance_to_host) as fit:
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                self.host, self.instance2, self.limits))
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                self.host, self.instance2, self.limits))
+        self.assertEqual(1, fit.call_count)
+
+    def test_get_fitting_cache_usage_changed(self):
+        fitted_instance1 = hw.numa_fit_instance_to_host(
+                self.host, self.instance1, self.limits)
+        self.host = hw.numa_usage_from_instances(self.host,
+                [fitted_instance1])
+        with mock.patch.object(hw, '_numa_fit_instance_to_host',
+                               wraps=hw._numa_fit_instance_to_host) as fit:
+            fitted_instance2 = hw.numa_fit_instance_to_host(
+                self.host, self.instance1, self.limits)
+        self.assertEqual(1, fit.call_count)
+        self.assertEqual(2, fitted_instance2.cells[0].id)
+
+    def test_get_fitting_cache_evicts_least_recently_used(self):
+        self.flags(numa_fit_cache_size=2)
+        hw.numa_fit_instance_to_host(self.host, self.instance1, self.limits)
+        hw.numa_fit_instance_to_host(self.host, self.instance2, self.limits)
+        hw.numa_fit_instance_to_host(self.host, self.instance1, self.limits)
+        hw.numa_fit_instance_to_host(self.host, self.instance3, self.limits)
+        self.assertEqual(2, len(hw._numa_fit_cache))
+        self.assertIn(
+            hw._numa_fit_cache_key(self.host, self.instance1, self.limits),
+            hw._numa_fit_cache)
+        self.assertNotIn(
+            hw._numa_fit_cache_key(self.host, self.instance2, self.limits),
+            hw._numa_fit_cache)
+
+    def test_get_fitting_cache_disabled(self):
+        self.flags(numa_fit_cache_size=0)
+        with mock.patch.object(hw, '_numa_fit_instance_to_host',
+                               wraps=hw._numa_fit_instance_to_host) as fit:
+            hw.numa_fit_instance_to_host(self.host, self.instance3,
+                                         self.limits)
+            hw.numa_fit_instance_to_host(self.host, self.instance3,
+                                         self.limits)
+        self.assertEqual(2, fit.call_count)
+        self.assertEqual(0, len(hw._numa_fit_cache))
+
+    def test_get_fitting_pci_not_cached(self):
+        pci_reqs = [objects.InstancePCIRequest(count=1,
+            spec=[{'vendor_id': '8086'}])]
+        pci_stats = stats.PciDeviceStats()
+        with mock.patch.object(stats.PciDeviceStats,
+                'support_requests', return_value=True):
+            hw.numa_fit_instance_to_host(self.host, self.instance1,
+                                         pci_requests=pci_reqs,
+                                         pci_stats=pci_stats)
+        self.assertEqual(0, len(hw._numa_fit_cache))
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
@@ -17,6 +17,7 @@
 
 """Utilities and helper functions."""
 
+import base64
 import contextlib
 import datetime
 import functools
@@ -41,6 +42,7 @@ from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 from oslo_utils import encodeutils
 from oslo_utils import excutils
 from oslo_utils import importutils
@@ -1228,3 +1230,57 @@ def safe_truncate(value, length):
         except UnicodeDecodeError:
             b_value = b_value[:-1]
     return u_value
+
+
+PAGE_TOKEN_PREFIX = 'pt1.'
+
+
+def encode_page_token(marker, sort_keys, sort_dirs, values):
+    """Returns an opaque token for the page following a row.
+
+    The token carries the sort keys and directions of the listing and the
+    values of the row for the sort keys, so that the next page can be found
+    without looking the row up again.
+
+    :param marker: identifier of the row, used as a plain marker when the
+                   values of the token cannot be used
+    :param sort_keys: list of the sort keys of the listing
+    :param sort_dirs: list of the sort directions of the listing
+    :param values: dictionary of the values of the row, by sort key
+    """
+    token = jsonutils.dumps({'marker': marker,
+                             'sort_keys': sort_keys,
+                             'sort_dirs': sort_dirs,
+                             'values': values}, sort_keys=True)
+    return PAGE_TOKEN_PREFIX + base64.urlsafe_b64encode(token)
+
+
+def is_page_token(marker):
+    return (isinstance(marker, six.string_types) and
+            marker.startswith(PAGE_TOKEN_PREFIX))
+
+
+def decode_page_token(token):
+    """Returns the dictionary a token of encode_page_token was built from.
+
+    :raises: InvalidPageToken if the token is not well formed
+    """
+    if not is_page_token(token):
+        raise exception.InvalidPageToken(token=token)
+    try:
+        decoded = jsonutils.loads(base64.urlsafe_b64decode(
+            str(token[len(PAGE_TOKEN_PREFIX):])))
+        if not (isinstance(decoded['sort_keys'], list) and
+                isinstance(decoded['sort_dirs'], list) and
+                isinstance(decoded['values'], dict) and
+                isinstance(decoded['marker'], six.string_types)):
+            raise ValueError()
+        # The values end up in the query, only accept scalars
+        for value in decoded['values'].values():
+            if not (value is None or isinstance(
+                    value, six.string_types + six.integer_types +
+                    (float, bool))):
+                raise ValueError()
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+        raise exception.InvalidPageToken(token=token)
+    return decoded
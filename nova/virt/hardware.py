@@ -25,11 +25,19 @@ from nova import context
 from nova import exception
 from nova.i18n import _
 from nova import objects
+from nova.objects import base as obj_base
 
 virt_cpu_opts = [
     cfg.StrOpt('vcpu_pin_set',
                 help='Defines which pcpus that instance vcpus can use. '
                'For example, "4-12,^8,15"'),
+    cfg.IntOpt('numa_fit_cache_size',
+               default=1024,
+               help='Number of results of fitting an instance NUMA topology '
+                    'onto a host NUMA topology to keep in memory. Hosts '
+                    'with the same topology and usage are then only '
+                    'evaluated once for a given request. Set to 0 to '
+                    'disable the cache.'),
 ]
 
 CONF = cfg.CONF
@@ -41,6 +49,9 @@ MEMPAGES_SMALL = -1
 MEMPAGES_LARGE = -2
 MEMPAGES_ANY = -3
 
+# Results of numa_fit_instance_to_host, least recently used first
+_numa_fit_cache = collections.OrderedDict()
+
 
 def get_vcpu_pin_set():
     """Parsing vcpu_pin_set config.
@@ -993,6 +1004,37 @@ def numa_get_constraints(flavor, image_meta):
     return _add_cpu_pinning_constraint(flavor, image_meta, numa_topology)
 
 
+def _numa_fit_cache_key_value(value):
+    if isinstance(value, obj_base.NovaObject):
+        return tuple((field, _numa_fit_cache_key_value(getattr(value, field)))
+                     for field in sorted(value.fields)
+                     if value.obj_attr_is_set(field))
+    if isinstance(value, (set, frozenset)):
+        return ('set',) + tuple(sorted(value))
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted(
+            (key, _numa_fit_cache_key_value(val))
+            for key, val in six.iteritems(value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(_numa_fit_cache_key_value(item) for item in value)
+    return value
+
+
+def _numa_fit_cache_key(host_topology, instance_topology, limits):
+    """Returns a hashable digest of the inputs of a NUMA fitting
+
+    The ids of the instance cells are left out as they are set by the
+    fitting, as is anything but the cells of the instance topology, so
+    that identical requests of different instances share their results.
+    """
+    instance_cells = tuple(
+        tuple(item for item in _numa_fit_cache_key_value(cell)
+              if item[0] != 'id')
+        for cell in instance_topology.cells)
+    return (_numa_fit_cache_key_value(host_topology), instance_cells,
+            _numa_fit_cache_key_value(limits))
+
+
 def numa_fit_instance_to_host(
         host_topology, instance_topology, limits=None,
         pci_requests=None, pci_stats=None):
@@ -1004,6 +1046,44 @@ def numa_fit_instance_to_host(
     :param pci_requests: instance pci_requests
     :param pci_stats: pci_stats for the host
 
+    The results are kept in a least recently used cache keyed on the host
+    topology with its usage, the instance topology and the limits, so hosts
+    which look the same are only evaluated once. Requests with PCI devices
+    depend on the state of pci_stats and are never cached. A fitting which
+    goes through the cache does not modify instance_topology.
+
+    :returns: a new InstanceNUMATopology or None
+    """
+    cache_size = CONF.numa_fit_cache_size
+    if (cache_size <= 0 or pci_requests or
+            not (host_topology and instance_topology)):
+        return _numa_fit_instance_to_host(
+            host_topology, instance_topology, limits=limits,
+            pci_requests=pci_requests, pci_stats=pci_stats)
+
+    key = _numa_fit_cache_key(host_topology, instance_topology, limits)
+    try:
+        result = _numa_fit_cache.pop(key)
+    except KeyError:
+        result = _numa_fit_instance_to_host(
+            host_topology, instance_topology.obj_clone(), limits=limits)
+        while len(_numa_fit_cache) >= cache_size:
+            _numa_fit_cache.popitem(last=False)
+    _numa_fit_cache[key] = result
+    return result.obj_clone() if result else result
+
+
+def _numa_fit_instance_to_host(
+        host_topology, instance_topology, limits=None,
+        pci_requests=None, pci_stats=None):
+    """Fit the instance topology onto the host topology given the limits
+
+    :param host_topology: objects.NUMATopology object to fit an instance on
+    :param instance_topology: objects.InstanceNUMATopology to be fitted
+    :param limits: objects.NUMATopologyLimits that defines limits
+    :param pci_requests: instance pci_requests
+    :param pci_stats: pci_stats for the host
+
     Given a host and instance topology and optionally limits - this method
     will attempt to fit instance cells onto all permutations of host cells
     by calling the _numa_fit_instance_cell method, and return a new
@@ -18,6 +18,9 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
+import itertools
+import time
 
 import six
 
@@ -121,23 +124,40 @@ class BaseWeigher(object):
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    # Object with a record() method called with the time spent in each
+    # weigher, see nova.scheduler.stats.SchedulerStats
+    stats = None
+
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            max_objs=None):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If max_objs is set, only the max_objs heaviest WeighedObjects are
+        returned. They are picked without sorting the whole list.
+        """
 
         if not obj_list:
             return []
 
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
         for weigher in weighers:
+            start = time.time()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+            multiplier = weigher.weight_multiplier()
 
             # Normalize the weights
             weights = normalize(weights,
                                 minval=weigher.minval,
                                 maxval=weigher.maxval)
 
-            for i, weight in enumerate(weights):
-                obj = weighed_objs[i]
-                obj.weight += weigher.weight_multiplier() * weight
+            for obj, weight in itertools.izip(weighed_objs, weights):
+                obj.weight += multiplier * weight
+
+            if self.stats is not None:
+                self.stats.record('weighers', weigher.__class__.__name__,
+                                  time.time() - start, len(weighed_objs))
 
+        if max_objs is not None and max_objs < len(weighed_objs):
+            return heapq.nlargest(max_objs, weighed_objs,
+                                  key=lambda x: x.weight)
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
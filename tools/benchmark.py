@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tool running the benchmarks of the unit tests at a larger scale.
+
+The benchmarks run with the fixtures of the unit tests, which set up the
+configuration and the notifier without any service running. Every measure
+is printed as one JSON line, e.g.:
+
+    python tools/benchmark.py scheduler --hosts 100,1000,10000 --requests 200
+    python tools/benchmark.py objects --objects 1000,10000,50000
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import unittest
+
+from oslo_serialization import jsonutils
+
+from nova import context
+from nova import test
+from nova.tests.unit.objects import test_objects_memory_benchmark
+from nova.tests.unit.scheduler import test_scheduler_benchmark
+
+
+class BenchmarkTestCase(test.NoDBTestCase):
+    """Runs a benchmark function in the fixtures of a test case."""
+
+    def __init__(self, benchmark, args):
+        super(BenchmarkTestCase, self).__init__('run_benchmark')
+        # The attributes not starting with _ are deleted after the test
+        self._benchmark = benchmark
+        self._args = args
+        self._results = []
+
+    def run_benchmark(self):
+        self._results.extend(self._benchmark(self, self._args))
+
+
+def _split_ints(value):
+    return [int(item) for item in value.split(',')]
+
+
+def scheduler_benchmark(test_case, args):
+    test_scheduler_benchmark.setup_scheduler(
+        test_case, filters=args.filters.split(','),
+        debug_logging=args.debug)
+    return [test_scheduler_benchmark.run_benchmark(
+                num_hosts, args.requests, seed=args.seed)
+            for num_hosts in _split_ints(args.hosts)]
+
+
+def objects_benchmark(test_case, args):
+    ctxt = context.RequestContext('fake-user', 'fake-project')
+    primitives = test_objects_memory_benchmark.make_primitives(ctxt)
+    return [test_objects_memory_benchmark.run_benchmark(
+                ctxt, obj_class, primitives[obj_class], num_objects)
+            for obj_class in sorted(primitives, key=lambda cls: cls.obj_name())
+            for num_objects in _split_ints(args.objects)]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    subparsers = parser.add_subparsers()
+
+    scheduler = subparsers.add_parser(
+        'scheduler', help='Placement benchmark of the FilterScheduler')
+    scheduler.set_defaults(benchmark=scheduler_benchmark)
+    scheduler.add_argument('--hosts', default='100,1000,10000',
+                           help='Comma separated list of fleet sizes')
+    scheduler.add_argument('--requests', type=int, default=100,
+                           help='Number of requests sent to each fleet')
+    scheduler.add_argument('--seed', type=int, default=0,
+                           help='Seed of the fleets and of the requests')
+    scheduler.add_argument(
+        '--filters',
+        default=','.join(test_scheduler_benchmark.DEFAULT_FILTERS),
+        help='Comma separated list of the filters to run')
+    scheduler.add_argument('--debug', action='store_true',
+                           help='Format the debug log messages while '
+                                'measuring')
+
+    objects = subparsers.add_parser(
+        'objects', help='Memory benchmark of the layouts of objects')
+    objects.set_defaults(benchmark=objects_benchmark)
+    objects.add_argument('--objects', default='1000,10000',
+                         help='Comma separated list of numbers of objects')
+
+    args = parser.parse_args(argv)
+    test_case = BenchmarkTestCase(args.benchmark, args)
+    outcome = unittest.TextTestRunner(stream=sys.stderr).run(test_case)
+    for result in test_case._results:
+        print(jsonutils.dumps(result, sort_keys=True))
+    return 0 if outcome.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))